@@ -0,0 +1,194 @@
+"""
+Offline batch scoring — re-rate a whole book without going through HTTP.
+
+    python -m app.batch "Property Insurance.csv" --output scores.csv
+    python -m app.batch book.csv --output scores.parquet --workers 8 --chunk-rows 50000
+
+The input (CSV, or NDJSON with one policy per line) is read in chunks. Chunks
+are scored in a pool of worker processes, each with its own ModelSet loaded from
+MODELS_DIR. Preprocessing and scoring are the same code the API uses (app/preprocess.py,
+app/scoring.py). Results are written chunk by chunk in input order, so memory stays
+bounded by workers × chunk size whatever the input size.
+
+Output is CSV unless the output path ends in .parquet / .pq or --format parquet
+is given; Parquet needs the optional pyarrow package.
+
+With a bundle and MODEL_ENGINE=native the workers memory-map the same tree
+arrays, so adding workers adds no model memory.
+"""
+
+import argparse
+import collections
+import contextlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from app.registry import MODEL_ENGINE, MODELS_DIR, ModelSet
+from app.scoring import ID_COLUMN, RESULT_COLUMNS, read_chunks, score_frame
+
+DEFAULT_CHUNK_ROWS = 20_000
+
+_worker_models = None
+
+
+def _single_threaded(models):
+    """One process per core: keep BLAS / OpenMP / joblib inside each worker to one thread."""
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+    if hasattr(models.clf, "n_jobs"):
+        models.clf.n_jobs = 1
+
+
+def _init_worker(models_dir, engine):
+    global _worker_models
+    _worker_models = ModelSet.load(models_dir, engine)
+    _single_threaded(_worker_models)
+
+
+def _score_chunk(task) -> pd.DataFrame:
+    start, chunk = task
+    return score_frame(chunk, _worker_models, start)
+
+
+def _ordered(pool, tasks, window: int):
+    """Like pool.map, but with at most `window` chunks in flight, so input is read lazily."""
+    pending = collections.deque()
+    for task in tasks:
+        pending.append(pool.submit(_score_chunk, task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _numbered(chunks):
+    start = 0
+    for chunk in chunks:
+        yield start, chunk
+        start += len(chunk)
+
+
+class _CsvWriter:
+    def __init__(self, path):
+        self.path = path
+        self.header = True
+
+    def write(self, out: pd.DataFrame):
+        out.to_csv(self.path, mode="w" if self.header else "a", header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        if self.header:         # empty input still gets a header row
+            pd.DataFrame(columns=RESULT_COLUMNS).to_csv(self.path, index=False)
+
+
+class _ParquetWriter:
+    """One row group per chunk, under a fixed schema so every chunk lines up."""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow: pip install pyarrow (or write --format csv)")
+        self.pa = pa
+        self.schema = pa.schema([
+            (ID_COLUMN,             pa.string()),
+            ("risk_category",       pa.int64()),
+            ("risk_label",          pa.string()),
+            ("probability",         pa.float64()),
+            ("expected_claim_cost", pa.float64()),
+            ("error",               pa.string()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, out: pd.DataFrame):
+        out = out.assign(**{ID_COLUMN: out[ID_COLUMN].astype(str)})
+        self.writer.write_table(self.pa.Table.from_pandas(out, schema=self.schema, preserve_index=False))
+
+    def close(self):
+        self.writer.close()
+
+
+def _pool(workers: int, models_dir, engine):
+    if workers == 1:
+        return contextlib.nullcontext()
+    return ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(models_dir, engine))
+
+
+def _format_of(path, fmt, choices, default):
+    if fmt:
+        return fmt
+    suffix = os.path.splitext(str(path))[1].lower().lstrip(".")
+    suffix = {"jsonl": "ndjson", "pq": "parquet"}.get(suffix, suffix)
+    return suffix if suffix in choices else default
+
+
+def score_file(input_path, output_path, input_format=None, output_format=None,
+               chunk_rows: int = DEFAULT_CHUNK_ROWS, workers: int | None = None,
+               models_dir=MODELS_DIR, engine: str = MODEL_ENGINE) -> dict:
+    """
+    Score every row of input_path into output_path and return run statistics.
+    workers=1 scores in this process; otherwise chunks go to a process pool.
+    """
+    input_format = _format_of(input_path, input_format, ("csv", "ndjson"), "csv")
+    output_format = _format_of(output_path, output_format, ("csv", "parquet"), "csv")
+    workers = workers or os.cpu_count() or 1
+
+    writer = _ParquetWriter(output_path) if output_format == "parquet" else _CsvWriter(output_path)
+    rows = errors = 0
+    start = time.perf_counter()
+    try:
+        with open(input_path, "rb") as f, _pool(workers, models_dir, engine) as pool:
+            tasks = _numbered(read_chunks(f, input_format, chunk_rows))
+            if pool is None:
+                models = ModelSet.load(models_dir, engine)
+                results = (score_frame(chunk, models, offset) for offset, chunk in tasks)
+            else:
+                results = _ordered(pool, tasks, window=2 * workers)
+            for out in results:
+                writer.write(out)
+                rows += len(out)
+                errors += int(out["error"].notna().sum())
+    finally:
+        writer.close()
+
+    seconds = time.perf_counter() - start
+    return {
+        "rows":         rows,
+        "errors":       errors,
+        "seconds":      round(seconds, 3),
+        "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else 0.0,
+        "workers":      workers,
+        "chunk_rows":   chunk_rows,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a policy file offline (CSV / NDJSON → CSV / Parquet)")
+    parser.add_argument("input", help="policies in the Property Insurance.csv layout")
+    parser.add_argument("--output", "-o", required=True)
+    parser.add_argument("--input-format", choices=("csv", "ndjson"), default=None,
+                        help="default: from the file extension")
+    parser.add_argument("--format", dest="output_format", choices=("parquet", "csv"), default=None,
+                        help="output format (default: from the file extension, else csv)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--engine", choices=("sklearn", "native"), default=MODEL_ENGINE)
+    args = parser.parse_args(argv)
+
+    stats = score_file(args.input, args.output, args.input_format, args.output_format,
+                       chunk_rows=max(1, args.chunk_rows), workers=args.workers,
+                       models_dir=args.models_dir, engine=args.engine)
+    print(f"Scored {stats['rows']:,} rows ({stats['errors']:,} errors) in {stats['seconds']:.2f}s "
+          f"— {stats['rows_per_sec']:,.0f} rows/sec with {stats['workers']} worker(s)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Async micro-batching in front of the models.
+
+Concurrent single-policy requests are coalesced: the first request opens a window
+of max_wait_ms, and everything that arrives before the window closes (or until
+max_batch_size rows are queued) is preprocessed and scored in one batched call in
+a worker thread. Each caller then gets its own row of the result.
+
+The queue worker runs in a context of its own, not the first caller's; each
+caller records its own `queue_wait` (enqueue until its batch starts scoring).
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+
+from app import metrics
+
+
+class QueueFullError(RuntimeError):
+    """Raised when more than max_queue requests are already waiting."""
+
+
+class _LoopState:
+    """Queue and worker of one event loop."""
+
+    def __init__(self, loop, run):
+        self.pending = []
+        self.ready   = asyncio.Event()
+        self.full    = asyncio.Event()
+        # A fresh context: the worker outlives the request that happened to start it
+        self.worker  = loop.create_task(run(self), context=contextvars.Context())
+
+
+class MicroBatcher:
+    """
+    Coalesce awaitable single-item calls into batched calls of `fn`.
+
+    `fn(items) -> list` must return one result per item, in order. It runs in
+    `executor` (anything with an async run(fn, *args), see app/executor.py), or in
+    the loop's default executor, so the event loop keeps accepting requests meanwhile.
+
+    Queues are kept per event loop: callers on different loops (a TestClient used
+    without `with`, several loops in threads) never share or drop each other's items.
+    """
+
+    def __init__(self, fn, max_batch_size: int = 64, max_wait_ms: float = 2.0, max_queue: int = 1024,
+                 executor=None):
+        self.fn = fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self._states = {}               # event loop → _LoopState
+        self._lock = threading.Lock()
+
+    def _state(self, loop) -> _LoopState:
+        state = self._states.get(loop)
+        if state is None:
+            with self._lock:
+                # Forget loops that have shut down; their queues died with them
+                self._states = {l: st for l, st in self._states.items() if not l.is_closed()}
+                state = self._states[loop] = _LoopState(loop, self._run)
+        return state
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(state.pending) for state in list(self._states.values()))
+
+    async def submit(self, item):
+        """Queue one item and wait for its result from the next batch."""
+        state = self._state(asyncio.get_running_loop())
+        if len(state.pending) >= self.max_queue:
+            raise QueueFullError(f"Batch queue is full ({self.max_queue} requests waiting)")
+        fut = asyncio.get_running_loop().create_future()
+        enqueued = time.perf_counter()
+        state.pending.append((item, fut))
+        state.ready.set()
+        if len(state.pending) >= self.max_batch_size:
+            state.full.set()
+        started, result = await fut
+        metrics.record("queue_wait", started - enqueued)
+        return result
+
+    async def _run(self, state: _LoopState):
+        loop = asyncio.get_running_loop()
+        while True:
+            await state.ready.wait()
+            if len(state.pending) < self.max_batch_size:
+                try:
+                    await asyncio.wait_for(state.full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = state.pending[:self.max_batch_size]
+            del state.pending[:self.max_batch_size]
+            if len(state.pending) < self.max_batch_size:
+                state.full.clear()
+            if not state.pending:
+                state.ready.clear()
+
+            items = [item for item, _ in batch]
+            started = None
+            try:
+                if self.executor is None:
+                    started, results = await loop.run_in_executor(None, self._call, items)
+                else:
+                    # The callers record their own queue_wait; keep the executor's out of the histogram
+                    with metrics.collect(observe=False):
+                        started, results = await self.executor.run(self._call, items)
+            except QueueFullError as e:     # executor saturated: fail the batch fast
+                results = [e] * len(batch)
+            for (_, fut), result in zip(batch, results):
+                if fut.done():              # caller went away
+                    continue
+                if isinstance(result, Exception):
+                    fut.set_exception(result)
+                else:
+                    fut.set_result((started, result))
+
+    def _checked(self, items) -> list:
+        results = list(self.fn(items))
+        if len(results) != len(items):
+            raise RuntimeError(f"Batch function returned {len(results)} results for {len(items)} items")
+        return results
+
+    def _call(self, items) -> tuple[float, list]:
+        """
+        Score the batch; if it fails, retry per item so each caller gets its own error.
+        Returns the time scoring started along with the results.
+        """
+        started = time.perf_counter()
+        try:
+            return started, self._checked(items)
+        except Exception:
+            results = []
+            for item in items:
+                try:
+                    results.append(self._checked([item])[0])
+                except Exception as e:
+                    results.append(e)
+            return started, results
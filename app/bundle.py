@@ -0,0 +1,245 @@
+"""
+Single versioned model bundle.
+
+The seven separate joblib files are packed into one directory:
+
+  models/bundle/
+    manifest.json   feature order, scale features, encoder classes, scaler
+                    parameters, enrichment index (if any), checksums,
+                    library versions, model version
+    models.joblib   the RF classifier and GB regressor, stored uncompressed so
+                    their NumPy arrays can be memory-mapped on load
+    engine/<id>/clf/*.npy, engine/<id>/reg/*.npy
+                    both ensembles compiled to flat node arrays (app/engine.py),
+                    in a directory named by their content hash
+
+Everything except the two tree ensembles is plain JSON: no unpickling of
+encoders or scalers at startup, and the manifest is verified against the
+checksums of the model files before anything is loaded.
+
+With MODEL_ENGINE=native nothing is unpickled at all: the engine arrays are
+memory-mapped read-only, so every uvicorn / gunicorn worker on the host shares
+one physical copy through the page cache instead of holding its own.
+
+Build a bundle from the legacy files:
+    python -m app.bundle build --models-dir models
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from app.encoding import EncoderTable
+from app.engine import compile_classifier, compile_regressor, load_native, save_native, to_float32
+from app.enrichment import EnrichmentIndex
+
+FORMAT_VERSION = 1
+BUNDLE_DIR     = "bundle"
+MANIFEST       = "manifest.json"
+MODELS_FILE    = "models.joblib"
+ENGINE_DIR     = "engine"
+
+
+class BundleError(RuntimeError):
+    """Raised when a bundle is incomplete or fails its integrity check."""
+
+
+class ArrayScaler:
+    """
+    StandardScaler.transform / inverse_transform from stored mean_ and scale_.
+    Same float64 arithmetic as sklearn (X -= mean; X /= scale), so outputs match exactly.
+    """
+
+    def __init__(self, mean, scale):
+        self.mean_  = np.asarray(mean, dtype=np.float64)
+        self.scale_ = np.asarray(scale, dtype=np.float64)
+
+    def transform(self, X) -> np.ndarray:
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
+    def inverse_transform(self, X) -> np.ndarray:
+        X = np.array(X, dtype=np.float64)
+        X *= self.scale_
+        X += self.mean_
+        return X
+
+
+def _sha256(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _engine_id(engines) -> str:
+    h = hashlib.sha256()
+    for key, engine in sorted(engines.items()):
+        h.update(json.dumps(engine.meta(), sort_keys=True).encode())
+        for name, array in sorted(engine.trees.arrays().items()):
+            h.update(name.encode())
+            h.update(np.ascontiguousarray(array).tobytes())
+    return h.hexdigest()[:12]
+
+
+def _scaler_params(scaler) -> dict:
+    if not (getattr(scaler, "with_mean", True) and getattr(scaler, "with_std", True)):
+        raise BundleError("Only StandardScaler(with_mean=True, with_std=True) can be bundled")
+    return {"mean": np.asarray(scaler.mean_).tolist(), "scale": np.asarray(scaler.scale_).tolist()}
+
+
+def _library_versions() -> dict:
+    import sklearn
+    return {
+        "python":  platform.python_version(),
+        "numpy":   np.__version__,
+        "sklearn": sklearn.__version__,
+        "joblib":  joblib.__version__,
+    }
+
+
+def write_bundle(path, clf, reg, scaler_X, scaler_y, encoders, scale_features, feature_order,
+                 enrichment: EnrichmentIndex | None = None, float32: bool = False) -> dict:
+    """
+    Write a bundle directory. The manifest is written last (atomic rename), so a
+    watcher never sees a manifest that points at a half-written models file.
+    float32=True stores the engine arrays narrowed by app.engine.to_float32.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    models_path = path / MODELS_FILE
+    tmp = models_path.with_suffix(".tmp")
+    joblib.dump({"clf": clf, "reg": reg}, tmp)      # uncompressed → mmap-able
+    os.replace(tmp, models_path)
+    files = {MODELS_FILE: _sha256(models_path)}
+
+    # Engine arrays go to engine/<content hash>/: a rebuild never rewrites files that
+    # a running ModelSet has memory-mapped, it writes a new directory next to them
+    engines = {"clf": compile_classifier(clf), "reg": compile_regressor(reg)}
+    if float32:
+        engines = {key: to_float32(engine) for key, engine in engines.items()}
+    engine_dir = f"{ENGINE_DIR}/{_engine_id(engines)}"
+    engine_meta = {}
+    for key, engine in engines.items():
+        target = path / engine_dir / key
+        complete = all((target / f"{name}.npy").exists() for name in engine.trees.arrays())
+        engine_meta[key] = engine.meta() if complete else save_native(engine, target)
+        for npy in sorted(target.glob("*.npy")):
+            files[npy.relative_to(path).as_posix()] = _sha256(npy)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "created_at":     time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "feature_order":  list(feature_order),
+        "scale_features": list(scale_features),
+        "encoders":       {col: table.classes for col, table in encoders.items()},
+        "scaler_X":       _scaler_params(scaler_X),
+        "scaler_y":       _scaler_params(scaler_y),
+        "engine":         engine_meta,
+        "engine_dir":     engine_dir,
+        "files":          files,
+        "libraries":      _library_versions(),
+    }
+    if enrichment is not None:
+        manifest["enrichment"] = enrichment.to_dict()
+    if float32:
+        manifest["engine_dtype"] = "float32"      # native predictions differ from models.joblib by ~1e-7
+    # Version = hash of everything that affects a prediction
+    payload = json.dumps({k: v for k, v in manifest.items() if k not in ("created_at", "libraries")},
+                         sort_keys=True)
+    manifest["model_version"] = hashlib.sha256(payload.encode()).hexdigest()[:12]
+
+    tmp = path / (MANIFEST + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, path / MANIFEST)
+
+    # Older engine directories are unlinked, not overwritten: processes still
+    # mapping them keep their pages until they reload
+    for old in (path / ENGINE_DIR).iterdir():
+        if old.is_dir() and old.name != Path(engine_dir).name:
+            shutil.rmtree(old, ignore_errors=True)
+    return manifest
+
+
+def read_manifest(path) -> dict:
+    manifest_path = Path(path) / MANIFEST
+    manifest = json.loads(manifest_path.read_text())
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise BundleError(f"Unsupported bundle format {manifest.get('format_version')!r} in {manifest_path}")
+    return manifest
+
+
+def _verify(path, manifest, names):
+    for name in names:
+        if _sha256(path / name) != manifest["files"][name]:
+            raise BundleError(f"Checksum mismatch for {path / name}")
+
+
+def read_bundle(path, verify: bool = True, mmap: bool = True, engine: str = "sklearn") -> dict:
+    """
+    Load a bundle into the keyword arguments of ModelSet. With mmap=True arrays
+    are memory-mapped instead of copied into the heap. With engine="native" the
+    precompiled node arrays are used and models.joblib is never unpickled.
+    """
+    path = Path(path)
+    manifest = read_manifest(path)
+
+    if engine == "native" and "engine" in manifest:
+        engine_dir = manifest.get("engine_dir", ENGINE_DIR)
+        if verify:
+            _verify(path, manifest, [name for name in manifest["files"] if name.startswith(engine_dir + "/")])
+        clf = load_native(path / engine_dir / "clf", manifest["engine"]["clf"], mmap=mmap)
+        reg = load_native(path / engine_dir / "reg", manifest["engine"]["reg"], mmap=mmap)
+    else:
+        if verify:
+            _verify(path, manifest, [MODELS_FILE])
+        models = joblib.load(path / MODELS_FILE, mmap_mode="r" if mmap else None)
+        clf, reg = models["clf"], models["reg"]
+
+    return {
+        "clf":            clf,
+        "reg":            reg,
+        "scaler_X":       ArrayScaler(**manifest["scaler_X"]),
+        "scaler_y":       ArrayScaler(**manifest["scaler_y"]),
+        "encoders":       {col: EncoderTable(classes) for col, classes in manifest["encoders"].items()},
+        "scale_features": manifest["scale_features"],
+        "feature_order":  manifest["feature_order"],
+        "enrichment":     EnrichmentIndex.from_dict(manifest["enrichment"]) if "enrichment" in manifest else None,
+        "version":        manifest["model_version"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Model bundle tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="pack the legacy joblib artifacts into a bundle")
+    build.add_argument("--models-dir", default="models")
+    build.add_argument("--out", default=None, help="bundle directory (default: <models-dir>/bundle)")
+    show = sub.add_parser("show", help="print a bundle manifest")
+    show.add_argument("path", nargs="?", default=os.path.join("models", BUNDLE_DIR))
+    args = parser.parse_args(argv)
+
+    if args.command == "show":
+        print(json.dumps(read_manifest(args.path), indent=2))
+        return
+
+    from app.registry import load_legacy
+    artifacts = load_legacy(args.models_dir)
+    out = args.out or os.path.join(args.models_dir, BUNDLE_DIR)
+    manifest = write_bundle(out, **{k: v for k, v in artifacts.items() if k != "version"})
+    print(f"Wrote bundle {manifest['model_version']} to {out}")
+
+
+if __name__ == "__main__":
+    main()
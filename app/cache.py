@@ -0,0 +1,190 @@
+"""
+Prediction result cache.
+
+Keys are a canonical hash of the validated InsuranceInput plus the model-artifact
+version, so a model swap invalidates every entry automatically. Numbers are
+normalized to float before hashing, so 4 and 4.0 collide the way the encoder
+treats them ('4' → '4.0').
+
+Two backends with the same get / set / stats interface:
+  PredictionCache — in-process LRU with a size bound and TTL
+  DiskCache       — SQLite file shared by every uvicorn worker on the host
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def cache_key(data, task: str, version: str) -> str:
+    """Canonical hash of one validated InsuranceInput for one scoring task."""
+    fields = {
+        k: float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else v
+        for k, v in data.model_dump().items()
+    }
+    payload = json.dumps([task, version, fields], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class _Counters:
+    def __init__(self):
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits":        self.hits,
+            "misses":      self.misses,
+            "evictions":   self.evictions,
+            "expirations": self.expirations,
+            "hit_rate":    round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class PredictionCache:
+    """Thread-safe in-process LRU cache with a TTL."""
+
+    blocking = False
+
+    def __init__(self, max_size: int = 10_000, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key → (stored_at, value)
+        self._lock = threading.Lock()
+        self._counters = _Counters()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters.misses += 1
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self._counters.expirations += 1
+                self._counters.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._counters.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": "memory", "size": len(self._entries),
+                    "max_size": self.max_size, "ttl": self.ttl, **self._counters.as_dict()}
+
+
+class DiskCache:
+    """
+    SQLite-backed cache shared across processes. Values must be JSON-serializable.
+    LRU order is kept with an accessed-at timestamp; counters are per process.
+
+    Connections are opened lazily, per thread and per process, so a cache created
+    before gunicorn forks its workers never shares a connection across fork().
+    The row count is kept by triggers in a one-row table instead of a COUNT(*)
+    per write. Every call does file I/O: call it from a worker thread, not the
+    event loop (`blocking = True`).
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, max_size: int = 100_000, ttl: float = 300.0):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self._local = threading.local()
+        self._counters = _Counters()
+        self._lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread and process; WAL lets workers read while another writes
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, n in deltas.items():
+                setattr(self._counters, name, getattr(self._counters, name) + n)
+
+    def _size(self, conn) -> int:
+        return conn.execute("SELECT n FROM predictions_size").fetchone()[0]
+
+    def get(self, key):
+        conn = self._conn()
+        row = conn.execute("SELECT value, stored_at FROM predictions WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None:
+            self._count(misses=1)
+            return None
+        if now - row[1] > self.ttl:
+            conn.execute("DELETE FROM predictions WHERE key = ?", (key,))
+            self._count(misses=1, expirations=1)
+            return None
+        conn.execute("UPDATE predictions SET accessed_at = ? WHERE key = ?", (now, key))
+        self._count(hits=1)
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        conn = self._conn()
+        now = time.time()
+        # Upsert rather than INSERT OR REPLACE: REPLACE's implicit delete skips the size trigger
+        conn.execute(
+            "INSERT INTO predictions (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+            "stored_at = excluded.stored_at, accessed_at = excluded.accessed_at",
+            (key, json.dumps(value), now, now),
+        )
+        excess = self._size(conn) - self.max_size
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM predictions WHERE key IN "
+                "(SELECT key FROM predictions ORDER BY accessed_at LIMIT ?)", (excess,)
+            )
+            self._count(evictions=excess)
+
+    def clear(self):
+        self._conn().execute("DELETE FROM predictions")
+
+    def stats(self) -> dict:
+        size = self._size(self._conn())
+        with self._lock:
+            return {"backend": "disk", "path": self.path, "size": size,
+                    "max_size": self.max_size, "ttl": self.ttl, **self._counters.as_dict()}
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    key TEXT PRIMARY KEY, value TEXT NOT NULL,
+    stored_at REAL NOT NULL, accessed_at REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_accessed ON predictions (accessed_at);
+CREATE TABLE IF NOT EXISTS predictions_size (n INTEGER NOT NULL);
+INSERT INTO predictions_size (n)
+    SELECT COUNT(*) FROM predictions WHERE NOT EXISTS (SELECT 1 FROM predictions_size);
+CREATE TRIGGER IF NOT EXISTS predictions_added AFTER INSERT ON predictions
+    BEGIN UPDATE predictions_size SET n = n + 1; END;
+CREATE TRIGGER IF NOT EXISTS predictions_removed AFTER DELETE ON predictions
+    BEGIN UPDATE predictions_size SET n = n - 1; END;
+"""
@@ -0,0 +1,255 @@
+"""
+Streaming feature-drift monitor — live traffic against the training distribution.
+
+Every frame preprocess.py builds for an online request (/predict*, /explain*) is
+folded into running statistics of the model set that scored it, then dropped;
+nothing per request is kept:
+  - scaled numeric features   Welford count / mean / variance (batches merged with
+                              Chan's update) and a histogram over fixed bins in
+                              standard-score units, -4 … 4 in steps of 0.5 plus two tails
+  - encoded categorical ones  a count per class, and how many values were unseen
+                              labels that fell back to class 0
+Memory is a few small arrays per feature, however long the process runs.
+
+Drift scores compare those histograms / class frequencies with a reference
+profile of the same version (see prepare()):
+  - the training CSV (DRIFT_REFERENCE, relative to the repository root) run
+    through the serving pipeline, when it exists: empirical bins and class
+    frequencies of its complete rows, the only ones the API accepts
+  - otherwise scaler_X alone: the scaled features have mean 0 and variance 1 on
+    the training set, taken as normal; no categorical reference
+PSI is Σ (live − ref) · ln(live / ref) over the bins (below 0.1 is stable, above
+0.25 a shift worth acting on); KS is the largest gap between the two binned CDFs.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DRIFT_MONITOR   = os.getenv("DRIFT_MONITOR", "1") == "1"
+DRIFT_REFERENCE = os.getenv("DRIFT_REFERENCE", "Property Insurance.csv")
+
+EDGES = np.arange(-4.0, 4.01, 0.5)      # standard-score bin edges; bin i is (EDGES[i-1], EDGES[i]]
+PSI_ALERT = 0.25
+_EPSILON = 1e-4                         # floor for empty bins in PSI
+
+
+class FeatureStats:
+    """Running statistics of the numeric and categorical columns of one feature layout."""
+
+    def __init__(self, numeric: list[str], categories: dict[str, list[str]]):
+        self.numeric = list(numeric)
+        self.categories = {col: list(labels) for col, labels in categories.items()}
+        k, width = len(self.numeric), max((len(v) for v in self.categories.values()), default=0)
+        self.rows = 0
+        self.count = np.zeros(k, dtype=np.int64)        # finite values per numeric column
+        self.mean = np.zeros(k)
+        self.m2 = np.zeros(k)                           # Σ (x − mean)²
+        self.bins = np.zeros((k, len(EDGES) + 1), dtype=np.int64)
+        self.classes = np.zeros((len(self.categories), width), dtype=np.int64)
+        self.unseen = np.zeros(len(self.categories), dtype=np.int64)
+        self._columns = self._cached = None
+
+    def update(self, X: pd.DataFrame, unseen: dict | None = None):
+        self.rows += len(X)
+        numeric, categorical = self._positions(X.columns)
+        V = X.to_numpy(dtype=np.float64)                 # one copy, then positional column picks
+        if self.numeric:
+            self._update_numeric(V[:, numeric])
+        if self.categories:
+            codes = V[:, categorical].astype(np.int64)
+            width = self.classes.shape[1]
+            valid = (codes >= 0) & (codes < width)
+            flat = (codes + np.arange(codes.shape[1]) * width)[valid]
+            self.classes += np.bincount(flat, minlength=self.classes.size).reshape(self.classes.shape)
+        for i, col in enumerate(self.categories):
+            self.unseen[i] += (unseen or {}).get(col, 0)
+
+    def _positions(self, columns: pd.Index) -> tuple:
+        # Every frame of a model set has the same columns; resolve names only when they differ
+        if self._columns is None or not self._columns.equals(columns):
+            self._columns = columns
+            self._cached = (columns.get_indexer(self.numeric), columns.get_indexer(list(self.categories)))
+        return self._cached
+
+    def _update_numeric(self, V: np.ndarray):
+        finite = np.isfinite(V)
+        n = finite.sum(axis=0)
+        total = np.where(finite, V, 0.0).sum(axis=0)
+        batch_mean = np.divide(total, n, out=np.zeros_like(total), where=n > 0)
+        batch_m2 = (np.where(finite, V - batch_mean, 0.0) ** 2).sum(axis=0)
+        # Chan et al.: merge the batch's (n, mean, M2) into the running ones
+        combined = self.count + n
+        delta = batch_mean - self.mean
+        share = np.divide(n, combined, out=np.zeros_like(total), where=combined > 0)
+        self.mean += delta * share
+        self.m2 += batch_m2 + delta ** 2 * self.count * share
+        self.count = combined
+
+        slot = np.searchsorted(EDGES, V, side="left") + np.arange(V.shape[1]) * self.bins.shape[1]
+        self.bins += np.bincount(slot[finite], minlength=self.bins.size).reshape(self.bins.shape)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(np.divide(self.m2, self.count, out=np.zeros_like(self.m2), where=self.count > 0))
+
+
+class Reference:
+    """Expected bin and class frequencies of every feature the monitor tracks."""
+
+    def __init__(self, source: str, bins: dict, mean: dict, std: dict, classes: dict | None):
+        self.source = source
+        self.bins = bins                # numeric column → probability per bin
+        self.mean, self.std = mean, std
+        self.classes = classes          # categorical column → probability per class, or None
+
+    @classmethod
+    def from_scaler(cls, numeric: list[str]) -> "Reference":
+        """Standard normal for every scaled feature: what scaler_X says about training data."""
+        cdf = np.array([0.0] + [0.5 * (1 + math.erf(e / math.sqrt(2))) for e in EDGES] + [1.0])
+        probs = np.diff(cdf)
+        return cls("scaler_X", {c: probs for c in numeric}, dict.fromkeys(numeric, 0.0),
+                   dict.fromkeys(numeric, 1.0), None)
+
+    @classmethod
+    def from_stats(cls, source: str, stats: FeatureStats) -> "Reference":
+        bins = {c: _share(stats.bins[i]) for i, c in enumerate(stats.numeric)}
+        classes = {c: _share(stats.classes[i, :len(labels)]) for i, (c, labels) in enumerate(stats.categories.items())}
+        std = stats.std
+        return cls(source, bins, dict(zip(stats.numeric, stats.mean.tolist())),
+                   dict(zip(stats.numeric, std.tolist())), classes)
+
+
+def _share(counts) -> np.ndarray:
+    total = counts.sum()
+    return counts / total if total else np.zeros(len(counts))
+
+
+def psi(live: np.ndarray, reference: np.ndarray) -> float:
+    p, q = np.maximum(live, _EPSILON), np.maximum(reference, _EPSILON)
+    return float(np.sum((p - q) * np.log(p / q)))
+
+
+def ks(live: np.ndarray, reference: np.ndarray) -> float:
+    return float(np.abs(np.cumsum(live) - np.cumsum(reference)).max())
+
+
+def _layout(models) -> tuple[list[str], dict]:
+    numeric = [c for c in models.scale_features if c in models.feature_order]
+    categories = {c: table.classes for c, table in models.encoders.items() if c in models.feature_order}
+    return numeric, categories
+
+
+class DriftMonitor:
+    """Live statistics of one model set, and the reference they are compared with."""
+
+    def __init__(self, models, reference: Reference):
+        self.version = models.version
+        self.reference = reference
+        self._layout = _layout(models)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = FeatureStats(*self._layout)
+            self.since = time.time()
+
+    def observe(self, X: pd.DataFrame, unseen: dict | None = None):
+        with self._lock:
+            self.stats.update(X, unseen)
+
+    def report(self) -> dict:
+        with self._lock:
+            s = self.stats
+            counts, mean, std = s.count.copy(), s.mean.copy(), s.std
+            bins, classes, unseen, rows = s.bins.copy(), s.classes.copy(), s.unseen.copy(), s.rows
+        ref = self.reference
+        numeric = {}
+        for i, col in enumerate(s.numeric):
+            live = _share(bins[i])
+            numeric[col] = {
+                "count": int(counts[i]), "missing": int(rows - counts[i]),
+                "mean": round(float(mean[i]), 4), "std": round(float(std[i]), 4),
+                "reference_mean": round(ref.mean[col], 4), "reference_std": round(ref.std[col], 4),
+                "psi": round(psi(live, ref.bins[col]), 4) if counts[i] else None,
+                "ks": round(ks(live, ref.bins[col]), 4) if counts[i] else None,
+            }
+        categorical = {}
+        for i, (col, labels) in enumerate(s.categories.items()):
+            n = int(classes[i].sum())
+            live = classes[i, :len(labels)]
+            score = None
+            if n and ref.classes is not None:
+                score = round(psi(_share(live), ref.classes[col]), 4)
+            categorical[col] = {
+                "count": n,
+                "unseen": int(unseen[i]),
+                "unseen_rate": round(unseen[i] / n, 4) if n else None,
+                "classes": dict(zip(labels, live.tolist())),
+                "psi": score,
+            }
+        drifted = [c for c, v in {**numeric, **categorical}.items() if (v["psi"] or 0) >= PSI_ALERT]
+        return {"model_version": self.version, "reference": ref.source, "since": self.since, "rows": rows,
+                "psi_alert": PSI_ALERT, "drifted": drifted, "numeric": numeric, "categorical": categorical}
+
+
+_monitors = weakref.WeakKeyDictionary()         # ModelSet → DriftMonitor
+_lock = threading.Lock()
+
+
+def monitor(models) -> DriftMonitor:
+    """The monitor of a model set; against scaler_X unless prepare() built a training profile."""
+    found = _monitors.get(models)
+    if found is None:
+        with _lock:
+            found = _monitors.get(models)
+            if found is None:
+                found = _monitors[models] = DriftMonitor(models, Reference.from_scaler(_layout(models)[0]))
+    return found
+
+
+def observe(X: pd.DataFrame, unseen: dict, models):
+    """Fold a preprocessed frame into the statistics of the model set that built it."""
+    if DRIFT_MONITOR:
+        monitor(models).observe(X, unseen)
+
+
+def _resolve(path) -> Path:
+    """A relative DRIFT_REFERENCE is relative to the repository, not the working directory."""
+    path = Path(path)
+    return path if path.is_absolute() else Path(__file__).resolve().parent.parent / path
+
+
+def reference_profile(models, path=DRIFT_REFERENCE) -> Reference:
+    """Bin and class frequencies of the training CSV through the serving pipeline, else scaler_X's."""
+    if not path or not _resolve(path).exists():
+        return Reference.from_scaler(_layout(models)[0])
+    from app.preprocess import RAW_COLUMNS, preprocess_frame     # preprocess reports to this module
+    stats = FeatureStats(*_layout(models))
+    for chunk in pd.read_csv(_resolve(path), chunksize=10_000):
+        # Rows with a missing input are rejected by the API, so they are no part of its reference
+        stats.update(preprocess_frame(chunk.dropna(subset=list(RAW_COLUMNS.values())), models))
+    return Reference.from_stats(_resolve(path).name, stats)
+
+
+def prepare(models):
+    """Build the reference profile of a new model set (called from warmup)."""
+    if not DRIFT_MONITOR:
+        return
+    try:
+        reference = reference_profile(models)
+    except Exception as e:
+        logger.warning("Drift reference for %s from scaler_X only: %s", models.version, e)
+        reference = Reference.from_scaler(_layout(models)[0])
+    with _lock:
+        _monitors[models] = DriftMonitor(models, reference)
@@ -0,0 +1,70 @@
+"""
+Precompiled categorical lookup tables.
+
+The fitted LabelEncoders in models/label_encoders.joblib are compiled once into
+plain dicts so that encoding on the request path is a hash lookup per value —
+no sklearn calls, no linear scans over classes_, no exception-driven fallbacks.
+Semantics match the original per-call logic in preprocess.py:
+  1. str(value) as fitted with .astype(str) in the notebook
+  2. float string fallback, e.g. Customer_Satisfaction 4 → '4.0'
+  3. unseen label → 0 (most common class)
+"""
+
+import numpy as np
+import pandas as pd
+
+UNSEEN_CODE = 0  # unseen label: fall back to most common class
+
+
+class EncoderTable:
+    """Dict-backed equivalent of a fitted LabelEncoder.transform."""
+
+    def __init__(self, classes):
+        self.classes = [str(c) for c in classes]
+        self.codes = {c: i for i, c in enumerate(self.classes)}
+        # Integer aliases for float-string classes ('4' → code of '4.0') so the
+        # common int input is a single dict hit instead of the float fallback
+        for c, i in list(self.codes.items()):
+            try:
+                f = float(c)
+            except ValueError:
+                continue
+            if f.is_integer():
+                self.codes.setdefault(str(int(f)), i)
+
+    def lookup(self, value):
+        """Return the code for one raw value, or None if the label is unseen."""
+        code = self.codes.get(str(value))
+        if code is None:
+            try:
+                code = self.codes.get(str(float(value)))  # e.g. '04' → '4.0'
+            except (TypeError, ValueError):
+                return None
+        return code
+
+    def encode(self, value) -> int:
+        """Encode one raw value."""
+        code = self.lookup(value)
+        return UNSEEN_CODE if code is None else code
+
+    def encode_column(self, values) -> np.ndarray:
+        """
+        Encode a whole column: hash-factorize the string form once, look up each
+        distinct label once, then gather. Cost is O(1) per row plus one lookup per
+        distinct label.
+        """
+        return self.encode_counted(values)[0]
+
+    def encode_counted(self, values) -> tuple[np.ndarray, int]:
+        """encode_column, plus how many rows fell back to UNSEEN_CODE."""
+        idx, uniques = pd.factorize(pd.Series(values, dtype=object).astype(str), use_na_sentinel=False)
+        codes = [self.lookup(u) for u in uniques]
+        unseen = np.array([c is None for c in codes], dtype=bool)
+        table = np.array([UNSEEN_CODE if c is None else c for c in codes], dtype=np.int64)
+        n_unseen = int(np.bincount(idx, minlength=len(uniques))[unseen].sum()) if unseen.any() else 0
+        return table[idx], n_unseen
+
+
+def compile_encoders(label_encoders) -> dict:
+    """Compile a {column: LabelEncoder} mapping into {column: EncoderTable}."""
+    return {col: EncoderTable(le.classes_) for col, le in label_encoders.items()}
@@ -0,0 +1,249 @@
+"""
+Native inference engine for the tree ensembles.
+
+The fitted RandomForestClassifier and GradientBoostingRegressor are compiled once
+into contiguous NumPy node arrays (feature, threshold, left, right, value) holding
+every tree of the ensemble. Prediction walks all trees for all rows at once, one
+vectorized step per tree level, so there is no per-tree Python dispatch, no
+sklearn input validation and no joblib thread pool on the request path.
+
+Results are bit-for-bit equal to sklearn evaluated single-threaded:
+  - X is cast to float32 and compared against float64 thresholds, like sklearn's Tree
+  - classifier leaf values are divided by their row sum at compile time, as
+    predict_proba does per tree (sklearn < 1.4 stores weighted class counts there,
+    later versions fractions), so the engine holds probabilities either way
+  - per-tree outputs are accumulated in estimator order, like sklearn's predict loops
+A forest with n_jobs != 1 (the notebook's RF uses -1) is summed by sklearn in
+thread-completion order, so its own output varies in the last bits from call
+to call; the native result equals the n_jobs=1 sum and agrees with any
+threaded one to float rounding (~1e-16).
+
+Compiled engines can be saved as plain .npy files (save_native) and loaded back
+memory-mapped (load_native), so every worker process on a host shares one
+read-only copy of the node arrays through the page cache.
+
+to_float32 narrows an engine's thresholds, leaf values and covers to float32
+(compress_models.py --float32): thresholds are rounded down to the nearest
+float32, so every (float32) input still takes the same branch, and only the
+leaf values lose precision (~6e-8 relative).
+"""
+
+import os
+
+import numpy as np
+
+_CHUNK_ROWS = 4096   # bounds the (n_trees, n_rows) node-index working set
+_ARRAYS = ("feature", "threshold", "left", "right", "missing_left", "value", "roots", "cover")
+_OPTIONAL = ("cover",)  # training-sample weight per node, for app/explain.py; absent in older saves
+
+
+class FlatTrees:
+    """All trees of an ensemble packed into flat node arrays with global indices."""
+
+    def __init__(self, trees, normalize: bool = False):
+        feature, threshold, left, right, missing_left, value, roots, cover = [], [], [], [], [], [], [], []
+        offset, depth = 0, 0
+        for tree in trees:
+            n = tree.node_count
+            ids = np.arange(n) + offset
+            is_leaf = tree.children_left == -1
+            # Leaves point to themselves so every row can take max_depth steps
+            left.append(np.where(is_leaf, ids, tree.children_left + offset))
+            right.append(np.where(is_leaf, ids, tree.children_right + offset))
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            missing = getattr(tree, "missing_go_to_left", None)
+            missing_left.append(np.zeros(n, dtype=bool) if missing is None else missing.astype(bool))
+            value.append(tree.value[:, 0, :])
+            cover.append(tree.weighted_n_node_samples)
+            roots.append(offset)
+            offset += n
+            depth = max(depth, tree.max_depth)
+
+        self.feature      = np.ascontiguousarray(np.concatenate(feature), dtype=np.intp)
+        self.threshold    = np.ascontiguousarray(np.concatenate(threshold), dtype=np.float64)
+        self.left         = np.ascontiguousarray(np.concatenate(left), dtype=np.intp)
+        self.right        = np.ascontiguousarray(np.concatenate(right), dtype=np.intp)
+        self.missing_left = np.ascontiguousarray(np.concatenate(missing_left))
+        self.value        = np.ascontiguousarray(np.concatenate(value), dtype=np.float64)
+        self.roots        = np.asarray(roots, dtype=np.intp)
+        self.cover        = np.ascontiguousarray(np.concatenate(cover), dtype=np.float64)
+        self.depth        = depth
+        self.has_missing  = bool(self.missing_left.any())
+        if normalize:           # class counts or fractions → probabilities, as DecisionTreeClassifier.predict_proba
+            total = self.value.sum(axis=1, keepdims=True)
+            self.value /= np.where(total == 0.0, 1.0, total)
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, depth: int) -> "FlatTrees":
+        """Rebuild from saved node arrays (which may be read-only memory maps)."""
+        flat = cls.__new__(cls)
+        for name in _ARRAYS:
+            setattr(flat, name, arrays.get(name))
+        flat.depth = depth
+        flat.has_missing = bool(flat.missing_left.any())
+        return flat
+
+    def arrays(self) -> dict:
+        return {name: getattr(self, name) for name in _ARRAYS if getattr(self, name) is not None}
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Return the leaf index reached in every tree, shape (n_trees, n_rows)."""
+        rows = np.arange(X.shape[0])
+        node = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+        for _ in range(self.depth):
+            x = X[rows, self.feature[node]]
+            go_left = x <= self.threshold[node]
+            if self.has_missing:
+                go_left |= np.isnan(x) & self.missing_left[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+
+def _as_float32(X) -> np.ndarray:
+    """Same input cast sklearn's trees apply (DTYPE = float32)."""
+    return np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+
+
+def _chunks(n: int):
+    for start in range(0, n, _CHUNK_ROWS):
+        yield slice(start, min(start + _CHUNK_ROWS, n))
+
+
+class NativeForestClassifier:
+    """Drop-in predict / predict_proba for a fitted RandomForestClassifier."""
+
+    kind = "forest"
+
+    def __init__(self, model):
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise ValueError("Only single-output forests are supported")
+        self.classes_ = model.classes_
+        self.n_features_in_ = model.n_features_in_
+        self.trees = FlatTrees([est.tree_ for est in model.estimators_], normalize=True)
+
+    def meta(self) -> dict:
+        return {"kind": self.kind, "depth": self.trees.depth,
+                "n_features_in": int(self.n_features_in_), "classes": self.classes_.tolist()}
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, meta: dict) -> "NativeForestClassifier":
+        engine = cls.__new__(cls)
+        engine.classes_ = np.asarray(meta["classes"])
+        engine.n_features_in_ = meta["n_features_in"]
+        engine.trees = FlatTrees.from_arrays(arrays, meta["depth"])
+        return engine
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = _as_float32(X)
+        proba = np.zeros((X.shape[0], len(self.classes_)), dtype=np.float64)
+        for rows in _chunks(X.shape[0]):
+            leaves = self.trees.apply(X[rows])
+            out = proba[rows]
+            for t in range(self.trees.n_trees):  # estimator order, like sklearn
+                out += self.trees.value[leaves[t]]
+        proba /= self.trees.n_trees
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+class NativeBoostingRegressor:
+    """Drop-in predict for a fitted GradientBoostingRegressor."""
+
+    kind = "boosting"
+
+    def __init__(self, model):
+        if model.estimators_.shape[1] != 1:
+            raise ValueError("Only single-output boosting models are supported")
+        self.n_features_in_ = model.n_features_in_
+        self.learning_rate = model.learning_rate
+        # The default init (DummyRegressor / 'zero') gives one constant raw prediction
+        if not (model.init_ == "zero" or type(model.init_).__name__ == "DummyRegressor"):
+            raise ValueError("Only constant init estimators are supported")
+        probe = np.zeros((1, model.n_features_in_), dtype=np.float32)
+        self.baseline = float(model._raw_predict_init(probe)[0, 0])
+        self.trees = FlatTrees([est.tree_ for est in model.estimators_[:, 0]])
+
+    def meta(self) -> dict:
+        return {"kind": self.kind, "depth": self.trees.depth, "n_features_in": int(self.n_features_in_),
+                "learning_rate": self.learning_rate, "baseline": self.baseline}
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, meta: dict) -> "NativeBoostingRegressor":
+        engine = cls.__new__(cls)
+        engine.n_features_in_ = meta["n_features_in"]
+        engine.learning_rate = meta["learning_rate"]
+        engine.baseline = meta["baseline"]
+        engine.trees = FlatTrees.from_arrays(arrays, meta["depth"])
+        return engine
+
+    def predict(self, X) -> np.ndarray:
+        X = _as_float32(X)
+        raw = np.full(X.shape[0], self.baseline, dtype=np.float64)
+        value = self.trees.value[:, 0]
+        for rows in _chunks(X.shape[0]):
+            leaves = self.trees.apply(X[rows])
+            out = raw[rows]
+            for t in range(self.trees.n_trees):  # stage order, like predict_stages
+                out += self.learning_rate * value[leaves[t]]
+        return raw
+
+
+_ENGINES = {cls.kind: cls for cls in (NativeForestClassifier, NativeBoostingRegressor)}
+
+
+def is_native(model) -> bool:
+    return isinstance(model, tuple(_ENGINES.values()))
+
+
+def compile_classifier(model) -> NativeForestClassifier:
+    return model if is_native(model) else NativeForestClassifier(model)
+
+
+def compile_regressor(model) -> NativeBoostingRegressor:
+    return model if is_native(model) else NativeBoostingRegressor(model)
+
+
+def to_float32(engine):
+    """A copy of a compiled engine with float32 threshold, value and cover arrays."""
+    arrays = dict(engine.trees.arrays())
+    threshold = arrays["threshold"].astype(np.float32)
+    above = threshold > arrays["threshold"]
+    # x <= t (float64) and x <= t32 agree for every float32 x when t32 is the largest float32 <= t
+    threshold[above] = np.nextafter(threshold[above], np.float32(-np.inf))
+    arrays["threshold"] = threshold
+    arrays["value"] = arrays["value"].astype(np.float32)
+    if arrays.get("cover") is not None:
+        arrays["cover"] = arrays["cover"].astype(np.float32)
+    return type(engine).from_arrays(arrays, engine.meta())
+
+
+def save_native(engine, path) -> dict:
+    """
+    Write a compiled engine as one .npy per node array; returns its metadata.
+    Each file is written aside and renamed into place, so a process that has the
+    previous file memory-mapped keeps reading the old (still valid) inode.
+    """
+    os.makedirs(path, exist_ok=True)
+    for name, array in engine.trees.arrays().items():
+        target = os.path.join(path, f"{name}.npy")
+        with open(target + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(target + ".tmp", target)
+    return engine.meta()
+
+
+def load_native(path, meta: dict, mmap: bool = True):
+    """Load an engine saved by save_native; mmap=True maps the arrays read-only."""
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None)
+        for name in _ARRAYS
+        if name not in _OPTIONAL or os.path.exists(os.path.join(path, f"{name}.npy"))
+    }
+    return _ENGINES[meta["kind"]].from_arrays(arrays, meta)
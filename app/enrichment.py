@@ -0,0 +1,84 @@
+"""
+State-level enrichment — External Variables.csv as precomputed model features.
+
+The table (one row per Location: population density, household income,
+rainfall, coastal exposure, median property age, ...) is turned once into a
+dense matrix of final feature values:
+  - Coastal_Exposure (Yes / No) encoded as 1 / 0
+  - every column standardized over the states (z-score)
+  - one extra row of zeros (the average state) for missing or unknown locations
+
+Joining it into a batch is a dict lookup per row and one fancy-index gather:
+no pandas merge, no scaling on the request path. The features are named
+State_<column> and are already final, so they are not in scale_features.
+
+save_models.py --external builds the index, joins it on the training rows
+and saves it with the models (enrichment.joblib, and in the bundle manifest).
+Serving uses the index saved with the model version, never the CSV directly, so
+training and serving features always match. A model set trained without it has
+no State_* features and ignores `location`.
+"""
+
+import numpy as np
+import pandas as pd
+
+KEY_COLUMN = "State"
+PREFIX     = "State_"
+_BINARY    = {"yes": 1.0, "no": 0.0, "true": 1.0, "false": 0.0, "1": 1.0, "0": 0.0}
+
+
+def _key(location) -> str:
+    return str(location).strip().casefold()
+
+
+class EnrichmentIndex:
+    """Location → row of State_* feature values; unknown locations get the last row."""
+
+    def __init__(self, columns: list[str], states: list[str], values):
+        self.columns = list(columns)
+        self.states = list(states)
+        values = np.asarray(values, dtype=np.float64).reshape(len(self.states), len(self.columns))
+        self.matrix = np.vstack([values, np.zeros((1, len(self.columns)))])
+        self.unknown = len(self.states)
+        self.rows = {_key(s): i for i, s in enumerate(self.states)}
+
+    @classmethod
+    def from_table(cls, table: pd.DataFrame, key: str = KEY_COLUMN) -> "EnrichmentIndex":
+        """Encode and standardize a state table (the layout of External Variables.csv)."""
+        table = table.drop_duplicates(key).set_index(key)
+        encoded = {}
+        for col in table.columns:
+            values = table[col]
+            if not pd.api.types.is_numeric_dtype(values):
+                values = values.map(lambda v: _BINARY.get(_key(v)))
+                if values.isna().any():
+                    raise ValueError(f"Column {col!r} must be numeric or Yes / No")
+            values = values.astype(np.float64)
+            std = values.std(ddof=0)
+            encoded[PREFIX + col] = (values - values.mean()) / (std if std > 0 else 1.0)
+        frame = pd.DataFrame(encoded, index=table.index)
+        return cls(list(frame.columns), [str(s) for s in frame.index], frame.to_numpy())
+
+    @classmethod
+    def from_csv(cls, path) -> "EnrichmentIndex":
+        return cls.from_table(pd.read_csv(path))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "EnrichmentIndex":
+        return cls(data["columns"], data["states"], data["values"])
+
+    def to_dict(self) -> dict:
+        """Plain lists, for enrichment.joblib and the bundle manifest."""
+        return {"columns": self.columns, "states": self.states,
+                "values": self.matrix[:self.unknown].tolist()}
+
+    def row(self, location) -> int:
+        if location is None or (isinstance(location, float) and np.isnan(location)):
+            return self.unknown
+        return self.rows.get(_key(location), self.unknown)
+
+    def features(self, locations) -> dict:
+        """{State_* column: values} for a column of locations (None / unknown → average state)."""
+        idx = np.fromiter((self.row(loc) for loc in locations), dtype=np.intp)
+        values = self.matrix[idx]
+        return {col: values[:, j] for j, col in enumerate(self.columns)}
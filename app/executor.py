@@ -0,0 +1,77 @@
+"""
+Dedicated inference executor — a fixed number of scoring threads and a bounded queue.
+
+Model calls from every endpoint (micro-batches, batch requests) run here instead
+of in FastAPI's general threadpool, so at most `workers` predictions run at once
+per process. Each thread caps BLAS / OpenMP at `blas_threads`. Together with
+MODEL_N_JOBS (app/registry.py, the forest's joblib pool) that keeps a worker from
+starting more threads than the cores it was given.
+
+When `max_queue` calls are already waiting for a thread, run() raises
+ExecutorBusyError at once (the API answers 429) instead of letting latency grow
+without bound. Time spent waiting is recorded as the `queue_wait` stage.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import metrics
+from app.batching import QueueFullError
+
+
+class ExecutorBusyError(QueueFullError):
+    """Raised when max_queue calls are already waiting for an inference thread."""
+
+
+def _limit_threads(blas_threads: int):
+    # OpenMP thread counts are per calling thread, so cap them in every worker thread
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(blas_threads)
+
+
+class InferenceExecutor:
+    def __init__(self, workers: int = 1, max_queue: int = 64, blas_threads: int = 1):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.blas_threads = blas_threads
+        self.waiting = 0                # submitted, not started
+        self.running = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="inference",
+                                        initializer=_limit_threads, initargs=(blas_threads,))
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on an inference thread, in the caller's context (metrics, timings)."""
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise ExecutorBusyError(f"Inference queue is full ({self.max_queue} calls waiting)")
+            self.waiting += 1
+        context = contextvars.copy_context()
+        future = self._pool.submit(context.run, self._timed, time.perf_counter(), fn, *args)
+        future.add_done_callback(self._forget_if_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def _timed(self, submitted: float, fn, *args):
+        with self._lock:
+            self.waiting -= 1
+            self.running += 1
+        metrics.record("queue_wait", time.perf_counter() - submitted)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def _forget_if_cancelled(self, future):
+        if future.cancelled():          # caller went away before a thread picked it up
+            with self._lock:
+                self.waiting -= 1
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "max_queue": self.max_queue, "waiting": self.waiting,
+                "running": self.running, "rejected": self.rejected}
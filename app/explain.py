@@ -0,0 +1,195 @@
+"""
+Per-feature explanations (TreeSHAP) of the risk probability and the claim cost.
+
+Exact path-dependent TreeSHAP, i.e. the values shap.TreeExplainer(model) gives
+with its default feature_perturbation="tree_path_dependent", computed from the
+flat node arrays of app/engine.py, so it works with either MODEL_ENGINE.
+
+Every root-to-leaf path is precomputed once per model version:
+  - the distinct features it tests;
+  - the interval each value must fall in to follow the path;
+  - the share of training weight that follows it for that feature (z).
+Each leaf is then a product game over its own features, whose Shapley values
+have a closed form. A batch is explained with one array operation per path
+position over all leaves of all trees at once, with no Python loop over trees
+or rows.
+
+Classifier contributions are in probability units (High Risk). Cost
+contributions are in log(1 + claim cost) units, where they add up exactly:
+log1p(expected_claim_cost) = cost_base_value + sum(cost_contributions).
+"""
+
+import logging
+import threading
+import weakref
+from math import factorial
+
+import numpy as np
+
+from app.engine import compile_classifier, compile_regressor
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_ELEMENTS = 2_000_000     # rows × leaves × path positions per vectorized step
+
+
+class ExplainerUnavailable(RuntimeError):
+    """The model set has no tree ensembles that can be explained (e.g. an engine saved without node covers)."""
+
+
+class LeafPaths:
+    """Every root-to-leaf path of an ensemble, padded to the deepest one."""
+
+    def __init__(self, trees, leaf_value: np.ndarray, offset: float = 0.0):
+        if trees.cover is None:
+            raise ExplainerUnavailable("Saved engine has no node covers; rebuild the bundle to enable /explain")
+        paths = [p for root in trees.roots for p in _walk(trees, int(root))]
+        depth = max(1, max(len(conds) for _, conds in paths))
+        n = len(paths)
+
+        self.feature = np.full((n, depth), -1, dtype=np.intp)
+        self.lo      = np.full((n, depth), -np.inf)
+        self.hi      = np.full((n, depth), np.inf)
+        self.nan_ok  = np.zeros((n, depth), dtype=bool)
+        self.z       = np.ones((n, depth))                  # padding: factor 1 in every product
+        self.weight  = np.zeros((n, depth))                 # Shapley weight s!(m-s-1)!/m! by coalition size s
+        leaves = np.empty(n, dtype=np.intp)
+        for i, (leaf, conds) in enumerate(paths):
+            leaves[i] = leaf
+            m = len(conds)
+            for k, (f, (lo, hi, nan_ok, z)) in enumerate(conds.items()):
+                self.feature[i, k], self.lo[i, k], self.hi[i, k], self.nan_ok[i, k], self.z[i, k] = f, lo, hi, nan_ok, z
+            self.weight[i, :m] = [factorial(s) * factorial(m - s - 1) / factorial(m) for s in range(m)]
+
+        self.value = leaf_value[leaves]
+        # E[f] = Σ leaf value × share of training weight reaching the leaf
+        self.expected_value = float(offset + (self.value * self.z.prod(axis=1)).sum())
+        self.real = self.feature >= 0
+        # Position-major copies for _chunk: (D, 1, L) broadcasts over the rows
+        self._feature_t = np.ascontiguousarray(np.maximum(self.feature, 0).T)
+        for name in ("lo", "hi", "nan_ok", "z", "real"):
+            setattr(self, f"_{name}_t", np.ascontiguousarray(getattr(self, name).T[:, None, :]))
+        self._weight_t = np.ascontiguousarray(self.weight.T)
+
+        # Real path positions grouped by feature, so one reduceat sums them per feature
+        flat = self.feature.T.reshape(-1)
+        real = np.flatnonzero(flat >= 0)
+        self._order = real[np.argsort(flat[real], kind="stable")]
+        self._present, self._starts = np.unique(flat[self._order], return_index=True)
+
+    def shap_values(self, X: np.ndarray, n_features: int) -> np.ndarray:
+        """Contributions, shape (n_rows, n_features); each row sums to f(x) - expected_value."""
+        X = np.ascontiguousarray(np.asarray(X, dtype=np.float32))   # same cast as the trees
+        out = np.zeros((X.shape[0], n_features))
+        step = max(1, _CHUNK_ELEMENTS // self.feature.size)
+        for start in range(0, X.shape[0], step):
+            out[start:start + step] = self._chunk(X[start:start + step], n_features)
+        return out
+
+    def _chunk(self, X, n_features) -> np.ndarray:
+        # Arrays are laid out (path position or degree, row, leaf) so every step is contiguous
+        depth = self._feature_t.shape[0]
+        x = np.ascontiguousarray(X[:, self._feature_t].transpose(1, 0, 2))       # (D, n, L)
+        passed = ((x > self._lo_t) & (x <= self._hi_t)) | (np.isnan(x) & self._nan_ok_t)
+        passed &= self._real_t
+        o = passed.astype(np.float64)
+        z = self._z_t
+
+        # G(t) = Π_k (z_k + o_k t): coefficient s sums the coalitions of size s.
+        # After k factors the degree is at most k, so only the low terms are updated.
+        G = np.zeros((depth + 1,) + x.shape[1:])
+        G[0] = 1.0
+        for k in range(depth):
+            shifted = G[:k + 1] * o[k]
+            G[:k + 2] *= z[k]
+            G[1:k + 2] += shifted
+
+        # Σ_s weight(s) · [G without feature k's factor]_s, for every k at once.
+        # Failed test (o_k = 0): the factor is the constant z_k, so divide it out.
+        failed = np.einsum("sl,snl->nl", self._weight_t, G[:depth]) / z
+        # Passed (o_k = 1): divide by (z_k + t), coefficients from the top down.
+        coef = np.broadcast_to(G[depth], x.shape)
+        total = coef * self._weight_t[depth - 1]
+        for s in range(depth - 1, 0, -1):
+            coef = G[s] - z * coef
+            total += coef * self._weight_t[s - 1]
+        weighted = np.where(passed, total, failed)
+
+        phi = weighted * (o - z) * self.value                                     # (D, n, L)
+        phi = phi.transpose(1, 0, 2).reshape(X.shape[0], -1)[:, self._order]
+        out = np.zeros((X.shape[0], n_features))
+        out[:, self._present] = np.add.reduceat(phi, self._starts, axis=1)
+        return out
+
+
+def _walk(trees, root: int):
+    """(leaf, {feature: (lo, hi, nan_ok, z)}) for every leaf under root, depth first."""
+    stack = [(root, {})]
+    while stack:
+        node, conds = stack.pop()
+        left, right = int(trees.left[node]), int(trees.right[node])
+        if left == node:                                    # leaves point to themselves
+            yield node, conds
+            continue
+        f, thr, cover = int(trees.feature[node]), float(trees.threshold[node]), float(trees.cover[node])
+        missing_left = bool(trees.missing_left[node])
+        for child, goes_left in ((right, False), (left, True)):
+            lo, hi, nan_ok, z = conds.get(f, (-np.inf, np.inf, True, 1.0))
+            if goes_left:
+                hi, nan_ok = min(hi, thr), nan_ok and missing_left
+            else:
+                lo, nan_ok = max(lo, thr), nan_ok and not missing_left
+            share = float(trees.cover[child]) / cover if cover > 0 else 0.0
+            stack.append((child, {**conds, f: (lo, hi, nan_ok, z * share)}))
+
+
+class ModelExplainer:
+    """Leaf paths of both ensembles of one ModelSet, plus the cost scaler's mean / scale."""
+
+    def __init__(self, models):
+        try:
+            clf = compile_classifier(models.clf)
+            reg = compile_regressor(models.reg)
+            positive = list(np.asarray(clf.classes_)).index(1)
+            self.risk = LeafPaths(clf.trees, clf.trees.value[:, positive] / clf.trees.n_trees)
+            self.cost = LeafPaths(reg.trees, reg.learning_rate * reg.trees.value[:, 0], offset=reg.baseline)
+            self.cost_mean = float(np.ravel(models.scaler_y.mean_)[0])
+            self.cost_scale = float(np.ravel(models.scaler_y.scale_)[0])
+        except ExplainerUnavailable:
+            raise
+        except Exception as e:
+            raise ExplainerUnavailable(f"Models of version {models.version} cannot be explained: {e}") from e
+        self.features = list(models.feature_order)
+
+    def explain(self, X) -> tuple[np.ndarray, np.ndarray]:
+        """(risk contributions, cost contributions in log1p dollars), each (n_rows, n_features)."""
+        X = np.asarray(X)
+        return (self.risk.shap_values(X, len(self.features)),
+                self.cost.shap_values(X, len(self.features)) * self.cost_scale)
+
+    @property
+    def cost_base_value(self) -> float:
+        return self.cost_mean + self.cost_scale * self.cost.expected_value
+
+
+_explainers = weakref.WeakKeyDictionary()      # ModelSet → ModelExplainer
+_lock = threading.Lock()
+
+
+def explainer(models) -> ModelExplainer:
+    """The explainer of a model set, built on first use and kept as long as the set is."""
+    found = _explainers.get(models)
+    if found is None:
+        with _lock:
+            found = _explainers.get(models)
+            if found is None:
+                found = _explainers[models] = ModelExplainer(models)
+    return found
+
+
+def prepare(models):
+    """Precompute the leaf paths of a new model set (called from warmup); skipped if not explainable."""
+    try:
+        explainer(models)
+    except ExplainerUnavailable as e:
+        logger.info("Explanations disabled for %s: %s", models.version, e)
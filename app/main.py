@@ -1,76 +1,743 @@
 """
-FastAPI app — two endpoints:
-  POST /predict/classification  →  Risk_Category (0 Low / 1 High) + probability
-  POST /predict/regression      →  Expected_Claim_Cost in original dollars
+FastAPI app — endpoints:
+  POST /predict                       →  risk category + probability + claim cost in one call
+  POST /predict/batch                 →  same as above for a list of policies
+  POST /predict/classification        →  Risk_Category (0 Low / 1 High) + probability
+  POST /predict/regression            →  Expected_Claim_Cost in original dollars
+  POST /predict/classification/batch  →  same as above for a list of policies
+  POST /predict/regression/batch      →  same as above for a list of policies
+  POST /predict/upload                →  stream scores for a CSV / NDJSON portfolio file
+  POST /predict/columnar              →  columnar JSON / Arrow in, one array per result column out
+  POST /predict/sweep                 →  risk / cost surface over a grid of one or two fields
+  POST /explain                       →  prediction + TreeSHAP contributions per feature
+  POST /explain/batch                 →  same as above for a list of policies
+  POST /portfolio/simulate            →  Monte Carlo aggregate losses (mean / VaR / TVaR) of a policy file
+  GET  /model                         →  active model-artifact version
+  GET  /metrics                       →  Prometheus metrics (stage latencies, requests, errors)
+  GET  /drift                         →  live feature distributions vs the training profile (PSI / KS)
+  GET  /shadow                        →  shadow model set vs the active one (agreement, deltas)
+  POST /admin/reload                  →  hot-swap in the artifacts currently in models/
+  POST /admin/drift/reset             →  restart the drift statistics window
+  POST /admin/shadow/reload           →  (re)load the shadow set from SHADOW_MODELS_DIR
 """
 
+import contextlib
+import importlib.util
+import itertools
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import asynccontextmanager
+
 import numpy as np
-import joblib
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+from app.schemas import (
+    InsuranceInput, ClassificationResponse, RegressionResponse, PredictionResponse,
+    SweepRequest, SweepResponse, ExplanationResponse, PortfolioResponse, example_input,
+)
+from app.preprocess import preprocess_batch, sweep
+from app.registry import registry
+from app.batching import MicroBatcher, QueueFullError
+from app.executor import InferenceExecutor, ExecutorBusyError
+from app.cache import PredictionCache, DiskCache, cache_key
+from app.scoring import (
+    risk, cost, score_frame, result_records, read_chunks, read_columns, result_columns, write_arrow,
+    ARROW_TYPES,
+)
+from app import drift, explain, metrics, portfolio, shadow
+
+logger = logging.getLogger(__name__)
+
+# Micro-batching of concurrent single-policy requests — see app/batching.py
+BATCHING_ENABLED   = os.getenv("BATCHING_ENABLED", "1") == "1"
+BATCH_MAX_SIZE     = int(os.getenv("BATCH_MAX_SIZE", "64"))
+BATCH_MAX_WAIT_MS  = float(os.getenv("BATCH_MAX_WAIT_MS", "2"))
+BATCH_MAX_QUEUE    = int(os.getenv("BATCH_MAX_QUEUE", "1024"))
+
+# Inference executor — see app/executor.py. By default the cores are split
+# between gunicorn workers, one scoring thread per core, BLAS / OpenMP single-threaded.
+INFERENCE_WORKERS      = int(os.getenv("INFERENCE_WORKERS") or
+                             max(1, (os.cpu_count() or 1) // int(os.getenv("WEB_CONCURRENCY", "1"))))
+INFERENCE_MAX_QUEUE    = int(os.getenv("INFERENCE_MAX_QUEUE", "64"))
+INFERENCE_BLAS_THREADS = int(os.getenv("INFERENCE_BLAS_THREADS", "1"))
+
+# Prediction cache — see app/cache.py. Size 0 disables it; a directory enables
+# the SQLite backend shared by all workers on the host.
+CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+CACHE_TTL  = float(os.getenv("PREDICTION_CACHE_TTL", "300"))
+CACHE_DIR  = os.getenv("PREDICTION_CACHE_DIR")
+
+# Rows per chunk when scoring uploaded portfolio files
+UPLOAD_CHUNK_ROWS = int(os.getenv("UPLOAD_CHUNK_ROWS", "5000"))
+
+# Portfolio simulation — see app/portfolio.py. One simulation at a time per
+# worker, on its own threads; policies × scenarios above the cap are refused.
+PORTFOLIO_THREADS   = int(os.getenv("PORTFOLIO_THREADS") or INFERENCE_WORKERS)
+PORTFOLIO_MAX_DRAWS = int(float(os.getenv("PORTFOLIO_MAX_DRAWS", "1e9")))
+
+# Shared secret for /admin endpoints; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+if CACHE_SIZE <= 0:
+    _cache = None
+elif CACHE_DIR:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _cache = DiskCache(os.path.join(CACHE_DIR, "predictions.sqlite"), max_size=CACHE_SIZE, ttl=CACHE_TTL)
+else:
+    _cache = PredictionCache(max_size=CACHE_SIZE, ttl=CACHE_TTL)
+
+
+# ── Scoring — every function takes the ModelSet it should use ─────────────────
+def _risk_fields(pred, prob) -> dict:
+    return {
+        "risk_category": int(pred),
+        "risk_label":    "High Risk" if pred == 1 else "Low Risk",
+        "probability":   round(float(prob), 4),
+    }
+
+
+def _classify(X, models) -> list[ClassificationResponse]:
+    preds, probs = risk(X, models)
+    return [ClassificationResponse(**_risk_fields(p, q)) for p, q in zip(preds, probs)]
+
+
+def _regress(X, models) -> list[RegressionResponse]:
+    return [RegressionResponse(expected_claim_cost=round(float(c), 2)) for c in cost(X, models)]
+
+
+def _predict(X, models) -> list[PredictionResponse]:
+    preds, probs = risk(X, models)
+    costs = cost(X, models)
+    return [
+        PredictionResponse(**_risk_fields(p, q), expected_claim_cost=round(float(c), 2))
+        for p, q, c in zip(preds, probs, costs)
+    ]
+
+
+def _explain(X, models) -> list[ExplanationResponse]:
+    """Predictions and their TreeSHAP breakdown, one vectorized pass per ensemble."""
+    explainer = explain.explainer(models)
+    preds, probs = risk(X, models)
+    costs = cost(X, models)
+    with metrics.stage("explain"):
+        risk_phi, cost_phi = explainer.explain(X)
+    features = explainer.features
+    return [
+        ExplanationResponse(
+            **_risk_fields(p, q),
+            risk_base_value=round(explainer.risk.expected_value, 6),
+            risk_contributions=dict(zip(features, np.round(r, 6).tolist())),
+            expected_claim_cost=round(float(c), 2),
+            cost_base_value=round(explainer.cost_base_value, 6),
+            cost_contributions=dict(zip(features, np.round(g, 6).tolist())),
+        )
+        for p, q, c, r, g in zip(preds, probs, costs, risk_phi, cost_phi)
+    ]
+
+
+def _run(score, records) -> list:
+    """
+    Preprocess + score with one ModelSet; each result is tagged with its version
+    and the stage timings of the call, which every request in a batch shares.
+    """
+    models = registry.current
+    with metrics.collect() as stages:
+        X = preprocess_batch(records, models, observe=True)
+        results = score(X, models)
+    _shadow(X, records, results, models)
+    return [(models.version, r.model_dump(), stages) for r in results]
+
+
+def _shadow(X, records, results, models):
+    """Hand a scored batch to the shadow set (app/shadow.py); dropped while requests wait for a thread."""
+    shadow.submit(X, records, results, models, busy=_inference.waiting > 0)
+
+
+def _warmup(models):
+    """
+    Exercise every code path of a new ModelSet before it goes live, at a single-row
+    and a batch size, so the first real request pays no lazy-initialization cost.
+    """
+    for n in (1, 16):
+        _predict(preprocess_batch([example_input()] * n, models, observe=False), models)
+    explain.prepare(models)         # TreeSHAP leaf paths of this version
+    drift.prepare(models)           # reference profile the live traffic is compared with
+
+
+registry.warmup = _warmup
+
+
+_inference = InferenceExecutor(INFERENCE_WORKERS, INFERENCE_MAX_QUEUE, INFERENCE_BLAS_THREADS)
 
-from app.schemas import InsuranceInput, ClassificationResponse, RegressionResponse
-from app.preprocess import preprocess
-
-# ── Load models once at startup ────────────────────────────────────────────────
-try:
-    _clf     = joblib.load("models/rf_classifier.joblib")
-    _reg     = joblib.load("models/gb_regressor.joblib")
-    _scaler_y = joblib.load("models/scaler_y.joblib")
-except FileNotFoundError as e:
-    raise RuntimeError(
-        f"Model file not found: {e}. "
-        "Run `python save_models.py` first to generate the models/ folder."
+
+def _batched(score):
+    """Micro-batcher that preprocesses and scores a list of InsuranceInput."""
+    return MicroBatcher(
+        lambda records: _run(score, records),
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+        max_queue=BATCH_MAX_QUEUE,
+        executor=_inference,
     )
 
+
+def _overloaded(e: QueueFullError) -> HTTPException:
+    """429 when the inference queue is full (retry shortly), 503 when the batch queue is."""
+    if isinstance(e, ExecutorBusyError):
+        metrics.error("overloaded")
+        return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    metrics.error("queue_full")
+    return HTTPException(status_code=503, detail=str(e))
+
+
+_batchers = {score: _batched(score) for score in (_predict, _classify, _regress, _explain)}
+
+
+def _unavailable(e: Exception) -> HTTPException:
+    metrics.error("unavailable")
+    return HTTPException(status_code=503, detail=str(e))
+
+
+async def _cache_io(fn, *args):
+    """Cache call from the event loop; the SQLite backend's file I/O goes to the threadpool."""
+    if _cache.blocking:
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
+
+
+async def _score_one(score, data: InsuranceInput, response: Response):
+    """
+    Score one policy: served from the cache when possible, otherwise coalesced
+    with concurrent requests unless batching is off.
+    """
+    metrics.mark("validate")
+    version = registry.current.version
+    if _cache is not None and (hit := await _cache_io(_cache.get, cache_key(data, score.__name__, version))) is not None:
+        response.headers["X-Model-Version"] = version
+        return hit
+    try:
+        if BATCHING_ENABLED:
+            version, result, stages = await _batchers[score].submit(data)
+        else:
+            version, result, stages = (await _inference.run(_run, score, [data]))[0]
+    except QueueFullError as e:
+        raise _overloaded(e)
+    except explain.ExplainerUnavailable as e:
+        raise _unavailable(e)
+    except Exception as e:
+        metrics.error(type(e).__name__)
+        raise HTTPException(status_code=422, detail=str(e))
+    metrics.merge(stages)
+    if _cache is not None:
+        await _cache_io(_cache.set, cache_key(data, score.__name__, version), result)
+    response.headers["X-Model-Version"] = version
+    return result
+
+
+async def _score_many(score, data: list[InsuranceInput], response: Response) -> list:
+    """Score a list of policies on an inference thread."""
+    metrics.mark("validate")
+    try:
+        return await _inference.run(_score_list, score, data, response)
+    except ExecutorBusyError as e:
+        raise _overloaded(e)
+    except explain.ExplainerUnavailable as e:
+        raise _unavailable(e)
+
+
+def _score_list(score, data: list[InsuranceInput], response: Response) -> list:
+    """Only cache misses go through preprocessing and the models."""
+    models = registry.current
+    response.headers["X-Model-Version"] = models.version
+    if not data:
+        return []
+    if _cache is None:
+        keys, results = [None] * len(data), [None] * len(data)
+    else:
+        keys = [cache_key(d, score.__name__, models.version) for d in data]
+        results = [_cache.get(k) for k in keys]
+    misses = [i for i, r in enumerate(results) if r is None]
+    if misses:
+        records = [data[i] for i in misses]
+        try:
+            X = preprocess_batch(records, models, observe=True)
+            scored = score(X, models)
+        except explain.ExplainerUnavailable:
+            raise
+        except Exception as e:
+            metrics.error(type(e).__name__)
+            raise HTTPException(status_code=422, detail=str(e))
+        _shadow(X, records, scored, models)
+        for i, r in zip(misses, scored):
+            results[i] = r.model_dump()
+            if keys[i] is not None:
+                _cache.set(keys[i], results[i])
+    return results
+
+
 # ── App ────────────────────────────────────────────────────────────────────────
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load and warm up the model set before the first request, then watch models/
+    await run_in_threadpool(lambda: registry.current)
+    if shadow.SHADOW_MODELS_DIR:
+        try:
+            await run_in_threadpool(shadow.load)
+        except Exception:
+            # The active set serves regardless; retry with POST /admin/shadow/reload
+            logger.exception("Shadow model set from %s not loaded", shadow.SHADOW_MODELS_DIR)
+    registry.start_watching()
+    yield
+    registry.stop_watching()
+
+
 app = FastAPI(
     title="Insurance Risk Modeling API",
     description="Predict property insurance risk category and expected claim cost.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+app.add_middleware(metrics.MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Model-Version", "Server-Timing"],
 )
 
 
+@app.exception_handler(RequestValidationError)
+async def _validation_failed(request: Request, exc: RequestValidationError):
+    metrics.error("validation")
+    return await request_validation_exception_handler(request, exc)
+
+
 @app.get("/")
 def root():
     return {"message": "Insurance Risk API is running. Visit /docs for the interactive UI."}
 
 
-@app.post("/predict/classification", response_model=ClassificationResponse)
-def predict_classification(data: InsuranceInput):
-    """Predict whether the property is Low Risk (0) or High Risk (1)."""
+def _process_memory() -> dict:
+    """
+    This worker's memory in MB from /proc/self/smaps_rollup. Shared pages (memory-
+    mapped engine arrays, pages inherited from a preloading parent) count fully
+    in rss but are split between sharers in pss.
+    """
+    fields = {"Rss": "rss", "Pss": "pss", "Shared_Clean": "shared_clean",
+              "Shared_Dirty": "shared_dirty", "Private_Clean": "private_clean",
+              "Private_Dirty": "private_dirty"}
     try:
-        X = preprocess(data)
-        pred = int(_clf.predict(X)[0])
-        prob = float(_clf.predict_proba(X)[0][1])
-        return ClassificationResponse(
-            risk_category=pred,
-            risk_label="High Risk" if pred == 1 else "Low Risk",
-            probability=round(prob, 4),
+        with open("/proc/self/smaps_rollup") as f:
+            rows = [line.split() for line in f if line.split()[0].rstrip(":") in fields]
+    except OSError:
+        return {}
+    return {fields[r[0].rstrip(":")]: round(int(r[1]) / 1024, 1) for r in rows}
+
+
+@app.get("/model")
+def model_info():
+    """Active model-artifact version and where it was loaded from."""
+    models = registry.current
+    return {
+        "model_version": models.version,
+        "engine":        models.engine,
+        "source":        models.source,
+        "models_dir":    registry.models_dir,
+        "loaded_at":     models.loaded_at,
+        "load_seconds":   models.load_seconds,
+        "warmup_seconds": models.warmup_seconds,
+        "time_to_first_prediction": registry.time_to_first_prediction,
+        "pid":           os.getpid(),
+        "memory_mb":     _process_memory(),
+        "reloads":       registry.reloads,
+        "reload_errors": registry.reload_errors,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """
+    Prometheus text format: per-stage latency histograms (including queue_wait),
+    request and error counters by route, inference / batch queue depth and the
+    active model version. Per worker process.
+    """
+    models = registry.current
+    executor = _inference.stats()
+    p = metrics.PREFIX
+    extra = (
+        metrics.sample(f"{p}_inference_queue_depth", "Calls waiting for an inference thread.", executor["waiting"])
+        + metrics.sample(f"{p}_inference_running", "Calls running on an inference thread.", executor["running"])
+        + metrics.sample(f"{p}_inference_rejected_total", "Calls refused with 429.", executor["rejected"],
+                         kind="counter")
+        + metrics.sample(f"{p}_batch_queue_depth", "Single-policy requests waiting for a micro-batch.",
+                         sum(b.queue_depth for b in _batchers.values()))
+        + metrics.sample(f"{p}_model_info", "Active model-artifact version.", 1,
+                         version=models.version, engine=models.engine, source=models.source)
+        + metrics.sample(f"{p}_model_reloads_total", "Model sets swapped in.", registry.reloads, kind="counter")
+        + metrics.sample(f"{p}_model_reload_errors_total", "Failed reload attempts.", registry.reload_errors,
+                         kind="counter")
+    )
+    runner = shadow.runner
+    if runner is not None:
+        extra += (
+            metrics.sample(f"{p}_shadow_queue_depth", "Batches waiting for the shadow model set.", runner.pending)
+            + metrics.sample(f"{p}_shadow_dropped_rows_total", "Rows not compared because the shadow was busy.",
+                             runner.dropped, kind="counter")
         )
+    return PlainTextResponse(metrics.render(extra), media_type="text/plain; version=0.0.4")
+
+
+def _check_admin(token: str | None):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them")
+    if token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.post("/admin/reload")
+def reload_models(force: bool = False, x_admin_token: str | None = Header(default=None)):
+    """
+    Load the artifacts currently in models/, warm them up and swap them in.
+    Requests already running finish on the previous version.
+    """
+    _check_admin(x_admin_token)
+    try:
+        reloaded = registry.reload(force=force)
     except Exception as e:
-        raise HTTPException(status_code=422, detail=str(e))
+        registry.reload_errors += 1
+        raise HTTPException(status_code=500, detail=f"Reload failed, previous models still active: {e}")
+    return {"reloaded": reloaded, "model_version": registry.current.version}
+
+
+@app.get("/drift")
+def drift_report():
+    """
+    Feature drift of the traffic scored by the active model version since it went
+    live (or the last reset), in this worker. Numeric features: live mean / std and
+    PSI / KS of the scaled values against the reference profile. Categorical ones:
+    class counts, unseen labels that fell back to class 0, and PSI. `drifted` lists
+    the features with PSI at or above `psi_alert`.
+    """
+    if not drift.DRIFT_MONITOR:
+        return {"enabled": False}
+    return {"enabled": True, **drift.monitor(registry.current).report()}
+
+
+@app.post("/admin/drift/reset")
+def reset_drift(x_admin_token: str | None = Header(default=None)):
+    """Clear the drift statistics of the active version and start a new window."""
+    _check_admin(x_admin_token)
+    drift.monitor(registry.current).reset()
+    return {"reset": True, "model_version": registry.current.version}
+
+
+@app.get("/shadow")
+def shadow_report():
+    """
+    The shadow model set scored next to the active one, in this worker: rows
+    compared since the active version went live (or the shadow was loaded),
+    risk_category agreement and its 2×2 table, probability and cost deltas
+    (shadow − active), and the rows dropped because its queue was full or
+    requests were waiting.
+    """
+    runner = shadow.runner
+    if runner is None:
+        return {"enabled": False}
+    return {"enabled": True, **runner.report()}
+
+
+@app.post("/admin/shadow/reload")
+def reload_shadow(x_admin_token: str | None = Header(default=None)):
+    """Load SHADOW_MODELS_DIR again (e.g. a new candidate) and restart the shadow statistics."""
+    _check_admin(x_admin_token)
+    if not shadow.SHADOW_MODELS_DIR:
+        raise HTTPException(status_code=409, detail="No shadow model set configured; set SHADOW_MODELS_DIR")
+    try:
+        runner = shadow.load()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Shadow reload failed: {e}")
+    return {"reloaded": True, "shadow_version": runner.models.version}
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit / miss / eviction counters of the prediction cache."""
+    if _cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "model_version": registry.current.version, **_cache.stats()}
+
+
+@app.post("/predict", response_model=PredictionResponse)
+async def predict(data: InsuranceInput, response: Response):
+    """Risk category, probability and expected claim cost from one preprocessing pass."""
+    return await _score_one(_predict, data, response)
+
+
+@app.post("/predict/batch", response_model=list[PredictionResponse])
+async def predict_batch(data: list[InsuranceInput], response: Response):
+    """Risk and cost for many policies with a single call to each model."""
+    return await _score_many(_predict, data, response)
+
+
+@app.post("/predict/classification", response_model=ClassificationResponse)
+async def predict_classification(data: InsuranceInput, response: Response):
+    """Predict whether the property is Low Risk (0) or High Risk (1)."""
+    return await _score_one(_classify, data, response)
 
 
 @app.post("/predict/regression", response_model=RegressionResponse)
-def predict_regression(data: InsuranceInput):
+async def predict_regression(data: InsuranceInput, response: Response):
     """Predict the expected claim cost in original dollar scale."""
+    return await _score_one(_regress, data, response)
+
+
+@app.post("/predict/classification/batch", response_model=list[ClassificationResponse])
+async def predict_classification_batch(data: list[InsuranceInput], response: Response):
+    """Predict the risk category for many policies with a single model call."""
+    return await _score_many(_classify, data, response)
+
+
+@app.post("/predict/regression/batch", response_model=list[RegressionResponse])
+async def predict_regression_batch(data: list[InsuranceInput], response: Response):
+    """Predict the expected claim cost for many policies with a single model call."""
+    return await _score_many(_regress, data, response)
+
+
+@app.post("/explain", response_model=ExplanationResponse)
+async def explain_one(data: InsuranceInput, response: Response):
+    """
+    Why a policy got its scores: the prediction plus each model feature's TreeSHAP
+    contribution to the High Risk probability and to log(1 + expected claim cost).
+    Exact path-dependent TreeSHAP, as shap.TreeExplainer; repeated inputs are cached.
+    """
+    return await _score_one(_explain, data, response)
+
+
+@app.post("/explain/batch", response_model=list[ExplanationResponse])
+async def explain_batch(data: list[InsuranceInput], response: Response):
+    """Explanations for many policies, computed together in one vectorized pass."""
+    return await _score_many(_explain, data, response)
+
+
+def _upload_format(file: UploadFile, fmt: str | None) -> str:
+    if fmt:
+        return fmt
+    name = (file.filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in (file.content_type or ""):
+        return "ndjson"
+    return "csv"
+
+
+def _next_scored(chunks, models, start: int):
+    """Read and score the next chunk of an upload (None at the end of the file)."""
+    chunk = next(chunks, None)
+    return None if chunk is None else score_frame(chunk, models, start)
+
+
+@app.post("/predict/upload")
+async def predict_upload(file: UploadFile, format: str | None = None, chunk_rows: int = UPLOAD_CHUNK_ROWS):
+    """
+    Score a whole portfolio file in the Property Insurance.csv layout (CSV, or
+    NDJSON with one policy per line). The file is read in chunks of chunk_rows,
+    and results stream back as NDJSON, one line per input row in input order,
+    keyed by Customer_ID. Memory stays flat regardless of file size.
+    Rows with missing values get an `error` line instead of a score.
+
+    Every chunk is read and scored on the inference executor, like any other
+    model call: a full queue before the first chunk is a 429, later on it ends
+    the stream with an error line.
+    """
+    fmt = _upload_format(file, format)
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=422, detail=f"Unsupported format {fmt!r}; use 'csv' or 'ndjson'.")
+    models = registry.current          # one version for the whole file
+
+    # Own copy of the upload so it outlives the request handler while streaming
+    spool = tempfile.TemporaryFile()
+    await run_in_threadpool(shutil.copyfileobj, file.file, spool)
+    spool.seek(0)
+    chunks = read_chunks(spool, fmt, max(1, chunk_rows))
     try:
-        X = preprocess(data)
-        pred_scaled = _reg.predict(X)
-        # Inverse pipeline: StandardScaler → inverse log1p
-        cost = float(
-            np.expm1(
-                _scaler_y.inverse_transform(pred_scaled.reshape(-1, 1))
-            ).flatten()[0]
-        )
-        return RegressionResponse(expected_claim_cost=round(cost, 2))
+        first = await _inference.run(_next_scored, chunks, models, 0)
+    except ExecutorBusyError as e:
+        chunks.close()
+        spool.close()
+        raise _overloaded(e)
+    except Exception as e:
+        first = e                       # reported in the stream, as for later chunks
+
+    async def stream():
+        scored, start = first, 0
+        try:
+            while scored is not None:
+                if isinstance(scored, Exception):
+                    raise scored
+                for record in result_records(scored):
+                    yield json.dumps(record) + "\n"
+                start += len(scored)
+                scored = await _inference.run(_next_scored, chunks, models, start)
+        except Exception as e:
+            yield json.dumps({"error": str(e), "rows_processed": start}) + "\n"
+        finally:
+            chunks.close()
+            spool.close()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson",
+                             headers={"X-Model-Version": models.version})
+
+
+def _score_columns(body: bytes, content_type: str, arrow_out: bool, models) -> tuple[bytes, str]:
+    """Decode, validate per column, score and encode — all off the event loop."""
+    with metrics.stage("decode"):
+        df = read_columns(body, content_type)
+    out = score_frame(df, models)
+    with metrics.stage("encode_response"):
+        if arrow_out:
+            return write_arrow(out), ARROW_TYPES[0]
+        return json.dumps(result_columns(out)).encode(), "application/json"
+
+
+@app.post("/predict/columnar")
+async def predict_columnar(request: Request):
+    """
+    Score many policies sent column-wise: a JSON object with one array per field
+    ({"age": [45, 31], "gender": ["Male", "Female"], ...}) or an Arrow IPC stream /
+    file (Content-Type application/vnd.apache.arrow.stream or .file; needs pyarrow).
+    Each column is checked at once against the InsuranceInput Field constraints;
+    rows that fail get an `error` instead of a score, as in /predict/upload.
+
+    The result is columnar too: {"Customer_ID": [...], "risk_category": [...],
+    "risk_label": [...], "probability": [...], "expected_claim_cost": [...],
+    "error": [...]}, or an Arrow stream when Accept asks for one.
+    """
+    content_type = (request.headers.get("content-type") or "application/json").split(";")[0].strip().lower()
+    if content_type not in ("application/json", *ARROW_TYPES):
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Type {content_type!r}; "
+                                                    f"use application/json or {' / '.join(ARROW_TYPES)}.")
+    arrow_out = ARROW_TYPES[0] in request.headers.get("accept", "")
+    if (content_type in ARROW_TYPES or arrow_out) and importlib.util.find_spec("pyarrow") is None:
+        raise HTTPException(status_code=415, detail="Arrow is not available on this server (no pyarrow); "
+                                                    "send and accept application/json.")
+    body = await request.body()
+    metrics.mark("receive")
+    models = registry.current
+    try:
+        content, media_type = await _inference.run(_score_columns, body, content_type, arrow_out, models)
+    except ExecutorBusyError as e:
+        raise _overloaded(e)
+    except Exception as e:
+        metrics.error(type(e).__name__)
+        raise HTTPException(status_code=422, detail=str(e))
+    return Response(content, media_type=media_type, headers={"X-Model-Version": models.version})
+
+
+def _sweep(req: SweepRequest, models) -> SweepResponse:
+    """Score the full grid (vary[0] major) as one batch built from one preprocessed row."""
+    axes = [axis.values for axis in req.vary]
+    points = list(itertools.product(*axes))
+    grid = {axis.field: [p[i] for p in points] for i, axis in enumerate(req.vary)}
+    X = sweep(req.base, grid, models)
+    preds, probs = risk(X, models)
+    costs = cost(X, models)
+    shape = [len(a) for a in axes]
+    return SweepResponse(
+        model_version=models.version,
+        fields=[axis.field for axis in req.vary],
+        values=axes,
+        risk_category=preds.astype(int).reshape(shape).tolist(),
+        probability=np.round(probs, 4).reshape(shape).tolist(),
+        expected_claim_cost=np.round(costs, 2).reshape(shape).tolist(),
+    )
+
+
+@app.post("/predict/sweep", response_model=SweepResponse)
+async def predict_sweep(req: SweepRequest, response: Response):
+    """
+    What-if analysis: the base policy scored at every combination of the values
+    given for one or two fields (up to 50 each), e.g. building_age 0–100 against
+    has_security_system Yes / No. The base row is preprocessed once, only the
+    varied features are recomputed, and the grid is scored as one batch.
+    """
+    metrics.mark("validate")
+    models = registry.current
+    try:
+        result = await _inference.run(_sweep, req, models)
+    except ExecutorBusyError as e:
+        raise _overloaded(e)
     except Exception as e:
+        metrics.error(type(e).__name__)
         raise HTTPException(status_code=422, detail=str(e))
+    response.headers["X-Model-Version"] = models.version
+    return result
+
+
+_simulation = threading.Semaphore(1)
+
+
+@app.post("/portfolio/simulate", response_model=PortfolioResponse)
+async def portfolio_simulate(file: UploadFile, format: str | None = None, scenarios: int = 10_000,
+                             group_by: list[str] = Query(default=list(portfolio.GROUP_COLUMNS)),
+                             quantiles: list[float] = Query(default=list(portfolio.QUANTILES)),
+                             sigma: float = portfolio.SEVERITY_SIGMA, seed: int = 0):
+    """
+    Aggregate claim cost of a whole portfolio file (Property Insurance.csv layout,
+    CSV or NDJSON). Every policy is scored, then `scenarios` Monte Carlo draws of
+    claim (Bernoulli of the High Risk probability) × severity (lognormal with the
+    expected claim cost as mean, log-space spread `sigma`) are summed for the
+    portfolio and for each level of every `group_by` column. Returns the mean, VaR
+    and TVaR at each quantile next to the analytic expected loss. Rows that fail
+    validation are counted in `errors` and left out.
+    """
+    fmt = _upload_format(file, format)
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=422, detail=f"Unsupported format {fmt!r}; use 'csv' or 'ndjson'.")
+    unknown = [c for c in group_by if c not in portfolio.GROUP_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Cannot group by {', '.join(unknown)}; "
+                                                    f"use {', '.join(portfolio.GROUP_COLUMNS)}.")
+    if scenarios < 1 or not 0 < sigma <= 5 or not all(0 < q < 1 for q in quantiles):
+        raise HTTPException(status_code=422, detail="Need scenarios ≥ 1, 0 < sigma ≤ 5 and quantiles in (0, 1).")
+    if scenarios > PORTFOLIO_MAX_DRAWS:
+        raise HTTPException(status_code=422, detail=f"{scenarios:,} scenarios is over the limit of "
+                                                    f"{PORTFOLIO_MAX_DRAWS:,} draws; use python -m app.portfolio.")
+    if not _simulation.acquire(blocking=False):
+        metrics.error("overloaded")
+        raise HTTPException(status_code=429, detail="A portfolio simulation is already running",
+                            headers={"Retry-After": "5"})
+    try:
+        models = registry.current
+        try:
+            scored = await _inference.run(_score_portfolio, file.file, fmt, models, group_by,
+                                          PORTFOLIO_MAX_DRAWS // scenarios)
+        except ExecutorBusyError as e:
+            raise _overloaded(e)
+        except portfolio.TooManyPolicies as e:     # given up as soon as the draw limit was crossed
+            raise HTTPException(status_code=422, detail=f"{e} × {scenarios:,} scenarios is over the limit of "
+                                                        f"{PORTFOLIO_MAX_DRAWS:,} draws; use fewer scenarios "
+                                                        "or python -m app.portfolio.")
+        except Exception as e:
+            metrics.error(type(e).__name__)
+            raise HTTPException(status_code=422, detail=str(e))
+        with metrics.stage("simulate"):
+            report = await run_in_threadpool(portfolio.summarize, scored, group_by, scenarios, sigma,
+                                             quantiles, seed, PORTFOLIO_THREADS)
+    finally:
+        _simulation.release()
+    return {"model_version": models.version, **report}
+
+
+def _score_portfolio(file, fmt, models, group_by, max_rows):
+    # Closed here, while the upload is still open, when scoring stops early
+    with contextlib.closing(read_chunks(file, fmt, UPLOAD_CHUNK_ROWS)) as chunks:
+        return portfolio.score_portfolio(chunks, models, group_by, max_rows)
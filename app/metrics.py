@@ -0,0 +1,227 @@
+"""
+Hot-path instrumentation — Prometheus text exposition and Server-Timing headers.
+
+    with stage("encode"):           # time a block: stage histogram + this request's timings
+        ...
+    mark("validate")                # time since the request started (body read + Pydantic)
+
+MetricsMiddleware opens a per-request timing record, counts every response by
+route and status, and writes the stages that ran for the request into a
+`Server-Timing` header (milliseconds). render() produces the /metrics body.
+
+Counters and histograms are plain dicts behind one lock: an update is a bisect
+and two additions, cheap next to a model call. Each gunicorn worker keeps
+its own registry, so a scrape sees the worker that answered it.
+"""
+
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+
+PREFIX = "insurance_api"
+
+# Latency buckets in seconds, 0.1 ms … 10 s
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, as Prometheus expects."""
+
+    def __init__(self, name: str, help: str, labels: tuple, buckets=BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self._series = {}           # label values → [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def lines(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                out.append(f"{self.name}_bucket{_labels(self.labels, labels, le=le)} {cumulative}")
+            out.append(f"{self.name}_sum{_labels(self.labels, labels)} {series[-1]:.6f}")
+            out.append(f"{self.name}_count{_labels(self.labels, labels)} {cumulative}")
+        return out
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple):
+        self.name, self.help, self.labels = name, help, labels
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: int = 1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def value(self, *labels) -> int:
+        return self._series.get(labels, 0)
+
+    def lines(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._series.items())
+        out += [f"{self.name}{_labels(self.labels, labels)} {value}" for labels, value in items]
+        return out
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, **extra) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}" if pairs else ""
+
+
+def sample(name: str, help: str, value, kind: str = "gauge", **labels) -> list[str]:
+    """A single gauge / counter whose value is read at scrape time."""
+    return [f"# HELP {name} {help}", f"# TYPE {name} {kind}",
+            f"{name}{_labels(tuple(labels), tuple(labels.values()))} {value}"]
+
+
+REQUESTS = Counter(f"{PREFIX}_requests_total", "HTTP requests by route and status.", ("method", "path", "status"))
+ERRORS = Counter(f"{PREFIX}_errors_total", "Failed requests by route and cause.", ("path", "type"))
+REQUEST_SECONDS = Histogram(f"{PREFIX}_request_duration_seconds", "End-to-end request latency.", ("path",))
+STAGE_SECONDS = Histogram(f"{PREFIX}_stage_duration_seconds",
+                          "Time spent in each scoring stage (per call, whole batch).", ("stage",))
+
+
+# ── Per-request timings ───────────────────────────────────────────────────────
+class _Timings:
+    __slots__ = ("start", "stages", "error", "observe")
+
+    def __init__(self, observe: bool = True):
+        self.start = time.perf_counter()
+        self.stages = {}            # stage → seconds, summed if a stage runs twice
+        self.error = None
+        self.observe = observe      # False: keep the stages out of the STAGE_SECONDS histograms
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+def record(name: str, seconds: float):
+    timings = _current.get()
+    if timings is None or timings.observe:
+        STAGE_SECONDS.observe(seconds, name)
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """Time the enclosed block as stage `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def mark(name: str):
+    """Record the time since the current request started as stage `name`."""
+    timings = _current.get()
+    if timings is not None:
+        record(name, time.perf_counter() - timings.start)
+
+
+@contextlib.contextmanager
+def collect(observe: bool = True):
+    """
+    Collect the stages of the enclosed block into a fresh dict, for work done on
+    behalf of other requests (a micro-batch); hand it to merge() in each of them.
+    observe=False keeps them out of the stage histograms (background work such as
+    shadow scoring, which no request waits for).
+    """
+    timings = _Timings(observe)
+    token = _current.set(timings)
+    try:
+        yield timings.stages
+    finally:
+        _current.reset(token)
+
+
+def merge(stages: dict):
+    """Add stages timed elsewhere (see collect) to the current request, without re-observing them."""
+    timings = _current.get()
+    if timings is not None:
+        for name, seconds in stages.items():
+            timings.add(name, seconds)
+
+
+def error(kind: str):
+    """Tag the current request as failed because of `kind` (counted once it completes)."""
+    timings = _current.get()
+    if timings is not None:
+        timings.error = kind
+
+
+def server_timing(stages: dict, total: float) -> str:
+    parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in stages.items()]
+    return ", ".join(parts + [f"total;dur={total * 1000:.3f}"])
+
+
+class MetricsMiddleware:
+    """ASGI middleware: per-request timing record, request / error counters, Server-Timing."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        timings = _Timings()
+        token = _current.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = server_timing(timings.stages, time.perf_counter() - timings.start)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except Exception:
+            timings.error = timings.error or "unhandled"
+            raise
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            REQUESTS.inc(scope["method"], path, str(status))
+            REQUEST_SECONDS.observe(time.perf_counter() - timings.start, path)
+            if timings.error is None and status >= 500:
+                timings.error = "server_error"
+            if timings.error is not None:
+                ERRORS.inc(path, timings.error)
+
+
+def render(extra: list[str] = ()) -> str:
+    """Prometheus text exposition (version 0.0.4) of every metric, plus `extra` lines."""
+    lines = []
+    for metric in (REQUESTS, ERRORS, REQUEST_SECONDS, STAGE_SECONDS):
+        lines += metric.lines()
+    lines += extra
+    return "\n".join(lines) + "\n"
@@ -5,17 +5,24 @@ Mirrors the preprocessing pipeline from notebook.ipynb:
   3. log1p transform skewed columns
   4. Reorder columns to match X_train
   5. StandardScaler on numerical features only
+If the model set was trained with External Variables.csv, the State_* features
+of the policy's location are joined in from its precomputed index
+(app/enrichment.py) between steps 3 and 4.
+
+Artifacts come from a ModelSet (app/registry.py); by default the registry's
+active set, so encoders, scaler and feature order always share one version.
+Each step is timed as a stage in app/metrics.py (features, encode, frame, scale).
+Called with observe=True (the online /predict* and /explain* paths only), a frame
+is also folded into the drift statistics of its model set (app/drift.py, stage
+`drift`); offline scoring, sweeps and warmup leave the monitor alone.
 """
 
 import numpy as np
 import pandas as pd
-import joblib
 
-# ── Load saved artifacts once at import time ─────────────────────────────────
-_scaler_X       = joblib.load("models/scaler_X.joblib")
-_label_encoders = joblib.load("models/label_encoders.joblib")
-_scale_features = joblib.load("models/scale_features.joblib")
-_feature_order  = joblib.load("models/feature_order.joblib")
+from app import drift
+from app.metrics import stage
+from app.registry import registry
 
 # Categorical columns that need label encoding (exclude targets + dropped cols)
 _ENCODE_COLS = [
@@ -25,53 +32,155 @@ _ENCODE_COLS = [
 ]
 
 
-def preprocess(data) -> np.ndarray:
+# InsuranceInput field for each raw column consumed by the pipeline
+_INPUT_FIELDS = [
+    'age', 'gender', 'marital_status', 'urbanization_level', 'policy_term',
+    'claim_frequency', 'maintenance_level', 'building_age',
+    'customer_satisfaction', 'has_security_system', 'construction_type',
+    'policy_tenure', 'payment_method', 'credit_score', 'fire_risk_score',
+    'flood_risk_index', 'crime_rate_index', 'annual_income', 'property_value',
+    'premium_amount', 'claim_amount_last',
+]
+
+# Column name in Property Insurance.csv for each field (age → Age, flood_risk_index → Flood_Risk_Index)
+RAW_COLUMNS = {f: f.title() for f in _INPUT_FIELDS}
+
+# Optional: only used to join the enrichment index
+LOCATION_FIELD, LOCATION_COLUMN = 'location', 'Location'
+
+
+def preprocess(data, models=None, observe: bool = False) -> pd.DataFrame:
     """
-    Convert a raw InsuranceInput into a scaled numpy array ready for prediction.
+    Convert a raw InsuranceInput into a scaled one-row DataFrame ready for prediction.
     """
-    row = {
-        'Age':                   data.age,
-        'Gender':                data.gender,
-        'Marital_Status':        data.marital_status,
-        'Urbanization_Level':    data.urbanization_level,
-        'Policy_Term':           data.policy_term,
-        'Claim_Frequency':       data.claim_frequency,
-        'Maintenance_Level':     data.maintenance_level,
-        'Building_Age':          data.building_age,
-        'Customer_Satisfaction': data.customer_satisfaction,
-        'Has_Security_System':   data.has_security_system,
-        'Construction_Type':     data.construction_type,
-        'Policy_Tenure':         data.policy_tenure,
-        'Payment_Method':        data.payment_method,
-        'Credit_Score':          data.credit_score,
-        'Fire_Risk_Score':       data.fire_risk_score,
-        # Combine risk indices (mirrors notebook cell 7b919fb5)
-        'Area_Risk_Index':       (data.flood_risk_index + data.crime_rate_index) / 2,
-        # Log transform (mirrors notebook cell 7eae4b67)
-        'log_Annual_Income':     np.log1p(data.annual_income),
-        'log_Property_Value':    np.log1p(data.property_value),
-        'log_Premium_Amount':    np.log1p(data.premium_amount),
-        'log_Claim_Amount_Last': np.log1p(data.claim_amount_last),
-    }
+    return preprocess_batch([data], models, observe)
+
+
+def preprocess_batch(records, models=None, observe: bool = False) -> pd.DataFrame:
+    """
+    Convert a list of InsuranceInput records into a scaled DataFrame, one row per
+    record. Each column is transformed in a single vectorized pass, and row i is
+    identical to preprocess(records[i]).
+    """
+    cols = {f: [getattr(r, f) for r in records] for f in (*_INPUT_FIELDS, LOCATION_FIELD)}
+    return _transform(cols, models or registry.current, observe)
+
+
+def preprocess_frame(df: pd.DataFrame, models=None, observe: bool = False) -> pd.DataFrame:
+    """
+    Same as preprocess_batch for a DataFrame in the raw CSV layout of
+    Property Insurance.csv (extra columns such as Customer_ID are ignored).
+    """
+    missing = [c for c in RAW_COLUMNS.values() if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    cols = {f: df[c].to_numpy() for f, c in RAW_COLUMNS.items()}
+    cols[LOCATION_FIELD] = df[LOCATION_COLUMN].to_numpy() if LOCATION_COLUMN in df.columns else [None] * len(df)
+    return _transform(cols, models or registry.current, observe)
+
+
+def sweep(base, grid: dict, models=None) -> pd.DataFrame:
+    """
+    Feature frame for `base` (an InsuranceInput) with the fields in `grid` replaced
+    row by row: {field: values}, every list one value per output row. The base
+    row is preprocessed once; only the features computed from a varied field are
+    rebuilt, encoded and scaled, and the rest are copied from the base row.
+    Row i is identical to preprocess(base with grid values i).
+    """
+    models = models or registry.current
+    X = preprocess(base, models, observe=False)
+    n = len(next(iter(grid.values())))
+    out = X.loc[X.index.repeat(n)].reset_index(drop=True)
+
+    # Unvaried fields stay one-element columns and broadcast inside _features,
+    # so exactly the features depending on a varied field come out with n values
+    cols = {f: [getattr(base, f)] for f in (*_INPUT_FIELDS, LOCATION_FIELD)}
+    cols.update({f: list(values) for f, values in grid.items()})
+    with stage("features"):
+        features = _features(cols)
+        if models.enrichment is not None and LOCATION_FIELD in grid:
+            features.update(models.enrichment.features(cols[LOCATION_FIELD]))
+        changed = {name: values for name, values in features.items()
+                   if np.size(values) == n and name in out.columns}
+    with stage("encode"):
+        for col in changed.keys() & set(_ENCODE_COLS):
+            table = models.encoders.get(col)
+            if table is not None:
+                changed[col] = table.encode_column(changed[col])
+    with stage("scale"):
+        mean = getattr(models.scaler_X, "mean_", None)
+        scale = getattr(models.scaler_X, "scale_", None)
+        for col, values in changed.items():
+            if col in models.scale_features:
+                # StandardScaler.transform, one column: same float64 ops, same result
+                i = models.scale_features.index(col)
+                values = np.asarray(values, dtype=np.float64)
+                if mean is not None:
+                    values = values - mean[i]
+                if scale is not None:
+                    values = values / scale[i]
+            out[col] = values
+    return out
+
+
+def _transform(cols, models, observe: bool = False) -> pd.DataFrame:
+    """Build the scaled feature frame from raw columns keyed by InsuranceInput field."""
+    with stage("features"):
+        frame = _features(cols)
+    if models.enrichment is not None:
+        # State_* features: one dict lookup per row into the precomputed index
+        with stage("enrich"):
+            frame.update(models.enrichment.features(cols[LOCATION_FIELD]))
+    unseen = {}
 
     # Label encode — must match .astype(str) used during notebook fitting
-    # Customer_Satisfaction was stored as float in notebook (e.g. 4 → '4.0')
-    for col in _ENCODE_COLS:
-        le = _label_encoders.get(col)
-        if le is None:
-            continue
-        val = str(row[col])
-        if val not in le.classes_:
-            val = str(float(row[col]))  # try float string e.g. '4' → '4.0'
-        try:
-            row[col] = int(le.transform([val])[0])
-        except ValueError:
-            row[col] = 0  # unseen label: fall back to most common class
+    # (see app/encoding.py for the '4' → '4.0' and unseen-label handling)
+    with stage("encode"):
+        for col in _ENCODE_COLS:
+            table = models.encoders.get(col)
+            if table is None:
+                continue
+            frame[col], unseen[col] = table.encode_counted(frame[col])
 
     # Build DataFrame in the exact column order X_train used
-    df = pd.DataFrame([row])[_feature_order]
+    with stage("frame"):
+        df = pd.DataFrame(frame)[models.feature_order]
 
     # Scale numerical features
-    df[_scale_features] = _scaler_X.transform(df[_scale_features])
+    with stage("scale"):
+        df[models.scale_features] = models.scaler_X.transform(df[models.scale_features])
 
+    if observe:
+        with stage("drift"):
+            drift.observe(df, unseen, models)
     return df  # return DataFrame so model gets feature names (suppresses sklearn warning)
+
+
+def _features(cols) -> dict:
+    """Raw columns → the notebook's engineered features, before encoding."""
+    num = {f: np.asarray(cols[f]) for f in _INPUT_FIELDS}
+    return {
+        'Age':                   num['age'],
+        'Gender':                cols['gender'],
+        'Marital_Status':        cols['marital_status'],
+        'Urbanization_Level':    cols['urbanization_level'],
+        'Policy_Term':           cols['policy_term'],
+        'Claim_Frequency':       cols['claim_frequency'],
+        'Maintenance_Level':     cols['maintenance_level'],
+        'Building_Age':          num['building_age'],
+        'Customer_Satisfaction': cols['customer_satisfaction'],
+        'Has_Security_System':   cols['has_security_system'],
+        'Construction_Type':     cols['construction_type'],
+        'Policy_Tenure':         num['policy_tenure'],
+        'Payment_Method':        cols['payment_method'],
+        'Credit_Score':          num['credit_score'],
+        'Fire_Risk_Score':       num['fire_risk_score'],
+        # Combine risk indices (mirrors notebook cell 7b919fb5)
+        'Area_Risk_Index':       (num['flood_risk_index'] + num['crime_rate_index']) / 2,
+        # Log transform (mirrors notebook cell 7eae4b67)
+        'log_Annual_Income':     np.log1p(num['annual_income']),
+        'log_Property_Value':    np.log1p(num['property_value']),
+        'log_Premium_Amount':    np.log1p(num['premium_amount']),
+        'log_Claim_Amount_Last': np.log1p(num['claim_amount_last']),
+    }
+
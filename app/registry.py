@@ -0,0 +1,273 @@
+"""
+Model registry — one consistent, versioned artifact set, hot-swappable at runtime.
+
+Every request takes `registry.current` once and uses that ModelSet for the
+encoders, scaler, feature order and both models, so a request never mixes
+artifacts from two versions. A reload loads a complete new set in the background,
+warms it up, then swaps it in with a single reference assignment; in-flight
+requests finish on the set they started with.
+
+Reloads are triggered by POST /admin/reload or by the directory watcher
+(MODELS_WATCH_INTERVAL seconds between checks, 0 disables it). A bundle goes
+live as soon as its manifest changes (it is written last). The seven legacy
+files are copied one at a time, so the watcher waits until their fingerprint
+has been unchanged for two consecutive checks. Every load is rejected if the
+files changed while it was reading them.
+
+Artifacts are read from a single bundle (models/bundle/, see app/bundle.py) when
+one exists, otherwise from the seven legacy joblib files (plus enrichment.joblib
+when the models were trained with External Variables.csv, see app/enrichment.py).
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import joblib
+
+from app import bundle
+from app.encoding import compile_encoders
+from app.engine import compile_classifier, compile_regressor
+from app.enrichment import EnrichmentIndex
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR            = os.getenv("MODELS_DIR", "models")
+MODEL_ENGINE          = os.getenv("MODEL_ENGINE", "sklearn")   # "sklearn" or "native" — see app/engine.py
+MODELS_WATCH_INTERVAL = float(os.getenv("MODELS_WATCH_INTERVAL", "30"))
+BUNDLE_MMAP           = os.getenv("MODEL_BUNDLE_MMAP", "1") == "1"
+BUNDLE_VERIFY         = os.getenv("MODEL_BUNDLE_VERIFY", "1") == "1"
+# joblib threads per sklearn predict call; the pickled forest says -1 (all cores)
+MODEL_N_JOBS          = int(os.getenv("MODEL_N_JOBS", "1"))
+
+
+def _process_start() -> float:
+    """Wall-clock start of this process (Linux /proc), else the time of this import."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as f:
+            btime = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+        return btime + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return time.time()
+
+
+PROCESS_START = _process_start()
+
+ARTIFACTS = {
+    "clf":            "rf_classifier.joblib",
+    "reg":            "gb_regressor.joblib",
+    "scaler_X":       "scaler_X.joblib",
+    "scaler_y":       "scaler_y.joblib",
+    "label_encoders": "label_encoders.joblib",
+    "scale_features": "scale_features.joblib",
+    "feature_order":  "feature_order.joblib",
+}
+
+# Written only by some training runs; part of the version when present
+OPTIONAL_ARTIFACTS = {
+    "enrichment":     "enrichment.joblib",
+}
+
+
+def artifact_version(models_dir) -> str:
+    """Content hash of the model artifacts — changes whenever any file is swapped."""
+    h = hashlib.sha256()
+    for name in sorted(ARTIFACTS.values()):
+        path = Path(models_dir) / name
+        h.update(name.encode())
+        h.update(path.read_bytes())
+    for name in sorted(OPTIONAL_ARTIFACTS.values()):
+        path = Path(models_dir) / name
+        if path.exists():
+            h.update(name.encode())
+            h.update(path.read_bytes())
+    return h.hexdigest()[:12]
+
+
+def _bundle_path(models_dir) -> Path:
+    return Path(models_dir) / bundle.BUNDLE_DIR
+
+
+def _fingerprint(models_dir):
+    """Cheap change detector (size + mtime) so the watcher never re-hashes unchanged files."""
+    manifest = _bundle_path(models_dir) / bundle.MANIFEST
+    if manifest.exists():
+        st = manifest.stat()
+        return ((bundle.MANIFEST, st.st_size, st.st_mtime_ns),)
+    stats = []
+    for name in sorted(ARTIFACTS.values()):
+        try:
+            st = (Path(models_dir) / name).stat()
+        except FileNotFoundError:
+            return None
+        stats.append((name, st.st_size, st.st_mtime_ns))
+    for name in sorted(OPTIONAL_ARTIFACTS.values()):
+        path = Path(models_dir) / name
+        if path.exists():
+            st = path.stat()
+            stats.append((name, st.st_size, st.st_mtime_ns))
+    return tuple(stats)
+
+
+def load_legacy(models_dir) -> dict:
+    """Read the seven legacy joblib files into the keyword arguments of ModelSet."""
+    try:
+        version = artifact_version(models_dir)
+        artifacts = {key: joblib.load(os.path.join(models_dir, name)) for key, name in ARTIFACTS.items()}
+    except FileNotFoundError as e:
+        raise RuntimeError(
+            f"Model file not found: {e}. "
+            "Run `python save_models.py` first to generate the models/ folder."
+        )
+    # LabelEncoders compiled into dict lookups — no sklearn calls on the request path
+    artifacts["encoders"] = compile_encoders(artifacts.pop("label_encoders"))
+    enrichment = Path(models_dir) / OPTIONAL_ARTIFACTS["enrichment"]
+    if enrichment.exists():
+        artifacts["enrichment"] = EnrichmentIndex.from_dict(joblib.load(enrichment))
+    return {**artifacts, "version": version}
+
+
+class ModelSet:
+    """Every artifact needed to serve a prediction, all from the same version."""
+
+    def __init__(self, clf, reg, scaler_X, scaler_y, encoders, scale_features,
+                 feature_order, version: str, engine: str = "sklearn", n_jobs: int = MODEL_N_JOBS,
+                 enrichment: EnrichmentIndex | None = None):
+        for model in (clf, reg):
+            if hasattr(model, "n_jobs"):
+                model.n_jobs = n_jobs   # don't let each predict spawn a pool per core
+        if engine == "native":
+            # Compile once into flat node arrays; same predict / predict_proba interface
+            clf = compile_classifier(clf)
+            reg = compile_regressor(reg)
+        elif engine != "sklearn":
+            raise ValueError(f"Unknown MODEL_ENGINE {engine!r}; use 'sklearn' or 'native'.")
+        self.clf            = clf
+        self.reg            = reg
+        self.scaler_X       = scaler_X
+        self.scaler_y       = scaler_y
+        self.encoders       = encoders
+        self.scale_features = list(scale_features)
+        self.feature_order  = list(feature_order)
+        self.enrichment     = enrichment        # State_* features by location, if trained with them
+        self.version        = version
+        self.engine         = engine
+        self.source         = "legacy"
+        self.loaded_at      = time.time()
+        self.load_seconds   = None
+        self.warmup_seconds = None
+
+    @classmethod
+    def load(cls, models_dir=MODELS_DIR, engine: str = MODEL_ENGINE) -> "ModelSet":
+        """Load the bundle in models_dir if there is one, else the legacy files."""
+        start = time.perf_counter()
+        path = _bundle_path(models_dir)
+        if (path / bundle.MANIFEST).exists():
+            artifacts = bundle.read_bundle(path, verify=BUNDLE_VERIFY, mmap=BUNDLE_MMAP, engine=engine)
+            models = cls(**artifacts, engine=engine)
+            models.source = "bundle"
+        else:
+            models = cls(**load_legacy(models_dir), engine=engine)
+        models.load_seconds = time.perf_counter() - start
+        return models
+
+
+class ModelRegistry:
+    """Holds the active ModelSet and swaps in new versions atomically."""
+
+    def __init__(self, models_dir=MODELS_DIR, engine: str = MODEL_ENGINE, warmup=None):
+        self.models_dir = models_dir
+        self.engine = engine
+        self.warmup = warmup            # callable(ModelSet), run before a set goes live
+        self._current = None
+        self._fingerprint = None
+        self._candidate = None          # legacy fingerprint seen on the previous watcher tick
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self.reloads = 0
+        self.reload_errors = 0
+        self.time_to_first_prediction = None   # seconds from process start to first warm set
+
+    @property
+    def current(self) -> ModelSet:
+        """The active set; loaded on first use."""
+        models = self._current
+        if models is None:
+            self.reload()
+            models = self._current
+        return models
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Load, warm up and swap in the artifacts on disk. Returns True if a new
+        version went live. On any error the previous set keeps serving.
+        """
+        with self._reload_lock:
+            fingerprint = _fingerprint(self.models_dir)
+            models = ModelSet.load(self.models_dir, self.engine)
+            if _fingerprint(self.models_dir) != fingerprint:
+                # A file was replaced mid-load: this set may mix two versions
+                raise RuntimeError(f"Artifacts in {self.models_dir} changed while loading; not swapping")
+            if not force and self._current is not None and models.version == self._current.version:
+                self._fingerprint = fingerprint
+                return False
+            if self.warmup is not None:
+                start = time.perf_counter()
+                self.warmup(models)
+                models.warmup_seconds = time.perf_counter() - start
+            self._current = models          # atomic reference swap
+            self._fingerprint = fingerprint
+            self.reloads += 1
+            if self.time_to_first_prediction is None:
+                self.time_to_first_prediction = time.time() - PROCESS_START
+            logger.info("Model set %s is live from %s %s (load %.3fs, warmup %.3fs)",
+                        models.version, models.source, self.models_dir,
+                        models.load_seconds or 0.0, models.warmup_seconds or 0.0)
+            return True
+
+    def check_for_update(self) -> bool:
+        """Reload if the files on disk changed since the last load."""
+        fingerprint = _fingerprint(self.models_dir)
+        if fingerprint is None or fingerprint == self._fingerprint:
+            self._candidate = None
+            return False
+        if fingerprint[0][0] != bundle.MANIFEST and fingerprint != self._candidate:
+            # Legacy files may still be mid-copy: reload once they stop changing
+            self._candidate = fingerprint
+            return False
+        self._candidate = None
+        try:
+            return self.reload()
+        except Exception:
+            # Half-copied or broken artifacts: keep serving, retry on the next tick
+            self.reload_errors += 1
+            logger.exception("Model reload from %s failed; keeping %s", self.models_dir,
+                             self._current.version if self._current else None)
+            return False
+
+    def start_watching(self, interval: float = MODELS_WATCH_INTERVAL):
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._stop.clear()
+
+        def _watch():
+            while not self._stop.wait(interval):
+                self.check_for_update()
+
+        self._watcher = threading.Thread(target=_watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+
+registry = ModelRegistry()
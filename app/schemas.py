@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 class InsuranceInput(BaseModel):
@@ -27,6 +27,30 @@ class InsuranceInput(BaseModel):
     property_value: float     = Field(..., gt=0,   example=200000.0)
     premium_amount: float     = Field(..., gt=0,   example=1200.0)
     claim_amount_last: float  = Field(..., ge=0,   example=2000.0)
+    location: str | None      = Field(None, example="Selangor")   # state; joins External Variables.csv
+
+
+def example_input() -> InsuranceInput:
+    """An InsuranceInput built from the Field examples (used for warmup)."""
+    return InsuranceInput(**{
+        name: field.json_schema_extra["example"]
+        for name, field in InsuranceInput.model_fields.items()
+    })
+
+
+def field_limits(model=InsuranceInput) -> dict:
+    """
+    Numeric bounds of each field as {name: [(op, bound), ...]} with op one of
+    'gt', 'ge', 'lt', 'le' — the Field constraints pydantic enforces, for checking
+    whole columns at once.
+    """
+    limits = {}
+    for name, field in model.model_fields.items():
+        bounds = [(op, getattr(m, op)) for m in field.metadata for op in ("gt", "ge", "lt", "le")
+                  if getattr(m, op, None) is not None]
+        if bounds:
+            limits[name] = bounds
+    return limits
 
 
 class ClassificationResponse(BaseModel):
@@ -37,3 +61,86 @@ class ClassificationResponse(BaseModel):
 
 class RegressionResponse(BaseModel):
     expected_claim_cost: float  # original dollar scale
+
+
+class PredictionResponse(BaseModel):
+    risk_category: int          # 0 = Low Risk, 1 = High Risk
+    risk_label: str
+    probability: float
+    expected_claim_cost: float  # original dollar scale
+
+
+class ExplanationResponse(BaseModel):
+    """
+    Prediction plus TreeSHAP contributions per model feature (feature_order).
+    probability = risk_base_value + sum(risk_contributions);
+    log(1 + expected_claim_cost) = cost_base_value + sum(cost_contributions).
+    """
+    risk_category: int
+    risk_label: str
+    probability: float
+    risk_base_value: float
+    risk_contributions: dict[str, float]
+    expected_claim_cost: float
+    cost_base_value: float
+    cost_contributions: dict[str, float]
+
+
+SWEEP_MAX_POINTS = 50   # per axis, so at most 2 500 rows per sweep
+
+
+class SweepAxis(BaseModel):
+    field: str                                  # an InsuranceInput field, e.g. "building_age"
+    values: list[int | float | str] = Field(..., min_length=1, max_length=SWEEP_MAX_POINTS)
+
+
+class SweepRequest(BaseModel):
+    """One base policy and one or two fields to vary over a grid of values."""
+    base: InsuranceInput
+    vary: list[SweepAxis] = Field(..., min_length=1, max_length=2)
+
+    @model_validator(mode="after")
+    def _check_axes(self):
+        fields = [axis.field for axis in self.vary]
+        unknown = [f for f in fields if f not in InsuranceInput.model_fields]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        if len(set(fields)) != len(fields):
+            raise ValueError("Each field can be varied only once")
+        # Every grid value must pass the same Field constraints as a policy would
+        base = self.base.model_dump()
+        for axis in self.vary:
+            axis.values = [getattr(InsuranceInput(**{**base, axis.field: v}), axis.field) for v in axis.values]
+        return self
+
+
+class SweepResponse(BaseModel):
+    """Scores over the grid: 1 axis → lists, 2 axes → rows for vary[0], columns for vary[1]."""
+    model_version: str
+    fields: list[str]
+    values: list[list[int | float | str]]
+    risk_category: list
+    probability: list
+    expected_claim_cost: list
+
+
+class LossSummary(BaseModel):
+    """Simulated aggregate loss of a set of policies, in dollars; VaR / TVaR keyed by quantile."""
+    policies: int
+    expected_loss: float        # Σ probability × expected_claim_cost
+    mean: float
+    std: float
+    var: dict[str, float]
+    tvar: dict[str, float]
+
+
+class PortfolioResponse(BaseModel):
+    model_version: str
+    policies: int               # rows simulated
+    errors: int                 # rows that failed validation, left out
+    scenarios: int
+    severity_sigma: float
+    seed: int
+    seconds: float              # simulation time
+    total: LossSummary
+    groups: dict[str, dict[str, LossSummary]]   # group column → level → summary
@@ -0,0 +1,230 @@
+"""
+Model scoring shared by the API endpoints and the bulk / offline paths.
+
+  risk, cost    — scores for a preprocessed feature frame
+  score_frame   — raw rows in the Property Insurance.csv layout → one result row
+                  per input row; rows failing validation get an error instead of a score
+  row_errors    — the InsuranceInput checks applied column-wise
+  read_chunks   — CSV / NDJSON input as bounded-size DataFrame chunks
+  read_columns  — a columnar request body (JSON arrays or Arrow IPC) as one DataFrame
+  result_columns — score_frame output as one list per column
+"""
+
+import json
+import typing
+
+import numpy as np
+import pandas as pd
+
+from app.metrics import stage
+from app.preprocess import LOCATION_COLUMN, LOCATION_FIELD, RAW_COLUMNS, preprocess_frame
+from app.schemas import InsuranceInput, field_limits
+
+ID_COLUMN = "Customer_ID"
+
+# Raw CSV columns holding numbers; anything unparseable becomes NaN → error row
+_NUMERIC_COLUMNS = [
+    RAW_COLUMNS[name] for name, field in InsuranceInput.model_fields.items()
+    if field.annotation in (int, float)
+]
+
+# Integer fields must hold whole numbers, as pydantic requires
+_INTEGER_COLUMNS = [
+    RAW_COLUMNS[name] for name, field in InsuranceInput.model_fields.items() if field.annotation is int
+]
+
+# Field bounds (age 18–100, income > 0, ...) per raw column
+_LIMITS = {RAW_COLUMNS[name]: bounds for name, bounds in field_limits().items()}
+_OPS = {"gt": (np.greater, ">"), "ge": (np.greater_equal, ">="), "lt": (np.less, "<"), "le": (np.less_equal, "<=")}
+
+# API field name → CSV column name, for inputs that may use either
+_COLUMN_NAMES = {**RAW_COLUMNS, LOCATION_FIELD: LOCATION_COLUMN}
+
+RESULT_COLUMNS = [ID_COLUMN, "risk_category", "risk_label", "probability", "expected_claim_cost", "error"]
+
+
+def risk(X, models):
+    """
+    One forest traversal: predict_proba, then the class by the forest's own
+    decision rule (argmax over classes_) instead of a second clf.predict pass.
+    """
+    with stage("predict_classifier"):
+        proba = models.clf.predict_proba(X)
+    preds = models.clf.classes_.take(np.argmax(proba, axis=1), axis=0)
+    return preds, proba[:, 1]
+
+
+def cost(X, models) -> np.ndarray:
+    """Expected claim cost in dollars for every row."""
+    with stage("predict_regressor"):
+        pred_scaled = models.reg.predict(X)
+    # Inverse pipeline: StandardScaler → inverse log1p
+    with stage("inverse_transform"):
+        return np.expm1(
+            models.scaler_y.inverse_transform(pred_scaled.reshape(-1, 1))
+        ).flatten()
+
+
+def row_errors(raw: pd.DataFrame) -> pd.Series:
+    """
+    The InsuranceInput validation, one column at a time: for each row, None if it
+    would pass, else a message naming the missing / non-numeric cells and the
+    cells outside their Field bounds. Numeric columns must already be coerced.
+    """
+    missing = raw.isna()
+    out_of_range = pd.DataFrame(False, index=raw.index, columns=raw.columns)
+    for col in _INTEGER_COLUMNS:
+        values = raw[col].to_numpy(dtype=float)
+        out_of_range[col] |= ~missing[col].to_numpy() & (values != np.floor(values))
+    for col, bounds in _LIMITS.items():
+        values = raw[col].to_numpy(dtype=float)
+        for op, bound in bounds:
+            out_of_range[col] |= ~missing[col].to_numpy() & ~_OPS[op][0](values, bound)
+
+    errors = pd.Series([None] * len(raw), index=raw.index, dtype=object)
+    bad = missing.any(axis=1) | out_of_range.any(axis=1)
+    for idx in raw.index[bad]:
+        parts = []
+        if missing.loc[idx].any():
+            parts.append("Missing or invalid: " + ", ".join(raw.columns[missing.loc[idx].to_numpy()]))
+        if out_of_range.loc[idx].any():
+            parts.append("Out of range: " + ", ".join(
+                f"{col} ({_describe(col)})" for col in raw.columns[out_of_range.loc[idx].to_numpy()]))
+        errors.loc[idx] = "; ".join(parts)
+    return errors
+
+
+def _describe(col) -> str:
+    rules = [f"{_OPS[op][1]} {bound:g}" for op, bound in _LIMITS.get(col, [])]
+    if col in _INTEGER_COLUMNS:
+        rules.append("whole number")
+    return ", ".join(rules)
+
+
+def score_frame(df: pd.DataFrame, models, start: int = 0) -> pd.DataFrame:
+    """
+    Score a chunk of raw rows. Rows that InsuranceInput would reject (missing or
+    non-numeric values, values outside the Field bounds) are not scored; they
+    get an `error` instead. Rows without a Customer_ID column are
+    keyed by their 0-based position in the input (`start` = offset of this chunk).
+    """
+    df = df.copy()
+    for col in _NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    missing = [c for c in RAW_COLUMNS.values() if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    raw = df[list(RAW_COLUMNS.values())]
+    with stage("validate"):
+        errors = row_errors(raw)
+    valid = errors.isna().to_numpy()
+    ids = df[ID_COLUMN].to_numpy() if ID_COLUMN in df.columns else np.arange(start, start + len(df))
+
+    out = pd.DataFrame({ID_COLUMN: ids})
+    out["risk_category"] = pd.array([pd.NA] * len(df), dtype="Int64")
+    out["risk_label"] = pd.array([None] * len(df), dtype=object)
+    out["probability"] = np.nan
+    out["expected_claim_cost"] = np.nan
+    out["error"] = None
+
+    if valid.any():
+        X = preprocess_frame(df.loc[valid], models)
+        preds, probs = risk(X, models)
+        out.loc[valid, "risk_category"] = preds.astype(int)
+        out.loc[valid, "risk_label"] = np.where(preds == 1, "High Risk", "Low Risk")
+        out.loc[valid, "probability"] = np.round(probs, 4)
+        out.loc[valid, "expected_claim_cost"] = np.round(cost(X, models), 2)
+    if not valid.all():
+        out.loc[~valid, "error"] = errors.to_numpy()[~valid]
+    return out[RESULT_COLUMNS]
+
+
+def result_records(out: pd.DataFrame) -> typing.Iterator[dict]:
+    """JSON-ready dicts for score_frame output (scored rows omit `error`, error rows omit scores)."""
+    for row in out.itertuples(index=False):
+        key = row[0].item() if isinstance(row[0], np.generic) else row[0]
+        if row.error is not None:
+            yield {ID_COLUMN: key, "error": row.error}
+        else:
+            yield {
+                ID_COLUMN:             key,
+                "risk_category":       int(row.risk_category),
+                "risk_label":          row.risk_label,
+                "probability":         float(row.probability),
+                "expected_claim_cost": float(row.expected_claim_cost),
+            }
+
+
+def result_columns(out: pd.DataFrame) -> dict:
+    """score_frame output as {column: [values]}; missing scores / errors are None."""
+    columns = {}
+    for col in out.columns:
+        values = out[col].to_numpy(dtype=object)
+        columns[col] = [None if pd.isna(v) else v.item() if isinstance(v, np.generic) else v for v in values]
+    return columns
+
+
+def _normalize_keys(record: dict) -> dict:
+    """Accept both the CSV column names and the API's snake_case field names."""
+    return {_COLUMN_NAMES.get(k, k): v for k, v in record.items()}
+
+
+def read_chunks(file, fmt: str, chunk_rows: int) -> typing.Iterator[pd.DataFrame]:
+    """Yield DataFrames of at most chunk_rows rows from a CSV or NDJSON binary file."""
+    if fmt == "csv":
+        yield from pd.read_csv(file, chunksize=chunk_rows, dtype={ID_COLUMN: str})
+    elif fmt == "ndjson":
+        batch = []
+        for line in file:
+            if line.strip():
+                batch.append(_normalize_keys(json.loads(line)))
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame.from_records(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame.from_records(batch)
+    else:
+        raise ValueError(f"Unsupported format {fmt!r}; use 'csv' or 'ndjson'.")
+
+
+ARROW_TYPES = ("application/vnd.apache.arrow.stream", "application/vnd.apache.arrow.file")
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise RuntimeError("Arrow bodies need pyarrow on the server: pip install pyarrow (or send columnar JSON)")
+    return pa
+
+
+def read_columns(body: bytes, content_type: str) -> pd.DataFrame:
+    """
+    Columnar request body → DataFrame in the raw CSV layout, without building a
+    Python object per row. JSON is one array per field ({"age": [45, 31], ...});
+    Arrow is an IPC stream or file (Feather v2). Keys may be API field names or
+    CSV column names.
+    """
+    if content_type in ARROW_TYPES:
+        pa = _pyarrow()
+        reader = pa.ipc.open_stream if content_type == ARROW_TYPES[0] else pa.ipc.open_file
+        df = reader(pa.py_buffer(body)).read_all().to_pandas()
+        return df.rename(columns=_COLUMN_NAMES)
+    columns = json.loads(body)
+    if not isinstance(columns, dict) or not all(isinstance(v, list) for v in columns.values()):
+        raise ValueError("Expected a JSON object with one array per field")
+    if len({len(v) for v in columns.values()}) > 1:
+        raise ValueError("All column arrays must have the same length")
+    return pd.DataFrame(_normalize_keys(columns))
+
+
+def write_arrow(columns: pd.DataFrame) -> bytes:
+    """score_frame output as an Arrow IPC stream."""
+    pa = _pyarrow()
+    table = pa.Table.from_pandas(columns, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
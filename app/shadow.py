@@ -0,0 +1,262 @@
+"""
+Shadow model set — a candidate version scored on live traffic next to the active one.
+
+With SHADOW_MODELS_DIR set, a second ModelSet is loaded from it at startup (and
+on POST /admin/shadow/reload). Once the active set has answered a /predict* or
+/explain* call, the scored batch is handed to the shadow runner and the response
+goes out; the shadow never sits on the request path:
+  - one background thread (BLAS capped at one thread) and a queue of at most
+    SHADOW_MAX_QUEUE batches; a batch that finds the queue full, or arrives
+    while requests are waiting for an inference thread, is dropped and counted
+  - the active set's preprocessed frame is reused when the shadow has the same
+    feature layout (feature order, encoder classes, scaler_X, enrichment);
+    otherwise the records are preprocessed again with the shadow's artifacts
+  - its stage timings are kept out of the serving histograms
+Cache hits are answered without a model call and are not compared.
+
+Outputs are compared at the precision the API returns (probability to 4
+decimals, cost to cents) and aggregated in memory, per active version:
+  agreement     share of rows with the same risk_category, and the 2×2 table
+  probability   mean / mean absolute / RMS / max absolute delta (shadow − active)
+  cost          the same in dollars, plus the mean absolute relative delta
+GET /shadow reports them; like every statistic here, per worker process.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app import metrics
+from app.executor import _limit_threads
+from app.preprocess import preprocess_batch
+from app.registry import MODEL_ENGINE, ModelSet
+from app.schemas import example_input
+from app.scoring import cost, risk
+
+logger = logging.getLogger(__name__)
+
+SHADOW_MODELS_DIR  = os.getenv("SHADOW_MODELS_DIR")                 # unset disables the shadow
+SHADOW_MAX_QUEUE   = int(os.getenv("SHADOW_MAX_QUEUE", "8"))        # batches waiting for the shadow thread
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "1"))    # share of scored batches compared
+
+FIELDS           = ("risk_category", "probability", "expected_claim_cost")
+PROBABILITY_BINS = (0.001, 0.01, 0.05, 0.1, 0.25)                   # |Δ probability|
+COST_BINS        = (0.01, 0.05, 0.1, 0.25, 0.5)                     # |Δ cost| / active cost
+
+
+class Deltas:
+    """Running moments and a histogram of shadow − active differences."""
+
+    def __init__(self, edges, relative: bool = False):
+        self.edges = np.asarray(edges)
+        self.relative = relative
+        self.n = 0
+        self.sum = self.abs = self.sq = self.max = self.rel = 0.0
+        self.bins = np.zeros(len(edges) + 1, dtype=np.int64)
+
+    def add(self, active: np.ndarray, shadow: np.ndarray):
+        delta = shadow - active
+        size = np.abs(delta)
+        if self.relative:
+            size = size / np.maximum(np.abs(active), 0.01)
+            self.rel += float(size.sum())
+        self.n += len(delta)
+        self.sum += float(delta.sum())
+        self.abs += float(np.abs(delta).sum())
+        self.sq += float((delta ** 2).sum())
+        self.max = max(self.max, float(np.abs(delta).max(initial=0.0)))
+        self.bins += np.bincount(np.searchsorted(self.edges, size, side="left"), minlength=len(self.bins))
+
+    def report(self) -> dict:
+        if not self.n:
+            return {"count": 0}
+        labels = [f"<={e:g}" for e in self.edges] + [f">{self.edges[-1]:g}"]
+        out = {"count": self.n, "mean": round(self.sum / self.n, 6), "mean_abs": round(self.abs / self.n, 6),
+               "rms": round((self.sq / self.n) ** 0.5, 6), "max_abs": round(self.max, 6)}
+        if self.relative:
+            out["mean_abs_relative"] = round(self.rel / self.n, 6)
+        out["histogram"] = dict(zip(labels, self.bins.tolist()))
+        return out
+
+
+class ShadowStats:
+    """Agreement and deltas of one shadow set against one active version."""
+
+    def __init__(self, active_version: str | None = None):
+        self.active_version = active_version
+        self.since = time.time()
+        self.batches = self.rows = 0
+        self.confusion = np.zeros((2, 2), dtype=np.int64)    # [active class, shadow class]
+        self.probability = Deltas(PROBABILITY_BINS)
+        self.cost = Deltas(COST_BINS, relative=True)
+        self.stage_seconds = {}
+
+    def update(self, active: dict, shadow: dict, stages: dict):
+        self.batches += 1
+        self.rows += len(next(iter(active.values())))
+        if "risk_category" in active:
+            np.add.at(self.confusion, (np.clip(active["risk_category"], 0, 1),
+                                       np.clip(shadow["risk_category"], 0, 1)), 1)
+            self.probability.add(active["probability"], shadow["probability"])
+        if "expected_claim_cost" in active:
+            self.cost.add(active["expected_claim_cost"], shadow["expected_claim_cost"])
+        for name, seconds in stages.items():
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+
+    def report(self) -> dict:
+        compared = int(self.confusion.sum())
+        return {
+            "active_version": self.active_version,
+            "since":          self.since,
+            "batches":        self.batches,
+            "rows":           self.rows,
+            "agreement":      round(float(np.trace(self.confusion)) / compared, 6) if compared else None,
+            "confusion":      {"active_low_shadow_high": int(self.confusion[0, 1]),
+                               "active_high_shadow_low": int(self.confusion[1, 0]),
+                               "both_low": int(self.confusion[0, 0]), "both_high": int(self.confusion[1, 1])},
+            "probability":    self.probability.report(),
+            "cost":           self.cost.report(),
+            "stage_seconds":  {k: round(v, 6) for k, v in self.stage_seconds.items()},
+        }
+
+
+def _layout(models) -> tuple:
+    enrichment = models.enrichment.to_dict() if models.enrichment is not None else None
+    return (models.feature_order, models.scale_features,
+            {col: list(table.classes) for col, table in models.encoders.items()},
+            np.asarray(models.scaler_X.mean_).tolist(), np.asarray(models.scaler_X.scale_).tolist(), enrichment)
+
+
+def same_layout(a, b) -> bool:
+    """True when both model sets turn a record into the same feature frame."""
+    return _layout(a) == _layout(b)
+
+
+class ShadowRunner:
+    """Scores handed-over batches with the shadow set on one background thread."""
+
+    def __init__(self, models, max_queue: int = SHADOW_MAX_QUEUE, sample_rate: float = SHADOW_SAMPLE_RATE):
+        self.models = models
+        self.max_queue = max_queue
+        self.sample_rate = sample_rate
+        self.pending = 0                # submitted, not finished
+        self.submitted = self.dropped = self.sampled_out = self.errors = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._layouts = weakref.WeakKeyDictionary()     # active ModelSet → same_layout()
+        self._pool = ThreadPoolExecutor(1, thread_name_prefix="shadow",
+                                        initializer=_limit_threads, initargs=(1,))
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = ShadowStats()
+
+    def submit(self, X, records, results, active, busy: bool = False) -> bool:
+        """
+        Queue a scored batch for comparison; never blocks. Returns False when it is
+        dropped (queue full, or `busy`: the active set has requests waiting).
+        """
+        with self._lock:
+            if busy or self.pending >= self.max_queue:
+                self.dropped += len(results)
+                return False
+            if self.sample_rate < 1 and random.random() >= self.sample_rate:
+                self.sampled_out += len(results)
+                return False
+            self.pending += 1
+            self.submitted += len(results)
+        self._pool.submit(self._compare, X, records, results, active)
+        return True
+
+    def _compare(self, X, records, results, active):
+        try:
+            scored = {f: np.array([getattr(r, f) for r in results]) for f in FIELDS if hasattr(results[0], f)}
+            with metrics.collect(observe=False) as stages:
+                shadow = self._score(X, records, active, scored)
+            with self._lock:
+                if self.stats.active_version != active.version:
+                    self.stats = ShadowStats(active.version)    # a new active version starts a new window
+                self.stats.update(scored, shadow, stages)
+        except Exception as e:
+            logger.debug("Shadow scoring failed", exc_info=True)
+            with self._lock:
+                self.errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+        finally:
+            with self._lock:
+                self.pending -= 1
+                if not self.pending:
+                    self._idle.notify_all()
+
+    def _score(self, X, records, active, scored: dict) -> dict:
+        same = self._layouts.get(active)
+        if same is None:
+            same = self._layouts[active] = same_layout(active, self.models)
+        if not same:
+            X = preprocess_batch(records, self.models, observe=False)
+        out = {}
+        if "probability" in scored:
+            preds, probs = risk(X, self.models)
+            out["risk_category"] = preds.astype(np.int64)
+            out["probability"] = np.array([round(float(p), 4) for p in probs])
+        if "expected_claim_cost" in scored:
+            out["expected_claim_cost"] = np.array([round(float(c), 2) for c in cost(X, self.models)])
+        return out
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until every queued batch has been compared (tests, shutdown)."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self.pending, timeout)
+
+    def report(self) -> dict:
+        with self._lock:
+            stats = self.stats.report()
+            counters = {"pending": self.pending, "max_queue": self.max_queue, "sample_rate": self.sample_rate,
+                        "submitted_rows": self.submitted, "dropped_rows": self.dropped,
+                        "sampled_out_rows": self.sampled_out, "errors": self.errors, "last_error": self.last_error}
+        return {"shadow_version": self.models.version, "engine": self.models.engine, **counters, **stats}
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+runner: ShadowRunner | None = None
+_lock = threading.Lock()
+
+
+def _warmup(models):
+    for n in (1, 16):
+        X = preprocess_batch([example_input()] * n, models, observe=False)
+        risk(X, models)
+        cost(X, models)
+
+
+def load(models_dir=SHADOW_MODELS_DIR, engine: str = MODEL_ENGINE) -> ShadowRunner:
+    """Load and warm up the shadow set in models_dir, replacing the running one (statistics restart)."""
+    global runner
+    if not models_dir:
+        raise RuntimeError("No shadow model set configured; set SHADOW_MODELS_DIR")
+    models = ModelSet.load(models_dir, engine)
+    _warmup(models)
+    new = ShadowRunner(models)
+    with _lock:
+        old, runner = runner, new
+    if old is not None:
+        old.close()
+    logger.info("Shadow model set %s from %s is running", models.version, models_dir)
+    return new
+
+
+def submit(X, records, results, active, busy: bool = False):
+    """Hand a batch the active set has scored to the shadow, if one is running."""
+    current = runner
+    if current is not None and results:
+        current.submit(X, records, results, active, busy)
@@ -0,0 +1,274 @@
+"""
+Performance baseline — latency percentiles, throughput and per-stage cost.
+
+    python -m benchmarks.run                          # real artifacts in models/
+    python -m benchmarks.run --synthetic              # locally trained, production-shaped models
+    python -m benchmarks.run --synthetic --engine native --compare benchmarks/results/<old>.json
+    python -m benchmarks.run --url http://localhost:8000 --concurrency 16
+
+Two groups of measurements, for every batch size in --sizes:
+
+  stages     validation (InsuranceInput), preprocess_batch, classifier
+             predict_proba, regressor predict and the scaler_y inverse transform,
+             timed in-process, one batch at a time
+  endpoints  /predict/classification and /predict/regression (single row) and
+             their /batch variants, through the ASGI app in-process, or over
+             HTTP against --url; --concurrency requests in flight
+
+Each result has p50 / p95 / p99 / mean in milliseconds, plus requests/sec and
+rows/sec for endpoints. The prediction cache is disabled so every request is scored.
+Everything is written as one JSON file (default benchmarks/results/<commit>.json);
+--compare prints the change against an earlier file.
+
+--synthetic trains the production pipeline (save_models.train) on policies
+resampled column by column from Property Insurance.csv. The result has the same
+encoders, feature layout and ensemble sizes as the real models, for machines
+where models/ only holds Git LFS pointers.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("PREDICTION_CACHE_SIZE", "0")   # before app.main reads it
+
+import numpy as np
+import pandas as pd
+
+from app.preprocess import RAW_COLUMNS, preprocess_batch
+from app.schemas import InsuranceInput
+from app.scoring import risk
+
+DATA_FILE   = "Property Insurance.csv"
+RESULTS_DIR = os.path.join("benchmarks", "results")
+STAGES      = ("validate", "preprocess", "predict_classifier", "predict_regressor", "inverse_transform")
+
+
+# ── Inputs and artifacts ──────────────────────────────────────────────────────
+def synthetic_policies(n: int, seed: int = 0, data_path=DATA_FILE) -> pd.DataFrame:
+    """
+    n policies in the raw CSV layout, every column drawn independently from its
+    observed values in the real data: realistic categories and ranges, no missing values.
+    """
+    rng = np.random.default_rng(seed)
+    source = pd.read_csv(data_path)
+    out = {col: rng.choice(source[col].dropna().to_numpy(), size=n) for col in source.columns}
+    out["Customer_ID"] = [f"SYN{i:07d}" for i in range(n)]
+    return pd.DataFrame(out)[source.columns]
+
+
+def payloads(policies: pd.DataFrame) -> list[dict]:
+    """Request bodies (API field names) for each policy."""
+    rows = policies[list(RAW_COLUMNS.values())].rename(columns={v: k for k, v in RAW_COLUMNS.items()})
+    return rows.to_dict("records")
+
+
+def synthetic_models(models_dir, rows: int = 5000, seed: int = 0):
+    """Train the production pipeline on synthetic policies into models_dir."""
+    import save_models
+    path = os.path.join(models_dir, "synthetic.csv")
+    os.makedirs(models_dir, exist_ok=True)
+    synthetic_policies(rows, seed).to_csv(path, index=False)
+    save_models.train(path, models_dir, cache_dir=None)
+
+
+def _summary(seconds) -> dict:
+    ms = np.asarray(seconds) * 1000
+    return {
+        "p50":  round(float(np.percentile(ms, 50)), 4),
+        "p95":  round(float(np.percentile(ms, 95)), 4),
+        "p99":  round(float(np.percentile(ms, 99)), 4),
+        "mean": round(float(ms.mean()), 4),
+    }
+
+
+# ── In-process stage timings ──────────────────────────────────────────────────
+def bench_stages(models, bodies: list[dict], sizes, iterations: int, warmup: int = 3) -> dict:
+    """Time each stage of the scoring path separately, per batch size."""
+    results = {}
+    for size in sizes:
+        timings = {stage: [] for stage in STAGES}
+        for i in range(warmup + iterations):
+            start = (i * size) % max(1, len(bodies) - size)
+            batch = bodies[start:start + size]
+
+            t0 = time.perf_counter()
+            records = [InsuranceInput.model_validate(b) for b in batch]
+            t1 = time.perf_counter()
+            X = preprocess_batch(records, models)
+            t2 = time.perf_counter()
+            risk(X, models)
+            t3 = time.perf_counter()
+            pred_scaled = models.reg.predict(X)
+            t4 = time.perf_counter()
+            np.expm1(models.scaler_y.inverse_transform(pred_scaled.reshape(-1, 1))).flatten()
+            t5 = time.perf_counter()
+
+            if i >= warmup:
+                for stage, seconds in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4)):
+                    timings[stage].append(seconds)
+        results[str(size)] = {stage: _summary(timings[stage]) for stage in STAGES}
+    return results
+
+
+# ── Endpoint latency / throughput ─────────────────────────────────────────────
+def _client(url):
+    if url:
+        import httpx
+        return httpx.Client(base_url=url, timeout=30.0)
+    from fastapi.testclient import TestClient
+    from app.main import app
+    return TestClient(app)
+
+
+def bench_endpoints(client, bodies: list[dict], sizes, iterations: int, concurrency: int = 1,
+                    warmup: int = 3) -> dict:
+    """p50/p95/p99 latency and requests/sec for every endpoint and batch size."""
+    results = {}
+    for task in ("classification", "regression"):
+        for size in sizes:
+            path = f"/predict/{task}" if size == 1 else f"/predict/{task}/batch"
+
+            def body(i, size=size):
+                start = (i * size) % max(1, len(bodies) - size)
+                return bodies[start] if size == 1 else bodies[start:start + size]
+
+            def call(i, path=path):
+                t0 = time.perf_counter()
+                res = client.post(path, json=body(i))
+                elapsed = time.perf_counter() - t0
+                if res.status_code != 200:
+                    raise RuntimeError(f"{path} returned {res.status_code}: {res.text[:200]}")
+                return elapsed
+
+            for i in range(warmup):
+                call(i)
+            start = time.perf_counter()
+            if concurrency == 1:
+                latencies = [call(i) for i in range(iterations)]
+            else:
+                with ThreadPoolExecutor(concurrency) as pool:
+                    latencies = list(pool.map(call, range(iterations)))
+            wall = time.perf_counter() - start
+            results[f"{path}[{size}]"] = {
+                **_summary(latencies),
+                "batch_size":   size,
+                "concurrency":  concurrency,
+                "requests":     iterations,
+                "req_per_sec":  round(iterations / wall, 2),
+                "rows_per_sec": round(iterations * size / wall, 2),
+            }
+    return results
+
+
+# ── Reporting ─────────────────────────────────────────────────────────────────
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _metadata(models, args) -> dict:
+    import sklearn
+    return {
+        "commit":        _git_commit(),
+        "created_at":    time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "artifacts":     "synthetic" if args.synthetic else "real",
+        "model_version": models.version,
+        "engine":        models.engine,
+        "target":        args.url or "in-process",
+        "iterations":    args.iterations,
+        "cpu_count":     os.cpu_count(),
+        "python":        platform.python_version(),
+        "libraries":     {"numpy": np.__version__, "pandas": pd.__version__, "sklearn": sklearn.__version__},
+    }
+
+
+def compare(current: dict, baseline: dict) -> list[str]:
+    """One line per metric present in both runs: p50 / p95 and req/s, with % change."""
+    lines = []
+    for size, stages in current.get("stages", {}).items():
+        for stage, cur in stages.items():
+            old = baseline.get("stages", {}).get(size, {}).get(stage)
+            if old:
+                lines.append(_delta(f"stage {stage}[{size}]", cur, old, ("p50", "p95")))
+    for name, cur in current.get("endpoints", {}).items():
+        old = baseline.get("endpoints", {}).get(name)
+        if old:
+            lines.append(_delta(name, cur, old, ("p50", "p95", "req_per_sec")))
+    return lines
+
+
+def _delta(name, cur, old, keys) -> str:
+    parts = []
+    for key in keys:
+        change = (cur[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+        parts.append(f"{key} {old[key]:.3f} → {cur[key]:.3f} ({change:+.1f}%)")
+    return f"{name:48s} " + "  ".join(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark latency, throughput and per-stage cost")
+    parser.add_argument("--models-dir", default=None, help="artifacts to load (default: MODELS_DIR)")
+    parser.add_argument("--synthetic", action="store_true", help="train production-shaped models locally first")
+    parser.add_argument("--engine", choices=("sklearn", "native"), default=None)
+    parser.add_argument("--sizes", default="1,16,128", help="comma-separated batch sizes")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--url", default=None, help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--skip-endpoints", action="store_true")
+    parser.add_argument("--output", default=None, help="JSON file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier JSON result to diff against")
+    args = parser.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    from app.registry import registry
+    tmp = None
+    if args.synthetic:
+        tmp = tempfile.TemporaryDirectory()
+        print("Training synthetic models ...", file=sys.stderr)
+        synthetic_models(tmp.name)
+        registry.models_dir = tmp.name
+    elif args.models_dir:
+        registry.models_dir = args.models_dir
+    if args.engine:
+        registry.engine = args.engine
+    registry.reload(force=True)
+    models = registry.current
+
+    bodies = payloads(synthetic_policies(max(sizes) * 8, seed=1))
+    result = {"metadata": _metadata(models, args)}
+    result["stages"] = bench_stages(models, bodies, sizes, args.iterations)
+    if not args.skip_endpoints:
+        client = _client(args.url)
+        with client:
+            result["endpoints"] = bench_endpoints(client, bodies, sizes, args.iterations, args.concurrency)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{result['metadata']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    for size, stages in result["stages"].items():
+        print(f"batch {size:>4}: " + "  ".join(f"{s} p50={v['p50']:.3f}ms" for s, v in stages.items()))
+    for name, r in result.get("endpoints", {}).items():
+        print(f"{name:48s} p50={r['p50']:.2f}ms p95={r['p95']:.2f}ms p99={r['p99']:.2f}ms "
+              f"{r['req_per_sec']:.0f} req/s")
+    if args.compare:
+        with open(args.compare) as f:
+            print("\n".join(compare(result, json.load(f))))
+    print(f"Wrote {output}", file=sys.stderr)
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+"""
+Model compression — a smaller rf_classifier / gb_regressor within an accuracy budget.
+
+    python compress_models.py --out models-compressed
+    python compress_models.py --max-auc-drop 0.002 --max-rmse-increase 0.005 --distill --float32
+
+The held-out split of save_models.py (same seed, same cached feature matrix) is
+cut into two stratified halves:
+  select   every choice below is made, and the budget checked, on this half
+  check    the report's "after" metrics on rows no choice was made on
+
+Classifier (RandomForestClassifier)
+  depth capping   each tree cut at depth d; a node at depth d becomes a leaf with
+                  the class frequencies it already stores, so nothing is refitted
+  selection       greedy forward selection: add the tree that gives the best
+                  ROC-AUC of the averaged probabilities, until the AUC is within
+                  --max-auc-drop (absolute) of the full forest
+Regressor (GradientBoostingRegressor)
+  depth capping   the same; an internal node stores the mean residual of its
+                  samples, which is what a shallower squared-error tree would fit
+  selection       stages are additive, so it is truncation: the fewest first
+                  stages whose dollar RMSE is within --max-rmse-increase
+                  (relative) of the full model
+Both try every depth cap from the full depth down until no subset passes, and
+keep the passing candidate with the fewest nodes (nodes = CPU per row and memory).
+
+--distill also trains small students on the teacher's outputs on the training
+rows (a forest on soft labels: every row twice, weighted p and 1 − p; a shallow
+boosting model on the teacher's predictions) and keeps one only if it passes
+the budget with fewer nodes than the pruned model.
+
+--float32 writes <out>/bundle/ with the native engine arrays narrowed to float32
+(app/engine.py to_float32): half the threshold / value bytes, same branches.
+
+<out> gets the seven legacy files (+ enrichment.joblib) with the compressed
+models and compression_report.json: trees, nodes, depth, artifact bytes,
+engine memory (float64 and float32), single-row and batch latency of both
+engines, and the metrics on both halves, before and after.
+"""
+
+import argparse
+import copy
+import io
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+from scipy.stats import rankdata
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from app.engine import compile_classifier, compile_regressor, to_float32
+from app.enrichment import EnrichmentIndex
+from app.registry import ARTIFACTS, OPTIONAL_ARTIFACTS
+from save_models import SEED, _inv_y, _write, cached_features
+
+REPORT_FILE  = "compression_report.json"
+MAX_AUC_DROP = 0.005        # absolute ROC-AUC
+MAX_RMSE_UP  = 0.01         # relative increase of the dollar RMSE
+BATCH_ROWS   = 1000         # rows per call for the batch latency
+
+# --distill students, smallest first
+STUDENT_FORESTS  = [(10, 6), (20, 6), (20, 8), (40, 8)]        # (n_estimators, max_depth)
+STUDENT_BOOSTING = [(25, 2), (50, 2), (25, 3), (50, 3)]
+
+
+# ── Tree surgery ──────────────────────────────────────────────────────────────
+def cap_depth(estimator, depth: int):
+    """A copy of a fitted sklearn decision tree with every node at `depth` turned into a leaf."""
+    if estimator.tree_.max_depth <= depth:
+        return estimator
+    state = estimator.tree_.__getstate__()
+    nodes, values = state["nodes"], state["values"]
+    order, stack = [], [(0, 0)]
+    while stack:                                    # depth-first, left subtree first, like sklearn
+        node, d = stack.pop()
+        order.append((node, d))
+        if nodes[node]["left_child"] != -1 and d < depth:
+            stack.append((nodes[node]["right_child"], d + 1))
+            stack.append((nodes[node]["left_child"], d + 1))
+    kept = np.array([node for node, _ in order])
+    index = {node: i for i, node in enumerate(kept)}
+    capped = nodes[kept].copy()
+    for i, (node, d) in enumerate(order):
+        if nodes[node]["left_child"] == -1 or d >= depth:
+            capped[i]["left_child"] = capped[i]["right_child"] = -1
+            capped[i]["feature"] = -2
+            capped[i]["threshold"] = -2.0
+        else:
+            capped[i]["left_child"] = index[nodes[node]["left_child"]]
+            capped[i]["right_child"] = index[nodes[node]["right_child"]]
+    state.update(nodes=capped, values=np.ascontiguousarray(values[kept]), node_count=len(kept), max_depth=depth)
+    tree = copy.deepcopy(estimator)
+    tree.tree_.__setstate__(state)
+    return tree
+
+
+def _trees(model) -> list:
+    return list(np.ravel(model.estimators_))
+
+
+def _nodes(model) -> int:
+    return int(sum(t.tree_.node_count for t in _trees(model)))
+
+
+def _depth(model) -> int:
+    return int(max(t.tree_.max_depth for t in _trees(model)))
+
+
+def _forest(rf, trees):
+    model = copy.copy(rf)
+    model.estimators_ = list(trees)
+    model.n_estimators = len(trees)
+    return model
+
+
+def _boosting(gb, trees):
+    model = copy.copy(gb)
+    stages = np.empty((len(trees), 1), dtype=object)
+    stages[:, 0] = trees
+    model.estimators_ = stages
+    model.n_estimators = model.n_estimators_ = len(trees)
+    model.train_score_ = gb.train_score_[:len(trees)]
+    if hasattr(gb, "oob_improvement_"):
+        model.oob_improvement_ = gb.oob_improvement_[:len(trees)]
+    return model
+
+
+# ── Metrics ───────────────────────────────────────────────────────────────────
+def auc_rows(scores: np.ndarray, positive: np.ndarray) -> np.ndarray:
+    """ROC-AUC of every row of scores (Mann–Whitney, ties averaged) in one pass."""
+    ranks = rankdata(scores, axis=1)
+    n_pos = positive.sum()
+    n_neg = len(positive) - n_pos
+    return (ranks[:, positive].sum(axis=1) - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+
+def _take(X, rows):
+    """Rows of a feature frame (keeping the column names the models were fitted with) or array."""
+    return X.iloc[rows] if hasattr(X, "iloc") else np.asarray(X)[rows]
+
+
+def _rmse(y_true, y_pred) -> float:
+    return float(np.sqrt(np.mean((np.asarray(y_true) - np.asarray(y_pred)) ** 2)))
+
+
+def _positive(clf) -> int:
+    return int(np.flatnonzero(clf.classes_ == clf.classes_.max())[0])
+
+
+def _auc(clf, X, y) -> float:
+    return float(roc_auc_score(y, clf.predict_proba(X)[:, _positive(clf)]))
+
+
+def _dollar_rmse(reg, X, y_dollars, scaler_y) -> float:
+    return _rmse(y_dollars, _inv_y(reg.predict(X), scaler_y))
+
+
+# ── Selection ─────────────────────────────────────────────────────────────────
+def select_trees(per_tree: np.ndarray, positive: np.ndarray, target: float):
+    """
+    Greedy forward selection on per-tree probabilities (n_trees, n_rows): the
+    first subset whose averaged AUC reaches target, as (tree indices, AUC), or None.
+    """
+    total = np.zeros(per_tree.shape[1])
+    chosen, remaining = [], list(range(len(per_tree)))
+    while remaining:
+        aucs = auc_rows(total + per_tree[remaining], positive)   # averaging does not change ranks
+        best = int(np.argmax(aucs))
+        chosen.append(remaining.pop(best))
+        total += per_tree[chosen[-1]]
+        if aucs[best] >= target:
+            return chosen, float(aucs[best])
+    return None
+
+
+def compress_classifier(rf, X, y, max_auc_drop: float = MAX_AUC_DROP):
+    """Smallest depth-capped, greedily selected sub-forest within max_auc_drop on (X, y)."""
+    pos = _positive(rf)
+    positive = np.asarray(y) == rf.classes_[pos]
+    target = _auc(rf, X, y) - max_auc_drop
+    X = np.asarray(X, dtype=np.float32)                 # the trees' own input, no name checks
+    best = None
+    for depth in range(_depth(rf), 0, -1):
+        capped = [cap_depth(t, depth) for t in rf.estimators_]
+        per_tree = np.stack([t.predict_proba(X)[:, pos] for t in capped])
+        found = select_trees(per_tree, positive, target)
+        if found is None:
+            break                               # shallower trees only lose more
+        trees = [capped[i] for i in found[0]]
+        candidate = _forest(rf, trees)
+        if best is None or _nodes(candidate) < _nodes(best[0]):
+            best = (candidate, {"method": "selection", "depth": depth, "trees": len(trees)})
+    return best or (rf, {"method": "none", "depth": _depth(rf), "trees": len(rf.estimators_)})
+
+
+def compress_regressor(gb, X, y_dollars, scaler_y, max_rmse_increase: float = MAX_RMSE_UP):
+    """Fewest first stages of a depth-capped GB within max_rmse_increase on (X, y_dollars)."""
+    target = _dollar_rmse(gb, X, y_dollars, scaler_y) * (1 + max_rmse_increase)
+    X = np.asarray(X, dtype=np.float32)
+    baseline = gb._raw_predict_init(X[:1])[0, 0]
+    best = None
+    for depth in range(_depth(gb), 0, -1):
+        capped = [cap_depth(t, depth) for t in gb.estimators_[:, 0]]
+        raw = baseline + gb.learning_rate * np.cumsum(np.stack([t.predict(X) for t in capped]), axis=0)
+        dollars = np.expm1(raw * scaler_y.scale_[0] + scaler_y.mean_[0])    # scaler_y.inverse_transform
+        rmse = np.sqrt(np.mean((dollars - y_dollars) ** 2, axis=1))
+        passing = np.flatnonzero(rmse <= target)
+        if not len(passing):
+            break
+        candidate = _boosting(gb, capped[:passing[0] + 1])
+        if best is None or _nodes(candidate) < _nodes(best[0]):
+            best = (candidate, {"method": "truncation", "depth": depth, "trees": int(passing[0] + 1)})
+    return best or (gb, {"method": "none", "depth": _depth(gb), "trees": len(gb.estimators_)})
+
+
+def distill_classifier(rf, X_train, X, y, target: float, n_jobs: int = -1):
+    """The smallest STUDENT_FORESTS forest fitted on rf's soft labels with an AUC ≥ target on (X, y)."""
+    pos = _positive(rf)
+    p = rf.predict_proba(X_train)[:, pos]
+    n = len(p)
+    X_soft = _take(X_train, np.r_[np.arange(n), np.arange(n)])
+    y_soft = np.r_[np.full(n, rf.classes_[pos]), np.full(n, rf.classes_[1 - pos])]
+    weight = np.r_[p, 1 - p]
+    for n_estimators, depth in STUDENT_FORESTS:
+        student = RandomForestClassifier(n_estimators=n_estimators, max_depth=depth, min_samples_leaf=5,
+                                         random_state=SEED, n_jobs=n_jobs)
+        student.fit(X_soft, y_soft, sample_weight=weight)
+        if _auc(student, X, y) >= target:
+            return student, {"method": "distillation", "depth": depth, "trees": n_estimators}
+    return None
+
+
+def distill_regressor(gb, X_train, X, y_dollars, scaler_y, target: float):
+    """The smallest STUDENT_BOOSTING model fitted on gb's predictions with a dollar RMSE ≤ target."""
+    teacher = gb.predict(X_train)
+    for n_estimators, depth in STUDENT_BOOSTING:
+        student = GradientBoostingRegressor(n_estimators=n_estimators, max_depth=depth, learning_rate=0.2,
+                                            random_state=SEED)
+        student.fit(X_train, teacher)
+        if _dollar_rmse(student, X, y_dollars, scaler_y) <= target:
+            return student, {"method": "distillation", "depth": depth, "trees": n_estimators}
+    return None
+
+
+# ── Report ────────────────────────────────────────────────────────────────────
+def _bytes(model) -> int:
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return buffer.tell()
+
+
+def _engine_bytes(engine) -> int:
+    return int(sum(a.nbytes for a in engine.trees.arrays().values()))
+
+
+def _latency(predict, X, repeats: int = 50) -> dict:
+    """Median wall time of one single-row call and one BATCH_ROWS-row call, in ms."""
+    row = _take(X, [0])
+    batch = _take(X, np.resize(np.arange(len(X)), BATCH_ROWS))
+    timings = {}
+    for name, data, n in (("row_ms", row, repeats), ("batch_ms", batch, max(3, repeats // 10))):
+        predict(data)                                       # warm
+        times = []
+        for _ in range(n):
+            start = time.perf_counter()
+            predict(data)
+            times.append(time.perf_counter() - start)
+        timings[name] = round(float(np.median(times)) * 1e3, 4)
+    return timings
+
+
+def profile(model, compile_engine, predict_name: str, X) -> dict:
+    """Size, memory and latency of one model under sklearn (single-threaded) and the native engine."""
+    model = copy.copy(model)
+    if hasattr(model, "n_jobs"):
+        model.n_jobs = 1                                    # what ModelSet serves with
+    engine = compile_engine(model)
+    return {
+        "trees":          len(_trees(model)),
+        "nodes":          _nodes(model),
+        "max_depth":      _depth(model),
+        "artifact_bytes": _bytes(model),
+        "engine_bytes":   {"float64": _engine_bytes(engine), "float32": _engine_bytes(to_float32(engine))},
+        "latency":        {"sklearn": _latency(getattr(model, predict_name), X),
+                           "native":  _latency(getattr(engine, predict_name), X)},
+    }
+
+
+def compress(clf, reg, scaler_y, X_train, X_test, y_test_class, y_test_reg,
+             max_auc_drop: float = MAX_AUC_DROP, max_rmse_increase: float = MAX_RMSE_UP,
+             distill: bool = False, n_jobs: int = -1) -> tuple:
+    """
+    Compress both models against the held-out split (X_test, y_test_class,
+    y_test_reg scaled). Returns (clf, reg, report).
+    """
+    y_class = np.asarray(y_test_class)
+    y_dollars = _inv_y(y_test_reg, scaler_y)
+    select, check = train_test_split(np.arange(len(X_test)), test_size=0.5, random_state=SEED, stratify=y_class)
+    X_select = _take(X_test, select)
+
+    small_clf, clf_info = compress_classifier(clf, X_select, y_class[select], max_auc_drop)
+    small_reg, reg_info = compress_regressor(reg, X_select, y_dollars[select], scaler_y, max_rmse_increase)
+    if distill:
+        auc_target = _auc(clf, X_select, y_class[select]) - max_auc_drop
+        rmse_target = _dollar_rmse(reg, X_select, y_dollars[select], scaler_y) * (1 + max_rmse_increase)
+        student = distill_classifier(clf, X_train, X_select, y_class[select], auc_target, n_jobs)
+        if student and _nodes(student[0]) < _nodes(small_clf):
+            small_clf, clf_info = student
+        student = distill_regressor(reg, X_train, X_select, y_dollars[select], scaler_y, rmse_target)
+        if student and _nodes(student[0]) < _nodes(small_reg):
+            small_reg, reg_info = student
+    if hasattr(small_clf, "n_jobs"):
+        small_clf.n_jobs = clf.n_jobs
+
+    def clf_metrics(model):
+        native = to_float32(compile_classifier(model))
+        return {half: {"roc_auc": round(_auc(model, _take(X_test, rows), y_class[rows]), 4),
+                       "roc_auc_float32": round(_auc(native, _take(X_test, rows), y_class[rows]), 4)}
+                for half, rows in (("select", select), ("check", check))}
+
+    def reg_metrics(model):
+        native = to_float32(compile_regressor(model))
+        return {half: {"rmse": round(_dollar_rmse(model, _take(X_test, rows), y_dollars[rows], scaler_y), 4),
+                       "rmse_float32": round(_dollar_rmse(native, _take(X_test, rows), y_dollars[rows], scaler_y), 4)}
+                for half, rows in (("select", select), ("check", check))}
+
+    report = {
+        "budget": {"max_auc_drop": max_auc_drop, "max_rmse_increase": max_rmse_increase},
+        "rows":   {"select": len(select), "check": len(check)},
+        "rf_classifier": {
+            **clf_info,
+            "before": {**profile(clf, compile_classifier, "predict_proba", X_test), "metrics": clf_metrics(clf)},
+            "after":  {**profile(small_clf, compile_classifier, "predict_proba", X_test),
+                       "metrics": clf_metrics(small_clf)},
+        },
+        "gb_regressor": {
+            **reg_info,
+            "before": {**profile(reg, compile_regressor, "predict", X_test), "metrics": reg_metrics(reg)},
+            "after":  {**profile(small_reg, compile_regressor, "predict", X_test), "metrics": reg_metrics(small_reg)},
+        },
+    }
+    return small_clf, small_reg, report
+
+
+def compress_models(models_dir="models", out="models-compressed", data_path="Property Insurance.csv",
+                    cache_dir=".cache", external=None, max_auc_drop: float = MAX_AUC_DROP,
+                    max_rmse_increase: float = MAX_RMSE_UP, distill: bool = False, float32: bool = False,
+                    n_jobs: int = -1) -> dict:
+    """Compress the models in models_dir into a complete artifact set in out; returns the report."""
+    artifacts = {key: joblib.load(os.path.join(models_dir, name)) for key, name in ARTIFACTS.items()}
+    enrichment = os.path.join(models_dir, OPTIONAL_ARTIFACTS["enrichment"])
+    if os.path.exists(enrichment):
+        artifacts["enrichment"] = EnrichmentIndex.from_dict(joblib.load(enrichment))
+    features = cached_features(data_path, cache_dir, n_jobs, external=external)[0]
+    if list(features["X_test"].columns) != list(artifacts["feature_order"]):
+        raise ValueError(f"{models_dir} was trained on other features than {data_path}"
+                         f"{' with ' + str(external) if external else ''} produces; check --external")
+
+    start = time.perf_counter()
+    clf, reg, report = compress(artifacts["clf"], artifacts["reg"], artifacts["scaler_y"],
+                                features["X_train"], features["X_test"], features["y_test_class"],
+                                features["y_test_reg"], max_auc_drop, max_rmse_increase, distill, n_jobs)
+    os.makedirs(out, exist_ok=True)
+    bundle_version = _write(out, {**artifacts, "clf": clf, "reg": reg}, float32, float32=float32)
+    report = {"models_dir": str(models_dir), "data": os.path.basename(str(data_path)),
+              "bundle_version": bundle_version, "float32": float32,
+              "seconds": round(time.perf_counter() - start, 3), **report}
+    with open(os.path.join(out, REPORT_FILE), "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compress the RF classifier and GB regressor within an "
+                                                 "accuracy budget on the held-out split")
+    parser.add_argument("--models-dir", default="models")
+    parser.add_argument("--out", default="models-compressed")
+    parser.add_argument("--data", default="Property Insurance.csv")
+    parser.add_argument("--cache-dir", default=".cache", help="feature-matrix cache ('' disables it)")
+    parser.add_argument("--external", default=None, metavar="CSV", help="as given to save_models.py")
+    parser.add_argument("--max-auc-drop", type=float, default=MAX_AUC_DROP, help="absolute ROC-AUC")
+    parser.add_argument("--max-rmse-increase", type=float, default=MAX_RMSE_UP, help="relative, 0.01 = 1%%")
+    parser.add_argument("--distill", action="store_true", help="also try small student models")
+    parser.add_argument("--float32", action="store_true", help="write <out>/bundle/ with float32 engine arrays")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    args = parser.parse_args(argv)
+
+    report = compress_models(args.models_dir, args.out, args.data, args.cache_dir or None, args.external,
+                             args.max_auc_drop, args.max_rmse_increase, args.distill, args.float32, args.n_jobs)
+    for key in ("rf_classifier", "gb_regressor"):
+        before, after = report[key]["before"], report[key]["after"]
+        print(f"{key}: {before['trees']} trees / {before['nodes']:,} nodes → {after['trees']} / {after['nodes']:,} "
+              f"({report[key]['method']}, depth {after['max_depth']}), single row "
+              f"{before['latency']['sklearn']['row_ms']:.2f} → {after['latency']['sklearn']['row_ms']:.2f} ms, "
+              f"check {json.dumps(before['metrics']['check'])} → {json.dumps(after['metrics']['check'])}")
+    print(f"Saved compressed models to {args.out}/")
+
+
+if __name__ == "__main__":
+    main()
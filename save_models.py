@@ -0,0 +1,433 @@
+"""
+Training pipeline — regenerates every artifact in models/ from Property Insurance.csv.
+
+Same steps as notebook.ipynb, without the plots, SHAP and ANN cells:
+  1. load       read the CSV, drop Customer_ID
+  2. encode     LabelEncoder per categorical column (fitted on .astype(str), 'nan' included)
+  3. impute     Random Forest imputation of the missing numerical values
+  4. features   Area_Risk_Index, drop Location, log1p of the skewed columns;
+                with --external, State_* features joined on Location first
+  5. split      stratified 80/20 split, StandardScaler on X (numerical) and y
+  6. search     optional grid search of the RF / GB hyperparameters (--search)
+  7. fit        Random Forest classifier + Gradient Boosting regressor
+  8. evaluate   test-set metrics
+  9. save       the seven joblib files (+ models/bundle/ if one exists or --bundle),
+                written to a staging copy and swapped in with a rename
+
+Steps 1–5 produce the feature matrix. It is cached in --cache-dir under a hash
+of the CSV bytes and the pipeline settings, so a re-run on unchanged data goes
+straight to step 6. Imputation fits one forest per missing column and search
+fits one model per grid point; both run across all cores (--n-jobs). Every
+run is seeded (SEED) and writes the wall time of each stage to
+models/training_report.json.
+
+Usage:
+    python save_models.py
+    python save_models.py --search --bundle
+    python save_models.py --external "External Variables.csv"
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier, RandomForestRegressor
+from sklearn.metrics import (accuracy_score, f1_score, mean_absolute_error, mean_squared_error,
+                             r2_score, roc_auc_score)
+from sklearn.model_selection import GridSearchCV, train_test_split
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from app.enrichment import EnrichmentIndex
+from app.registry import ARTIFACTS, OPTIONAL_ARTIFACTS
+
+SEED             = 42
+TEST_SIZE        = 0.2
+PIPELINE_VERSION = 1          # bump when steps 1–5 change, to invalidate cached feature matrices
+REPORT_FILE      = "training_report.json"
+
+RISK_COLS   = ['Flood_Risk_Index', 'Crime_Rate_Index']
+DROP_COLS   = ['Customer_ID', 'Location']
+SKEWED_COLS = ['Annual_Income', 'Property_Value', 'Premium_Amount', 'Claim_Amount_Last', 'Expected_Claim_Cost']
+
+# Models saved by the notebook
+RF_PARAMS = {"n_estimators": 100, "max_depth": 10, "min_samples_leaf": 5, "class_weight": "balanced"}
+GB_PARAMS = {"n_estimators": 100}
+
+# --search grids; each includes the notebook's parameters
+RF_GRID = {"n_estimators": [100, 200], "max_depth": [8, 10, 12], "min_samples_leaf": [1, 5]}
+GB_GRID = {"n_estimators": [100, 200], "learning_rate": [0.05, 0.1], "max_depth": [3, 4]}
+
+
+class StageTimer:
+    """Wall time per pipeline stage, printed as it goes."""
+
+    def __init__(self):
+        self.seconds = {}
+
+    @contextlib.contextmanager
+    def __call__(self, name):
+        print(f"[{name}] ...", flush=True)
+        start = time.perf_counter()
+        yield
+        self.seconds[name] = round(time.perf_counter() - start, 3)
+        print(f"[{name}] {self.seconds[name]:.2f}s", flush=True)
+
+
+# ── Steps 1–5: feature matrix ─────────────────────────────────────────────────
+def split_features(df):
+    """Notebook rule: object columns and anything with ≤ 10 distinct values are categorical."""
+    categorical, numerical = [], []
+    for col in df.columns:
+        (categorical if df[col].dtype == object or pd.api.types.is_string_dtype(df[col])
+         or df[col].nunique() <= 10 else numerical).append(col)
+    return categorical, numerical
+
+
+def encode(df, categorical):
+    """
+    LabelEncoder on the string form of each categorical column. Missing values are
+    spelled 'nan' explicitly (what .astype(str) gave in pandas 2), so they form
+    their own class, as in the notebook.
+    """
+    label_encoders = {}
+    for col in categorical:
+        values = df[col].astype(object).map(str)
+        label_encoders[col] = LabelEncoder().fit(values)
+        df[col] = label_encoders[col].transform(values)
+    return df, label_encoders
+
+
+def _impute_column(df, col, numerical, fill, n_jobs):
+    predictor_cols = df.columns.drop(col)
+    known = df[col].notnull()
+    X = df[predictor_cols].fillna(fill[predictor_cols])
+    model = (RandomForestRegressor(n_estimators=100, random_state=SEED, n_jobs=n_jobs) if col in numerical
+             else RandomForestClassifier(n_estimators=100, random_state=SEED, n_jobs=n_jobs))
+    model.fit(X[known], df.loc[known, col])
+    preds = model.predict(X[~known])
+    return col, preds if col in numerical else np.round(preds).astype(int)
+
+
+def impute_with_rf(df, numerical, n_jobs: int = -1, sequential: bool = False):
+    """
+    Fill every missing cell with a Random Forest fitted on the other columns.
+
+    Default: all columns are imputed at once from the same snapshot (other
+    columns' gaps filled with median / mode), one forest per column across all
+    cores. sequential=True reproduces the notebook order exactly: columns are
+    imputed one at a time and each sees the values imputed before it.
+    """
+    missing = list(df.columns[df.isnull().any()])
+    if not missing:
+        return df
+
+    def _fill(frame):
+        return pd.Series({c: frame[c].median() if c in numerical else frame[c].mode()[0] for c in frame.columns})
+
+    if sequential:
+        for col in missing:
+            _, preds = _impute_column(df, col, numerical, _fill(df), n_jobs)
+            df.loc[df[col].isnull(), col] = preds
+        return df
+
+    fill = _fill(df)
+    cores = joblib.cpu_count() if n_jobs == -1 else max(1, n_jobs)
+    outer = min(len(missing), cores)
+    results = joblib.Parallel(n_jobs=outer)(
+        joblib.delayed(_impute_column)(df, col, numerical, fill, max(1, cores // outer)) for col in missing
+    )
+    for col, preds in results:
+        df.loc[df[col].isnull(), col] = preds
+    return df
+
+
+def enrich(df, index: EnrichmentIndex, location_encoder):
+    """
+    State_* columns from the enrichment index, joined on the (label-encoded)
+    Location exactly as the API joins them. They are final values and are not
+    added to the numerical (scaled) columns.
+    """
+    locations = location_encoder.inverse_transform(df['Location'].round().astype(int))
+    return df.assign(**index.features(locations))
+
+
+def engineer(df, numerical):
+    """Area_Risk_Index replaces flood + crime; Location is dropped; skewed columns get log1p."""
+    df['Area_Risk_Index'] = df[RISK_COLS].mean(axis=1)
+    df = df.drop(columns=RISK_COLS + [c for c in DROP_COLS if c in df.columns])
+    numerical = [c for c in numerical if c not in RISK_COLS] + ['Area_Risk_Index']
+    for col in SKEWED_COLS:
+        df[f'log_{col}'] = np.log1p(df[col])
+        df = df.drop(columns=[col])
+    numerical = [f'log_{c}' if c in SKEWED_COLS else c for c in numerical]
+    return df, numerical
+
+
+def build_features(data_path, n_jobs: int = -1, sequential_impute: bool = False, timer=None,
+                   external=None) -> dict:
+    """
+    Steps 1–5. Returns the split, scaled matrices plus the fitted encoders and
+    scalers, and the enrichment index when `external` (External Variables.csv) is given.
+    """
+    timer = timer or StageTimer()
+    with timer("load"):
+        df = pd.read_csv(data_path).drop(columns=['Customer_ID'], errors='ignore')
+        categorical, numerical = split_features(df)
+
+    with timer("encode"):
+        df, label_encoders = encode(df, categorical)
+        df = df.apply(pd.to_numeric, errors='coerce')
+
+    with timer("impute"):
+        df = impute_with_rf(df, numerical, n_jobs=n_jobs, sequential=sequential_impute)
+
+    with timer("features"):
+        index = EnrichmentIndex.from_csv(external) if external else None
+        if index is not None:
+            df = enrich(df, index, label_encoders['Location'])
+        df, numerical = engineer(df, numerical)
+
+    with timer("split"):
+        X = df.drop(columns=['Risk_Category', 'log_Expected_Claim_Cost'])
+        X_train, X_test, y_train_class, y_test_class, y_train_reg, y_test_reg = train_test_split(
+            X, df['Risk_Category'], df['log_Expected_Claim_Cost'],
+            test_size=TEST_SIZE, random_state=SEED, stratify=df['Risk_Category'],
+        )
+        X_train, X_test = X_train.copy(), X_test.copy()
+        scale_features = [c for c in numerical if c in X_train.columns]
+        scaler_X = StandardScaler()
+        X_train[scale_features] = scaler_X.fit_transform(X_train[scale_features])
+        X_test[scale_features] = scaler_X.transform(X_test[scale_features])
+        scaler_y = StandardScaler()
+        y_train_reg = scaler_y.fit_transform(y_train_reg.values.reshape(-1, 1)).flatten()
+        y_test_reg = scaler_y.transform(y_test_reg.values.reshape(-1, 1)).flatten()
+
+    return {
+        "X_train": X_train, "X_test": X_test,
+        "y_train_class": y_train_class, "y_test_class": y_test_class,
+        "y_train_reg": y_train_reg, "y_test_reg": y_test_reg,
+        "scaler_X": scaler_X, "scaler_y": scaler_y,
+        "label_encoders": label_encoders, "scale_features": scale_features,
+        "enrichment": index,
+    }
+
+
+def data_hash(data_path, sequential_impute: bool = False, external=None) -> str:
+    """Cache key: CSV bytes (and the external table's) + everything else that changes the feature matrix."""
+    h = hashlib.sha256()
+    for path in (data_path, external):
+        if path is None:
+            continue
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    settings = {"pipeline": PIPELINE_VERSION, "seed": SEED, "test_size": TEST_SIZE,
+                "sequential_impute": sequential_impute, "sklearn": sklearn.__version__, "pandas": pd.__version__}
+    h.update(json.dumps(settings, sort_keys=True).encode())
+    return h.hexdigest()[:16]
+
+
+def cached_features(data_path, cache_dir, n_jobs: int = -1, sequential_impute: bool = False, timer=None,
+                    external=None):
+    """build_features, memoized on disk by data_hash. Returns (features, key, cache_hit)."""
+    key = data_hash(data_path, sequential_impute, external)
+    path = os.path.join(cache_dir, f"features-{key}.joblib") if cache_dir else None
+    if path and os.path.exists(path):
+        with (timer or StageTimer())("load_cache"):
+            return joblib.load(path), key, True
+    features = build_features(data_path, n_jobs, sequential_impute, timer, external)
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = path + ".tmp"
+        joblib.dump(features, tmp)
+        os.replace(tmp, path)
+    return features, key, False
+
+
+# ── Steps 6–9: models ─────────────────────────────────────────────────────────
+def search(features, n_jobs: int = -1, cv: int = 3) -> tuple[dict, dict]:
+    """Grid search both models; every grid point × fold is fitted in parallel."""
+    rf = GridSearchCV(RandomForestClassifier(class_weight="balanced", random_state=SEED, n_jobs=1),
+                      RF_GRID, scoring="roc_auc", cv=cv, n_jobs=n_jobs)
+    rf.fit(features["X_train"], features["y_train_class"])
+    gb = GridSearchCV(GradientBoostingRegressor(random_state=SEED),
+                      GB_GRID, scoring="neg_mean_squared_error", cv=cv, n_jobs=n_jobs)
+    gb.fit(features["X_train"], features["y_train_reg"])
+    return ({**RF_PARAMS, **rf.best_params_}, {**GB_PARAMS, **gb.best_params_})
+
+
+def _inv_y(y_scaled, scaler_y):
+    return np.expm1(scaler_y.inverse_transform(np.asarray(y_scaled).reshape(-1, 1)).flatten())
+
+
+def evaluate(rf, gb, features) -> dict:
+    X_test, y_class = features["X_test"], features["y_test_class"]
+    prob = rf.predict_proba(X_test)[:, 1]
+    pred = rf.predict(X_test)
+    y_true = _inv_y(features["y_test_reg"], features["scaler_y"])
+    y_pred = _inv_y(gb.predict(X_test), features["scaler_y"])
+    return {
+        "classification": {
+            "accuracy": round(float(accuracy_score(y_class, pred)), 4),
+            "f1":       round(float(f1_score(y_class, pred, average="weighted")), 4),
+            "roc_auc":  round(float(roc_auc_score(y_class, prob)), 4),
+        },
+        "regression": {
+            "r2":   round(float(r2_score(y_true, y_pred)), 4),
+            "rmse": round(float(np.sqrt(mean_squared_error(y_true, y_pred))), 4),
+            "mae":  round(float(mean_absolute_error(y_true, y_pred)), 4),
+        },
+    }
+
+
+def _write(directory, artifacts, bundle: bool, float32: bool = False):
+    """
+    The seven legacy files (plus enrichment.joblib for a model trained with
+    --external), and <directory>/bundle/ when asked or already present
+    (float32: with narrowed engine arrays, see compress_models.py).
+    """
+    from app.bundle import BUNDLE_DIR, MANIFEST, write_bundle
+    from app.encoding import compile_encoders
+
+    for key, name in ARTIFACTS.items():
+        tmp = os.path.join(directory, name + ".tmp")
+        joblib.dump(artifacts[key], tmp)
+        os.replace(tmp, os.path.join(directory, name))
+    enrichment = artifacts.get("enrichment")
+    path = os.path.join(directory, OPTIONAL_ARTIFACTS["enrichment"])
+    if enrichment is not None:
+        joblib.dump(enrichment.to_dict(), path + ".tmp")
+        os.replace(path + ".tmp", path)
+    elif os.path.exists(path):
+        os.remove(path)         # left over from a previous set trained with --external
+
+    bundle_dir = os.path.join(directory, BUNDLE_DIR)
+    if bundle or os.path.exists(os.path.join(bundle_dir, MANIFEST)):
+        # A stale bundle would shadow the new files (the registry prefers it)
+        manifest = write_bundle(bundle_dir, artifacts["clf"], artifacts["reg"],
+                                artifacts["scaler_X"], artifacts["scaler_y"],
+                                compile_encoders(artifacts["label_encoders"]),
+                                artifacts["scale_features"], artifacts["feature_order"], enrichment,
+                                float32=float32)
+        return manifest["model_version"]
+    return None
+
+
+def save(models_dir, rf, gb, features, bundle: bool = False):
+    """
+    Write a complete artifact set into a staging copy of models_dir, then swap it
+    in with two renames, so a watching API never sees half of a new set.
+
+    If models_dir can't be renamed (e.g. it is a Docker volume mount point) the
+    files are replaced in place instead; the registry then waits for them to
+    settle and rejects a load that overlaps the copy.
+    """
+    artifacts = {
+        "clf": rf, "reg": gb,
+        "scaler_X": features["scaler_X"], "scaler_y": features["scaler_y"],
+        "label_encoders": features["label_encoders"],
+        "scale_features": features["scale_features"],
+        "feature_order": list(features["X_train"].columns),
+        "enrichment": features.get("enrichment"),
+    }
+    models_dir = os.path.normpath(models_dir)
+    staging, old = models_dir + ".staging", models_dir + ".old"
+    shutil.rmtree(staging, ignore_errors=True)
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.isdir(models_dir):
+        shutil.copytree(models_dir, staging)
+    else:
+        os.makedirs(staging)
+    bundle_version = _write(staging, artifacts, bundle)
+
+    try:
+        if os.path.exists(models_dir):
+            os.rename(models_dir, old)
+        os.rename(staging, models_dir)
+    except OSError:
+        if os.path.exists(old) and not os.path.exists(models_dir):
+            os.rename(old, models_dir)
+        shutil.rmtree(staging, ignore_errors=True)
+        return _write(models_dir, artifacts, bundle)
+    # Unlinked, not overwritten: a running API may still map files from the old set
+    shutil.rmtree(old, ignore_errors=True)
+    return bundle_version
+
+
+def train(data_path="Property Insurance.csv", models_dir="models", cache_dir=".cache",
+          run_search: bool = False, bundle: bool = False, n_jobs: int = -1,
+          sequential_impute: bool = False, external=None) -> dict:
+    """Run the whole pipeline and return the training report (also written to models_dir)."""
+    timer = StageTimer()
+    start = time.perf_counter()
+    features, key, cache_hit = cached_features(data_path, cache_dir, n_jobs, sequential_impute, timer, external)
+
+    rf_params, gb_params = RF_PARAMS, GB_PARAMS
+    if run_search:
+        with timer("search"):
+            rf_params, gb_params = search(features, n_jobs)
+
+    with timer("fit"):
+        rf = RandomForestClassifier(**rf_params, random_state=SEED, n_jobs=n_jobs)
+        rf.fit(features["X_train"], features["y_train_class"])
+        gb = GradientBoostingRegressor(**gb_params, random_state=SEED)
+        gb.fit(features["X_train"], features["y_train_reg"])
+
+    with timer("evaluate"):
+        metrics = evaluate(rf, gb, features)
+
+    with timer("save"):
+        bundle_version = save(models_dir, rf, gb, features, bundle)
+
+    report = {
+        "data":             os.path.basename(str(data_path)),
+        "external":         os.path.basename(str(external)) if external else None,
+        "data_hash":        key,
+        "feature_cache":    "hit" if cache_hit else "miss",
+        "rows":             {"train": len(features["X_train"]), "test": len(features["X_test"])},
+        "params":           {"rf_classifier": rf_params, "gb_regressor": gb_params},
+        "metrics":          metrics,
+        "bundle_version":   bundle_version,
+        "stage_seconds":    timer.seconds,
+        "total_seconds":    round(time.perf_counter() - start, 3),
+        "seed":             SEED,
+        "libraries":        {"sklearn": sklearn.__version__, "pandas": pd.__version__, "numpy": np.__version__},
+    }
+    tmp = os.path.join(models_dir, REPORT_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, os.path.join(models_dir, REPORT_FILE))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the RF classifier and GB regressor and save models/")
+    parser.add_argument("--data", default="Property Insurance.csv")
+    parser.add_argument("--models-dir", default="models")
+    parser.add_argument("--cache-dir", default=".cache", help="feature-matrix cache ('' disables it)")
+    parser.add_argument("--search", action="store_true", help="grid search the hyperparameters first")
+    parser.add_argument("--bundle", action="store_true", help="also write models/bundle/")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="cores for imputation, search and the RF")
+    parser.add_argument("--sequential-impute", action="store_true",
+                        help="impute one column at a time, exactly like the notebook")
+    parser.add_argument("--external", default=None, metavar="CSV",
+                        help="state table to join on Location as State_* features, e.g. 'External Variables.csv'")
+    args = parser.parse_args(argv)
+
+    report = train(args.data, args.models_dir, args.cache_dir or None, args.search,
+                   args.bundle, args.n_jobs, args.sequential_impute, args.external)
+    print(json.dumps({k: report[k] for k in ("data_hash", "feature_cache", "metrics",
+                                             "stage_seconds", "total_seconds")}, indent=2))
+    print(f"Saved models to {args.models_dir}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ Sends requests to the FastAPI backend at API_URL.
 import streamlit as st
 import requests
 import os
+import pandas as pd
 
 API_URL = os.getenv("API_URL", "http://localhost:8000")
 
@@ -25,6 +26,10 @@ with st.sidebar:
     age                  = st.slider("Age", 18, 100, 45)
     gender               = st.selectbox("Gender", ["Male", "Female"])
     marital_status       = st.selectbox("Marital Status", ["Single", "Married", "Divorced", "Widowed"])
+    location             = st.selectbox("Location (state)", [
+        "Selangor", "Kuala Lumpur", "Johor", "Penang", "Sabah",
+        "Sarawak", "Perak", "Negeri Sembilan", "Kedah", "Pahang",
+    ])
     urbanization_level   = st.selectbox("Urbanization Level", ["Urban", "Suburban", "Rural"])
     policy_term          = st.selectbox("Policy Term (years)", [5, 10, 15, 20])
     claim_frequency      = st.slider("Claim Frequency", 0, 5, 2)
@@ -57,55 +62,54 @@ with col3:
     flood_risk_index   = st.number_input("Flood Risk Index", min_value=0.0, max_value=100.0, value=40.0)
     crime_rate_index   = st.number_input("Crime Rate Index", min_value=0.0, max_value=100.0, value=50.0)
 
+# ── Request body (used by Predict and What-if) ────────────────────────────────
+payload = {
+    "age":                    age,
+    "gender":                 gender,
+    "marital_status":         marital_status,
+    "urbanization_level":     urbanization_level,
+    "policy_term":            policy_term,
+    "claim_frequency":        claim_frequency,
+    "maintenance_level":      maintenance_level,
+    "building_age":           building_age,
+    "customer_satisfaction":  float(customer_satisfaction),
+    "has_security_system":    has_security_system,
+    "construction_type":      construction_type,
+    "policy_tenure":          policy_tenure,
+    "payment_method":         payment_method,
+    "credit_score":           credit_score,
+    "fire_risk_score":        fire_risk_score,
+    "flood_risk_index":       flood_risk_index,
+    "crime_rate_index":       crime_rate_index,
+    "annual_income":          annual_income,
+    "property_value":         property_value,
+    "premium_amount":         premium_amount,
+    "claim_amount_last":      claim_amount_last,
+    "location":               location,
+}
+
 # ── Predict button ─────────────────────────────────────────────────────────────
 st.divider()
 
 if st.button("🔍 Predict", type="primary", use_container_width=True):
 
-    payload = {
-        "age":                    age,
-        "gender":                 gender,
-        "marital_status":         marital_status,
-        "urbanization_level":     urbanization_level,
-        "policy_term":            policy_term,
-        "claim_frequency":        claim_frequency,
-        "maintenance_level":      maintenance_level,
-        "building_age":           building_age,
-        "customer_satisfaction":  float(customer_satisfaction),
-        "has_security_system":    has_security_system,
-        "construction_type":      construction_type,
-        "policy_tenure":          policy_tenure,
-        "payment_method":         payment_method,
-        "credit_score":           credit_score,
-        "fire_risk_score":        fire_risk_score,
-        "flood_risk_index":       flood_risk_index,
-        "crime_rate_index":       crime_rate_index,
-        "annual_income":          annual_income,
-        "property_value":         property_value,
-        "premium_amount":         premium_amount,
-        "claim_amount_last":      claim_amount_last,
-    }
-
     try:
-        clf_res = requests.post(f"{API_URL}/predict/classification", json=payload, timeout=10)
-        reg_res = requests.post(f"{API_URL}/predict/regression",     json=payload, timeout=10)
-        clf_res.raise_for_status()
-        reg_res.raise_for_status()
-
-        clf_data = clf_res.json()
-        reg_data = reg_res.json()
+        # One call returns both risk and cost — the API preprocesses the input once
+        res = requests.post(f"{API_URL}/predict", json=payload, timeout=10)
+        res.raise_for_status()
+        data = res.json()
 
         col_a, col_b = st.columns(2)
 
         with col_a:
-            label = clf_data["risk_label"]
-            prob  = clf_data["probability"]
-            color = "🔴" if clf_data["risk_category"] == 1 else "🟢"
+            label = data["risk_label"]
+            prob  = data["probability"]
+            color = "🔴" if data["risk_category"] == 1 else "🟢"
             st.metric(f"{color} Risk Category", label)
             st.progress(prob, text=f"High-Risk Probability: {prob:.1%}")
 
         with col_b:
-            cost = reg_data["expected_claim_cost"]
+            cost = data["expected_claim_cost"]
             st.metric("💰 Expected Claim Cost", f"RM {cost:,.2f}")
 
     except requests.exceptions.ConnectionError:
@@ -113,5 +117,60 @@ if st.button("🔍 Predict", type="primary", use_container_width=True):
     except Exception as e:
         st.error(f"Error: {e}")
 
+# ── What-if sweep ──────────────────────────────────────────────────────────────
+st.divider()
+st.subheader("📈 What-if Analysis")
+st.markdown("See how risk and cost change as one detail changes, with everything else as entered above.")
+
+# Field → values to sweep (numeric ranges follow the input widgets above)
+SWEEPS = {
+    "Building Age (years)":  ("building_age", list(range(0, 101, 5))),
+    "Maintenance Level":     ("maintenance_level", ["Low", "Moderate", "High"]),
+    "Has Security System":   ("has_security_system", ["No", "Yes"]),
+    "Flood Risk Index":      ("flood_risk_index", [float(v) for v in range(0, 101, 5)]),
+    "Crime Rate Index":      ("crime_rate_index", [float(v) for v in range(0, 101, 5)]),
+    "Fire Risk Score":       ("fire_risk_score", [float(v) for v in range(0, 101, 5)]),
+    "Claim Frequency":       ("claim_frequency", list(range(0, 6))),
+}
+
+col_x, col_by = st.columns(2)
+with col_x:
+    vary = st.selectbox("Vary", list(SWEEPS))
+with col_by:
+    split = st.selectbox("One line per", ["—"] + [k for k in SWEEPS if k != vary])
+
+if st.button("📈 Run what-if", use_container_width=True):
+    axes = [{"field": SWEEPS[vary][0], "values": SWEEPS[vary][1]}]
+    if split != "—":
+        axes.append({"field": SWEEPS[split][0], "values": SWEEPS[split][1]})
+    try:
+        # One call scores the whole grid; the API preprocesses the base policy once
+        res = requests.post(f"{API_URL}/predict/sweep", json={"base": payload, "vary": axes}, timeout=10)
+        res.raise_for_status()
+        data = res.json()
+
+        x = data["values"][0]
+        if split == "—":
+            prob = pd.DataFrame({"High-risk probability": data["probability"]}, index=x)
+            cost = pd.DataFrame({"Expected claim cost (RM)": data["expected_claim_cost"]}, index=x)
+        else:
+            lines = [f"{split}: {v}" for v in data["values"][1]]
+            prob = pd.DataFrame(data["probability"], index=x, columns=lines)
+            cost = pd.DataFrame(data["expected_claim_cost"], index=x, columns=lines)
+        prob.index.name = cost.index.name = vary
+
+        col_p, col_c = st.columns(2)
+        with col_p:
+            st.markdown("**High-risk probability**")
+            st.line_chart(prob)
+        with col_c:
+            st.markdown("**Expected claim cost (RM)**")
+            st.line_chart(cost)
+
+    except requests.exceptions.ConnectionError:
+        st.error("Cannot connect to the API. Make sure the FastAPI server is running on port 8000.")
+    except Exception as e:
+        st.error(f"Error: {e}")
+
 st.divider()
 st.caption("Insurance Risk Modeling Project | FastAPI + Streamlit")
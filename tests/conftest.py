@@ -34,7 +34,7 @@ ENCODE_COLS = [
 def _make_le(classes):
     le = MagicMock()
     le.classes_ = np.array(classes)
-    le.transform = lambda vals: np.array([0] * len(vals))
+    le.transform = lambda vals: np.array([classes.index(v) for v in vals])
     return le
 
 mock_label_encoders = {
@@ -52,20 +52,25 @@ mock_label_encoders = {
                                       'Mortgage', 'Online Payment']),
 }
 
-# ── Mock scaler (returns zeros, shape-preserving) ─────────────────────────────
+# ── Mock scalers (StandardScaler arithmetic, shape-preserving) ──────────────────
 mock_scaler_X = MagicMock()
-mock_scaler_X.transform = lambda df: np.zeros((len(df), len(SCALE_FEATURES)))
+mock_scaler_X.mean_ = np.linspace(1.0, 10.0, len(SCALE_FEATURES))
+mock_scaler_X.scale_ = np.linspace(2.0, 20.0, len(SCALE_FEATURES))
+mock_scaler_X.transform = lambda df: (
+    (np.asarray(df, dtype=float) - mock_scaler_X.mean_) / mock_scaler_X.scale_
+)
 
 mock_scaler_y = MagicMock()
-mock_scaler_y.inverse_transform = lambda x: np.array([[8.5]])
+mock_scaler_y.inverse_transform = lambda x: np.full_like(x, 8.5, dtype=float)
 
-# ── Mock models ───────────────────────────────────────────────────────────────
+# ── Mock models (one output row per input row) ────────────────────────────────
 mock_clf = MagicMock()
-mock_clf.predict = lambda X: np.array([1])
-mock_clf.predict_proba = lambda X: np.array([[0.2, 0.8]])
+mock_clf.classes_ = np.array([0, 1])
+mock_clf.predict = lambda X: np.ones(len(X), dtype=int)
+mock_clf.predict_proba = lambda X: np.tile([0.2, 0.8], (len(X), 1))
 
 mock_reg = MagicMock()
-mock_reg.predict = lambda X: np.array([1.5])
+mock_reg.predict = lambda X: np.full(len(X), 1.5)
 
 # ── Patch joblib.load ─────────────────────────────────────────────────────────
 def _mock_load(path, *args, **kwargs):
@@ -80,3 +85,56 @@ def _mock_load(path, *args, **kwargs):
     return MagicMock()
 
 joblib.load = _mock_load
+
+
+# ── Real (small) artifacts for tests that need fitted sklearn objects ─────────
+import pytest
+from joblib.numpy_pickle import load as _real_joblib_load
+
+
+def make_artifacts(n_rows=300, n_estimators=10, seed=0):
+    """Fit small real models with the production feature layout on synthetic data."""
+    import pandas as pd
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({col: rng.normal(size=n_rows) for col in FEATURE_ORDER})
+    label_encoders = {}
+    for col, le in mock_label_encoders.items():
+        values = rng.choice(list(le.classes_), size=n_rows)
+        label_encoders[col] = LabelEncoder().fit(values)
+        df[col] = label_encoders[col].transform(values)
+    scaler_X = StandardScaler().fit(df[SCALE_FEATURES] * 3 + 1)
+    y_class = (df['Age'] + df['Area_Risk_Index'] + rng.normal(size=n_rows) > 0).astype(int)
+    y_reg = df['log_Property_Value'] + 0.5 * df['Gender'] + rng.normal(scale=0.1, size=n_rows)
+    scaler_y = StandardScaler().fit(rng.normal(7.5, 0.5, size=(n_rows, 1)))
+    return {
+        'clf': RandomForestClassifier(n_estimators=n_estimators, max_depth=6, random_state=seed, n_jobs=1).fit(df, y_class),
+        'reg': GradientBoostingRegressor(n_estimators=n_estimators, max_depth=3, random_state=seed).fit(df, y_reg),
+        'scaler_X': scaler_X,
+        'scaler_y': scaler_y,
+        'label_encoders': label_encoders,
+        'scale_features': list(SCALE_FEATURES),
+        'feature_order': list(FEATURE_ORDER),
+    }
+
+
+@pytest.fixture
+def real_joblib(monkeypatch):
+    """Undo the joblib.load mock for the duration of one test."""
+    monkeypatch.setattr(joblib, 'load', _real_joblib_load)
+
+
+@pytest.fixture(scope='session')
+def artifacts():
+    return make_artifacts()
+
+
+@pytest.fixture
+def real_models_dir(tmp_path, artifacts):
+    """A models/ directory holding the seven legacy joblib files of `artifacts`."""
+    from app.registry import ARTIFACTS
+    for key, name in ARTIFACTS.items():
+        joblib.dump(artifacts[key], tmp_path / name)
+    return tmp_path
@@ -53,3 +53,41 @@ def test_regression():
     data = res.json()
     assert "expected_claim_cost" in data
     assert data["expected_claim_cost"] > 0
+
+
+def test_classification_batch():
+    res = client.post("/predict/classification/batch", json=[SAMPLE_PAYLOAD] * 3)
+    assert res.status_code == 200
+    data = res.json()
+    assert len(data) == 3
+    single = client.post("/predict/classification", json=SAMPLE_PAYLOAD).json()
+    assert all(row == single for row in data)
+
+
+def test_regression_batch():
+    res = client.post("/predict/regression/batch", json=[SAMPLE_PAYLOAD] * 3)
+    assert res.status_code == 200
+    data = res.json()
+    assert len(data) == 3
+    assert all(row["expected_claim_cost"] > 0 for row in data)
+
+
+def test_batch_empty():
+    res = client.post("/predict/classification/batch", json=[])
+    assert res.status_code == 200
+    assert res.json() == []
+
+
+def test_predict_combined():
+    res = client.post("/predict", json=SAMPLE_PAYLOAD)
+    assert res.status_code == 200
+    data = res.json()
+    clf = client.post("/predict/classification", json=SAMPLE_PAYLOAD).json()
+    reg = client.post("/predict/regression", json=SAMPLE_PAYLOAD).json()
+    assert data == {**clf, **reg}
+
+
+def test_predict_combined_batch():
+    res = client.post("/predict/batch", json=[SAMPLE_PAYLOAD] * 2)
+    assert res.status_code == 200
+    assert len(res.json()) == 2
@@ -0,0 +1,59 @@
+"""
+Offline batch scorer — same results as the upload endpoint, in input order,
+whether chunks are scored in-process or in a worker pool.
+"""
+
+import json
+
+import pandas as pd
+import pytest
+
+from app.batch import score_file
+from tests.test_api import client
+
+PORTFOLIO = pd.read_csv("Property Insurance.csv", nrows=60)
+
+
+@pytest.fixture
+def book(tmp_path):
+    path = tmp_path / "book.csv"
+    PORTFOLIO.to_csv(path, index=False)
+    return path
+
+
+def test_csv_output_matches_upload_endpoint(book, tmp_path):
+    out = tmp_path / "scores.csv"
+    stats = score_file(book, out, chunk_rows=11, workers=1)
+    scores = pd.read_csv(out, dtype={"Customer_ID": str})
+
+    res = client.post("/predict/upload", files={"file": ("book.csv", book.read_bytes(), "text/csv")})
+    expected = [json.loads(line) for line in res.text.splitlines()]
+
+    assert stats["rows"] == len(PORTFOLIO) == len(scores)
+    assert stats["errors"] == sum("error" in r for r in expected)
+    assert scores["Customer_ID"].tolist() == PORTFOLIO["Customer_ID"].tolist()
+    for row, exp in zip(scores.to_dict("records"), expected):
+        if "error" in exp:
+            assert row["error"] == exp["error"]
+        else:
+            assert row["probability"] == exp["probability"]
+            assert row["expected_claim_cost"] == exp["expected_claim_cost"]
+
+
+def test_process_pool_keeps_input_order(book, tmp_path):
+    score_file(book, tmp_path / "serial.csv", chunk_rows=7, workers=1)
+    score_file(book, tmp_path / "pool.csv", chunk_rows=7, workers=3)
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "serial.csv"), pd.read_csv(tmp_path / "pool.csv"))
+
+
+def test_parquet_output(book, tmp_path):
+    pytest.importorskip("pyarrow")
+    out = tmp_path / "scores.parquet"
+    score_file(book, out, chunk_rows=25, workers=1)
+    assert pd.read_parquet(out)["Customer_ID"].tolist() == PORTFOLIO["Customer_ID"].tolist()
+
+
+def test_csv_is_the_default_output(book, tmp_path):
+    out = tmp_path / "scores"          # no extension → CSV, no pyarrow needed
+    score_file(book, out, chunk_rows=25, workers=1)
+    assert pd.read_csv(out)["Customer_ID"].tolist() == PORTFOLIO["Customer_ID"].tolist()
@@ -0,0 +1,101 @@
+"""
+Micro-batcher tests — concurrent submits are coalesced into batched calls.
+"""
+
+import asyncio
+
+from app.batching import MicroBatcher, QueueFullError
+
+
+def _recording(calls):
+    def fn(items):
+        calls.append(list(items))
+        return [x * 10 for x in items]
+    return fn
+
+
+def test_concurrent_requests_share_one_batch():
+    calls = []
+    batcher = MicroBatcher(_recording(calls), max_batch_size=64, max_wait_ms=50)
+
+    async def main():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+
+    assert asyncio.run(main()) == [i * 10 for i in range(10)]
+    assert calls == [list(range(10))]
+
+
+def test_max_batch_size_splits_batches():
+    calls = []
+    batcher = MicroBatcher(_recording(calls), max_batch_size=4, max_wait_ms=50)
+
+    async def main():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+
+    assert asyncio.run(main()) == [i * 10 for i in range(10)]
+    assert [len(c) for c in calls] == [4, 4, 2]
+
+
+def test_queue_full_is_rejected():
+    batcher = MicroBatcher(_recording([]), max_batch_size=64, max_wait_ms=50, max_queue=3)
+
+    async def main():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(5)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert results[:3] == [0, 10, 20]
+    assert all(isinstance(r, QueueFullError) for r in results[3:])
+
+
+def test_failing_item_only_fails_its_caller():
+    def fn(items):
+        if 3 in items:
+            raise ValueError("bad row")
+        return items
+
+    batcher = MicroBatcher(fn, max_wait_ms=50)
+
+    async def main():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(5)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert results[:3] == [0, 1, 2] and results[4] == 4
+    assert isinstance(results[3], ValueError)
+
+
+def test_api_without_batching(monkeypatch):
+    import app.main
+    from tests.test_api import SAMPLE_PAYLOAD, client
+
+    batched = client.post("/predict", json=SAMPLE_PAYLOAD).json()
+    monkeypatch.setattr(app.main, "BATCHING_ENABLED", False)
+    assert client.post("/predict", json=SAMPLE_PAYLOAD).json() == batched
+
+
+def test_short_result_list_fails_callers_instead_of_hanging():
+    batcher = MicroBatcher(lambda items: items[:-1] if len(items) > 1 else [], max_wait_ms=50)
+
+    async def main():
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True), 5)
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(main()))
+
+
+def test_separate_event_loops_keep_their_own_queues():
+    import threading
+
+    batcher = MicroBatcher(_recording([]), max_wait_ms=20)
+    results = {}
+
+    def run(name, offset):
+        async def main():
+            return await asyncio.gather(*(batcher.submit(offset + i) for i in range(5)))
+        results[name] = asyncio.run(main())
+
+    threads = [threading.Thread(target=run, args=(n, 100 * n)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    assert results == {n: [(100 * n + i) * 10 for i in range(5)] for n in range(4)}
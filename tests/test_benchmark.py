@@ -0,0 +1,31 @@
+"""
+Benchmark harness smoke test (tiny iteration counts against the mocked models).
+"""
+
+from benchmarks.run import STAGES, bench_endpoints, bench_stages, compare, payloads, synthetic_policies
+from app.registry import registry
+from tests.test_api import client
+
+
+def test_synthetic_policies_are_valid_requests():
+    bodies = payloads(synthetic_policies(50))
+    assert len(bodies) == 50
+    assert client.post("/predict/classification/batch", json=bodies).status_code == 200
+
+
+def test_results_have_percentiles_per_stage_and_endpoint():
+    bodies = payloads(synthetic_policies(40))
+    stages = bench_stages(registry.current, bodies, sizes=[1, 4], iterations=5, warmup=1)
+    endpoints = bench_endpoints(client, bodies, sizes=[1, 4], iterations=5, concurrency=2, warmup=1)
+
+    assert set(stages) == {"1", "4"} and set(stages["4"]) == set(STAGES)
+    assert set(endpoints) == {
+        "/predict/classification[1]", "/predict/classification/batch[4]",
+        "/predict/regression[1]", "/predict/regression/batch[4]",
+    }
+    for r in [*stages["1"].values(), *endpoints.values()]:
+        assert r["p50"] <= r["p95"] <= r["p99"]
+    assert endpoints["/predict/regression/batch[4]"]["rows_per_sec"] > 0
+
+    run = {"stages": stages, "endpoints": endpoints}
+    assert len(compare(run, run)) == len(STAGES) * 2 + 4
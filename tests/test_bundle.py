@@ -0,0 +1,98 @@
+"""
+Model bundle tests — a bundle must serve exactly what the legacy files serve.
+"""
+
+import numpy as np
+import pytest
+
+from app import bundle
+from app.preprocess import preprocess_batch
+from app.registry import ModelRegistry, ModelSet, load_legacy
+from app.schemas import InsuranceInput
+from tests.test_api import SAMPLE_PAYLOAD
+
+RECORDS = [
+    InsuranceInput(**SAMPLE_PAYLOAD),
+    InsuranceInput(**{**SAMPLE_PAYLOAD, "gender": "Female", "age": 70, "building_age": 80}),
+]
+
+
+def _scores(models):
+    X = preprocess_batch(RECORDS, models)
+    return X.to_numpy(), models.clf.predict_proba(X), models.reg.predict(X)
+
+
+def _build(models_dir):
+    legacy = load_legacy(models_dir)
+    return bundle.write_bundle(models_dir / bundle.BUNDLE_DIR,
+                               **{k: v for k, v in legacy.items() if k != "version"})
+
+
+def test_array_scaler_matches_standard_scaler(artifacts):
+    scaler = artifacts["scaler_X"]
+    X = np.random.default_rng(1).normal(size=(50, len(artifacts["scale_features"])))
+    fast = bundle.ArrayScaler(scaler.mean_, scaler.scale_)
+    np.testing.assert_array_equal(fast.transform(X), scaler.transform(X))
+    np.testing.assert_array_equal(fast.inverse_transform(X), scaler.inverse_transform(X))
+
+
+def test_bundle_matches_legacy(real_joblib, real_models_dir):
+    legacy = ModelSet(**load_legacy(real_models_dir))
+    manifest = _build(real_models_dir)
+    assert manifest["feature_order"] == legacy.feature_order
+    assert set(manifest["libraries"]) >= {"numpy", "sklearn"}
+
+    from_bundle = ModelSet.load(real_models_dir)
+    assert from_bundle.source == "bundle"
+    assert from_bundle.version == manifest["model_version"]
+    for a, b in zip(_scores(legacy), _scores(from_bundle)):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_checksum_mismatch_is_rejected(real_joblib, real_models_dir):
+    _build(real_models_dir)
+    with open(real_models_dir / bundle.BUNDLE_DIR / bundle.MODELS_FILE, "ab") as f:
+        f.write(b"tampered")
+    with pytest.raises(bundle.BundleError):
+        bundle.read_bundle(real_models_dir / bundle.BUNDLE_DIR)
+
+
+def test_registry_reports_startup_timings(real_joblib, real_models_dir):
+    _build(real_models_dir)
+    registry = ModelRegistry(real_models_dir, warmup=lambda models: _scores(models))
+    models = registry.current
+    assert models.source == "bundle"
+    assert models.load_seconds > 0 and models.warmup_seconds > 0
+    assert registry.time_to_first_prediction > 0
+
+
+def test_native_bundle_skips_unpickling(real_joblib, real_models_dir):
+    _build(real_models_dir)
+    expected = _scores(ModelSet.load(real_models_dir))
+    (real_models_dir / bundle.BUNDLE_DIR / bundle.MODELS_FILE).unlink()   # never read by the native path
+    native = ModelSet.load(real_models_dir, engine="native")
+    for a, b in zip(expected, _scores(native)):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_rebuild_leaves_mapped_engine_untouched(real_joblib, real_models_dir):
+    import pandas as pd
+    from sklearn.base import clone
+
+    _build(real_models_dir)
+    live = ModelSet.load(real_models_dir, engine="native")
+    before = _scores(live)
+
+    # Retrain in place: a new bundle written over the directory the live set maps
+    legacy = {k: v for k, v in load_legacy(real_models_dir).items() if k != "version"}
+    rng = np.random.default_rng(7)
+    X = pd.DataFrame(rng.normal(size=(200, len(legacy["feature_order"]))), columns=legacy["feature_order"])
+    legacy["clf"] = clone(legacy["clf"]).set_params(random_state=7).fit(X, rng.integers(0, 2, 200))
+    legacy["reg"] = clone(legacy["reg"]).set_params(random_state=7).fit(X, rng.normal(size=200))
+    manifest = bundle.write_bundle(real_models_dir / bundle.BUNDLE_DIR, **legacy)
+
+    for a, b in zip(before, _scores(live)):
+        np.testing.assert_array_equal(a, b)
+    engine_dirs = list((real_models_dir / bundle.BUNDLE_DIR / bundle.ENGINE_DIR).iterdir())
+    assert [d.name for d in engine_dirs] == [manifest["engine_dir"].split("/")[-1]]
+    assert ModelSet.load(real_models_dir, engine="native").version == manifest["model_version"]
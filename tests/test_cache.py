@@ -0,0 +1,94 @@
+"""
+Prediction cache tests — canonical keys, LRU / TTL bounds and the shared disk backend.
+"""
+
+import os
+import time
+
+from app.cache import DiskCache, PredictionCache, cache_key
+from app.schemas import InsuranceInput
+from tests.test_api import SAMPLE_PAYLOAD, client
+
+
+def test_key_normalizes_numbers_and_includes_version():
+    a = InsuranceInput(**SAMPLE_PAYLOAD)
+    b = InsuranceInput(**{**SAMPLE_PAYLOAD, "credit_score": 650, "annual_income": 50000})
+    assert cache_key(a, "_predict", "v1") == cache_key(b, "_predict", "v1")
+    assert cache_key(a, "_predict", "v1") != cache_key(a, "_predict", "v2")
+    assert cache_key(a, "_predict", "v1") != cache_key(a, "_classify", "v1")
+
+
+def test_lru_eviction_and_counters():
+    cache = PredictionCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1          # "a" is now most recently used
+    cache.set("c", 3)                   # evicts "b"
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 1, 1)
+
+
+def test_ttl_expiry():
+    cache = PredictionCache(max_size=10, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_disk_cache_is_shared(tmp_path):
+    path = str(tmp_path / "predictions.sqlite")
+    writer, reader = DiskCache(path, max_size=2), DiskCache(path, max_size=2)
+    writer.set("a", {"probability": 0.8})
+    assert reader.get("a") == {"probability": 0.8}
+    writer.set("b", {})
+    writer.set("c", {})
+    assert reader.stats()["size"] == 2
+
+
+def test_disk_cache_size_tracks_overwrites_deletes_and_expiry(tmp_path):
+    cache = DiskCache(str(tmp_path / "predictions.sqlite"), max_size=3, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("a", 2)                       # overwrite, not a new row
+    cache.set("b", 3)
+    assert cache.stats()["size"] == 2
+    time.sleep(0.1)
+    assert cache.get("a") is None           # expired → deleted
+    assert cache.stats()["size"] == 1
+    for key in "cdef":
+        cache.set(key, 0)
+    assert cache.stats()["size"] == 3 and cache.stats()["evictions"] == 2
+
+
+def test_disk_cache_opens_its_own_connection_after_fork(tmp_path):
+    cache = DiskCache(str(tmp_path / "predictions.sqlite"))
+    cache.set("parent", 1)                  # parent holds an open connection
+    parent_conn = cache._conn()
+    pid = os.fork()
+    if pid == 0:                            # worker: must not reuse the parent's connection
+        try:
+            fresh = cache._conn() is not parent_conn
+            cache.set("child", 2)
+            os._exit(0 if fresh and cache.get("parent") == 1 else 1)
+        except BaseException:
+            os._exit(1)
+    assert os.waitpid(pid, 0)[1] == 0
+    assert cache.get("child") == 2
+
+
+def test_api_serves_repeats_from_cache():
+    before = client.get("/cache/stats").json()
+    client.post("/predict", json={**SAMPLE_PAYLOAD, "building_age": 42})
+    client.post("/predict", json={**SAMPLE_PAYLOAD, "building_age": 42})
+    after = client.get("/cache/stats").json()
+    assert after["enabled"]
+    assert after["hits"] - before["hits"] >= 1
+
+
+def test_api_with_disk_cache(tmp_path, monkeypatch):
+    import app.main
+    monkeypatch.setattr(app.main, "_cache", DiskCache(str(tmp_path / "predictions.sqlite")))
+    first = client.post("/predict", json=SAMPLE_PAYLOAD).json()
+    assert client.post("/predict", json=SAMPLE_PAYLOAD).json() == first
+    assert client.get("/cache/stats").json()["hits"] == 1
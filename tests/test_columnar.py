@@ -0,0 +1,67 @@
+"""
+Columnar request format — same scores as /predict/batch, per-row errors from the
+column-wise Field checks, Arrow in / out when pyarrow is installed.
+"""
+
+import json
+
+import pytest
+
+from tests.test_api import client, SAMPLE_PAYLOAD
+
+ROWS = [SAMPLE_PAYLOAD, {**SAMPLE_PAYLOAD, "age": 30, "gender": "Female"}, {**SAMPLE_PAYLOAD, "building_age": 60}]
+
+
+def _columns(rows) -> dict:
+    return {field: [r[field] for r in rows] for field in rows[0]}
+
+
+def test_matches_batch_endpoint():
+    res = client.post("/predict/columnar", json=_columns(ROWS))
+    assert res.status_code == 200
+    out = res.json()
+    expected = client.post("/predict/batch", json=ROWS).json()
+
+    assert out["Customer_ID"] == [0, 1, 2]
+    assert out["error"] == [None, None, None]
+    for key in ("risk_category", "risk_label", "probability", "expected_claim_cost"):
+        assert out[key] == [e[key] for e in expected]
+    assert res.headers["X-Model-Version"]
+
+
+def test_field_constraints_are_checked_per_column():
+    cols = _columns(ROWS)
+    cols["Customer_ID"] = ["A", "B", "C"]
+    cols["customer_satisfaction"] = [4, 9, 4]       # le=5
+    cols["annual_income"] = [50000.0, 60000.0, None]
+    out = client.post("/predict/columnar", json=cols).json()
+
+    assert out["Customer_ID"] == ["A", "B", "C"]
+    assert out["error"][0] is None and out["probability"][0] is not None
+    assert out["error"][1] == "Out of range: Customer_Satisfaction (>= 1, <= 5, whole number)"
+    assert out["error"][2] == "Missing or invalid: Annual_Income"
+    assert out["probability"][1] is None and out["risk_category"][2] is None
+
+
+def test_malformed_bodies_are_rejected():
+    cols = _columns(ROWS)
+    cols["age"] = cols["age"][:2]
+    assert client.post("/predict/columnar", json=cols).status_code == 422
+    assert client.post("/predict/columnar", json=ROWS).status_code == 422
+    res = client.post("/predict/columnar", content=b"age\n45", headers={"Content-Type": "text/csv"})
+    assert res.status_code == 415
+
+
+def test_arrow_round_trip():
+    pa = pytest.importorskip("pyarrow")
+    table = pa.table(_columns(ROWS))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    res = client.post("/predict/columnar", content=sink.getvalue().to_pybytes(),
+                      headers={"Content-Type": "application/vnd.apache.arrow.stream",
+                               "Accept": "application/vnd.apache.arrow.stream"})
+    assert res.status_code == 200
+    out = pa.ipc.open_stream(res.content).read_all().to_pydict()
+    expected = client.post("/predict/columnar", json=_columns(ROWS)).json()
+    assert out["probability"] == expected["probability"]
@@ -0,0 +1,125 @@
+"""
+Model compression (compress_models.py): depth capping without refits, float32
+engine arrays that take the same branches, greedy selection / truncation that
+stays within the accuracy budget, and a servable compressed artifact set.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.preprocessing import StandardScaler
+
+import compress_models
+import save_models
+from app.engine import compile_classifier, compile_regressor, to_float32
+from app.registry import ModelSet
+from app.scoring import score_frame
+
+rng = np.random.default_rng(5)
+X = rng.normal(size=(1200, 6))
+y_class = (X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(scale=0.5, size=len(X)) > 0).astype(int)
+y_reg = X[:, 0] + 0.5 * X[:, 3] ** 2 + rng.normal(scale=0.1, size=len(X))
+train, test = slice(0, 800), slice(800, None)
+
+
+@pytest.fixture(scope="module")
+def forest():
+    return RandomForestClassifier(n_estimators=30, max_depth=8, random_state=0, n_jobs=1).fit(X[train], y_class[train])
+
+
+@pytest.fixture(scope="module")
+def boosting():
+    return GradientBoostingRegressor(n_estimators=40, max_depth=3, random_state=0).fit(X[train], y_reg[train])
+
+
+def _node_depths(tree):
+    depths = np.zeros(tree.node_count, dtype=int)
+    for node in range(tree.node_count):          # children always come after their parent
+        for child in (tree.children_left[node], tree.children_right[node]):
+            if child != -1:
+                depths[child] = depths[node] + 1
+    return depths
+
+
+def test_cap_depth_predicts_the_stored_value_of_the_ancestor(forest):
+    original = forest.estimators_[0]
+    capped = compress_models.cap_depth(original, 3)
+    assert capped.get_depth() == 3 and capped.tree_.node_count < original.tree_.node_count
+    assert original.get_depth() == 8                                      # the original is untouched
+
+    Xt = X[test].astype(np.float32)
+    depths = _node_depths(original.tree_)
+    path = original.decision_path(Xt).toarray().astype(bool)
+    ancestor = np.array([np.flatnonzero(row & (depths <= 3))[-1] for row in path])
+    expected = original.tree_.value[ancestor, 0] / original.tree_.value[ancestor, 0].sum(axis=1, keepdims=True)
+    np.testing.assert_allclose(capped.predict_proba(Xt), expected)
+    assert compress_models.cap_depth(original, 8) is original
+
+
+def test_float32_engine_takes_the_same_branches(forest, boosting):
+    for engine in (compile_classifier(forest), compile_regressor(boosting)):
+        narrow = to_float32(engine)
+        assert narrow.trees.threshold.dtype == narrow.trees.value.dtype == np.float32
+        # Inputs exactly at, just above and just below every threshold
+        t = engine.trees.threshold[engine.trees.threshold != -2].astype(np.float32)
+        edges = np.concatenate([t, np.nextafter(t, np.float32(np.inf)), np.nextafter(t, np.float32(-np.inf))])
+        probe = np.tile(edges[:, None], (1, X.shape[1]))
+        np.testing.assert_array_equal(narrow.trees.apply(probe), engine.trees.apply(probe))
+    np.testing.assert_allclose(to_float32(compile_classifier(forest)).predict_proba(X[test]),
+                               forest.predict_proba(X[test]), rtol=1e-6)
+
+
+def test_auc_rows_matches_sklearn():
+    scores = np.round(rng.random((4, 300)), 2)                         # with ties
+    positive = rng.random(300) < 0.3
+    np.testing.assert_allclose(compress_models.auc_rows(scores, positive),
+                               [roc_auc_score(positive, s) for s in scores])
+
+
+def test_classifier_selection_stays_within_budget(forest):
+    full = roc_auc_score(y_class[test], forest.predict_proba(X[test])[:, 1])
+    small, info = compress_models.compress_classifier(forest, X[test], y_class[test], max_auc_drop=0.01)
+    assert info["method"] == "selection" and len(small.estimators_) == info["trees"] < 30
+    assert compress_models._nodes(small) < compress_models._nodes(forest)
+    assert roc_auc_score(y_class[test], small.predict_proba(X[test])[:, 1]) >= full - 0.01
+    assert len(forest.estimators_) == 30                               # compressed as a copy
+
+
+def test_regressor_truncation_stays_within_budget(boosting):
+    scaler_y = StandardScaler().fit(rng.normal(7.5, 0.5, size=(100, 1)))
+    y_dollars = save_models._inv_y(y_reg[test], scaler_y)
+    full = compress_models._dollar_rmse(boosting, X[test], y_dollars, scaler_y)
+    small, info = compress_models.compress_regressor(boosting, X[test], y_dollars, scaler_y, max_rmse_increase=0.05)
+    assert small.estimators_.shape == (info["trees"], 1) and compress_models._nodes(small) < compress_models._nodes(boosting)
+    assert compress_models._dollar_rmse(small, X[test], y_dollars, scaler_y) <= full * 1.05
+    if info["depth"] == 3:                                              # plain truncation = staged prediction
+        np.testing.assert_allclose(small.predict(X[test]), list(boosting.staged_predict(X[test]))[info["trees"] - 1])
+
+
+def test_compressed_set_is_servable(tmp_path, real_joblib):
+    data = tmp_path / "policies.csv"
+    pd.read_csv("Property Insurance.csv", nrows=400).to_csv(data, index=False)
+    save_models.train(data, tmp_path / "models", tmp_path / "cache", n_jobs=1)
+
+    report = compress_models.compress_models(tmp_path / "models", tmp_path / "out", data, tmp_path / "cache",
+                                             distill=True, float32=True, n_jobs=1)
+    assert json.loads((tmp_path / "out" / compress_models.REPORT_FILE).read_text()) == report
+    for key in ("rf_classifier", "gb_regressor"):
+        before, after = report[key]["before"], report[key]["after"]
+        assert after["nodes"] <= before["nodes"] and after["engine_bytes"]["float32"] < before["engine_bytes"]["float64"]
+        assert {"sklearn", "native"} == set(after["latency"]) and "row_ms" in after["latency"]["native"]
+    select = report["rf_classifier"]
+    assert select["after"]["metrics"]["select"]["roc_auc"] >= select["before"]["metrics"]["select"]["roc_auc"] - 0.0051
+
+    rows = pd.read_csv(data).dropna().head(20)
+    sklearn_set = ModelSet.load(tmp_path / "out")
+    native_set = ModelSet.load(tmp_path / "out", engine="native")            # float32 bundle arrays
+    assert native_set.clf.trees.value.dtype == np.float32
+    a, b = score_frame(rows, sklearn_set), score_frame(rows, native_set)
+    assert a["error"].isna().all()
+    np.testing.assert_allclose(a["probability"], b["probability"], atol=1e-4)
+    np.testing.assert_allclose(a["expected_claim_cost"], b["expected_claim_cost"], rtol=1e-5)
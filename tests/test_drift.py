@@ -0,0 +1,120 @@
+"""
+Drift monitor — streaming statistics match the whole-sample ones, PSI / KS
+separate a shifted distribution from the reference, and live traffic (including
+unseen labels) shows up at GET /drift.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app.main
+from app import drift
+from app.drift import FeatureStats, Reference, ks, psi
+from app.encoding import compile_encoders
+from app.preprocess import RAW_COLUMNS, preprocess_batch
+from app.registry import ModelSet, registry
+from app.schemas import InsuranceInput
+from app.scoring import score_frame
+from tests.test_api import client, SAMPLE_PAYLOAD
+
+rng = np.random.default_rng(7)
+
+
+def _frame(n, shift=0.0):
+    return pd.DataFrame({"a": rng.normal(shift, 1.0, n), "b": rng.normal(0.0, 2.0, n),
+                         "c": rng.integers(0, 3, n)})
+
+
+def test_batched_welford_matches_numpy():
+    stats = FeatureStats(["a", "b"], {"c": ["x", "y", "z"]})
+    frames = [_frame(n) for n in (1, 7, 500, 64)]
+    frames[2].loc[::10, "a"] = np.nan
+    for f in frames:
+        stats.update(f)
+    whole = pd.concat(frames)
+    a = whole["a"].dropna()
+    assert stats.rows == len(whole)
+    assert stats.count.tolist() == [len(a), len(whole)]
+    np.testing.assert_allclose(stats.mean, [a.mean(), whole["b"].mean()])
+    np.testing.assert_allclose(stats.std, [a.std(ddof=0), whole["b"].std(ddof=0)])
+    assert stats.bins.sum(axis=1).tolist() == stats.count.tolist()
+    assert stats.classes[0].tolist() == np.bincount(whole["c"], minlength=3).tolist()
+
+
+def test_psi_and_ks_flag_a_shift_against_scaler_reference():
+    reference = Reference.from_scaler(["a"])
+    assert reference.bins["a"].sum() == pytest.approx(1.0)
+    for shift, stable in ((0.0, True), (1.0, False)):
+        stats = FeatureStats(["a"], {})
+        stats.update(_frame(20_000, shift))
+        live = stats.bins[0] / stats.bins[0].sum()
+        assert (psi(live, reference.bins["a"]) < 0.02) is stable
+        assert (ks(live, reference.bins["a"]) < 0.05) is stable
+    assert psi(live, reference.bins["a"]) > drift.PSI_ALERT
+
+
+def test_csv_reference_matches_its_own_traffic(tmp_path, artifacts):
+    models = ModelSet(artifacts["clf"], artifacts["reg"], artifacts["scaler_X"], artifacts["scaler_y"],
+                      compile_encoders(artifacts["label_encoders"]), artifacts["scale_features"],
+                      artifacts["feature_order"], version="drift")
+    records = [InsuranceInput(**{**SAMPLE_PAYLOAD, "age": int(a), "credit_score": int(c)})
+               for a, c in zip(rng.integers(18, 90, 300), rng.integers(300, 850, 300))]
+    csv = tmp_path / "train.csv"
+    rows = pd.DataFrame([{RAW_COLUMNS[f]: v for f, v in r.model_dump().items() if f in RAW_COLUMNS}
+                         for r in records])
+    incomplete = rows.head(40).copy()                   # the API rejects these; the reference skips them
+    incomplete.loc[:19, "Gender"] = None
+    incomplete.loc[20:, "Age"] = None
+    pd.concat([rows, incomplete]).to_csv(csv, index=False)
+
+    reference = drift.reference_profile(models, csv)
+    assert reference.source == "train.csv"
+    monitor = drift.DriftMonitor(models, reference)
+    monitor.observe(preprocess_batch(records, models, observe=False))
+    report = monitor.report()
+    assert report["rows"] == 300 and report["drifted"] == []
+    assert report["numeric"]["Age"]["psi"] == pytest.approx(0.0, abs=1e-9)
+    assert report["categorical"]["Gender"]["psi"] == pytest.approx(0.0, abs=1e-9)
+    assert report["numeric"]["Age"]["mean"] == pytest.approx(report["numeric"]["Age"]["reference_mean"])
+
+
+def test_drift_endpoint_counts_traffic_and_unseen_labels(monkeypatch):
+    monkeypatch.setattr(app.main, "_cache", None)
+    drift.monitor(registry.current).reset()
+    payloads = [SAMPLE_PAYLOAD, {**SAMPLE_PAYLOAD, "maintenance_level": "Medium"}]
+    assert client.post("/predict/batch", json=payloads).status_code == 200
+    assert client.post("/predict", json=payloads[1]).status_code == 200
+
+    body = client.get("/drift").json()
+    assert body["enabled"] and body["model_version"] == registry.current.version
+    assert body["rows"] == 3
+    assert body["reference"] in ("Property Insurance.csv", "scaler_X")
+    maintenance = body["categorical"]["Maintenance_Level"]
+    assert maintenance["count"] == 3 and maintenance["unseen"] == 2
+    assert body["categorical"]["Gender"]["unseen"] == 0
+    assert body["numeric"]["Age"]["count"] == 3 and body["numeric"]["Age"]["std"] == 0.0
+
+
+def test_drift_reset_requires_admin_token(monkeypatch):
+    assert client.post("/admin/drift/reset").status_code == 403
+    monkeypatch.setattr(app.main, "ADMIN_TOKEN", "s3cret")
+    client.post("/predict/batch", json=[SAMPLE_PAYLOAD])
+    assert client.post("/admin/drift/reset", headers={"X-Admin-Token": "s3cret"}).json()["reset"]
+    assert client.get("/drift").json()["rows"] == 0
+
+
+def test_reference_path_is_relative_to_the_repository(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert drift.reference_profile(registry.current).source == drift.DRIFT_REFERENCE
+
+
+def test_offline_scoring_is_not_observed():
+    monitor = drift.monitor(registry.current)
+    before = monitor.report()["rows"]
+    rows = pd.read_csv("Property Insurance.csv", nrows=50)
+    score_frame(rows, registry.current)
+    preprocess_batch([InsuranceInput(**SAMPLE_PAYLOAD)], registry.current)
+    assert monitor.report()["rows"] == before
+    preprocess_batch([InsuranceInput(**SAMPLE_PAYLOAD)], registry.current, observe=True)
+    assert monitor.report()["rows"] == before + 1
@@ -0,0 +1,49 @@
+"""
+Compiled encoder tables must agree with LabelEncoder.transform as used in the notebook.
+"""
+
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+
+from app.encoding import EncoderTable, compile_encoders
+
+
+def _fit(values):
+    return LabelEncoder().fit(np.asarray(values).astype(str))
+
+
+def test_matches_label_encoder():
+    le = _fit(['Urban', 'Rural', 'Suburban', 'Urban'])
+    table = EncoderTable(le.classes_)
+    for val in ['Rural', 'Suburban', 'Urban']:
+        assert table.encode(val) == le.transform([val])[0]
+
+
+def test_float_string_normalization():
+    le = _fit([1.0, 2.0, 3.0, 4.0, 5.0])   # notebook stored Customer_Satisfaction as float
+    table = compile_encoders({'Customer_Satisfaction': le})['Customer_Satisfaction']
+    assert table.encode(4) == le.transform(['4.0'])[0]
+    assert table.encode('4') == table.encode(4.0) == table.encode('04')
+
+
+def test_unseen_label_falls_back_to_zero():
+    table = EncoderTable(_fit(['High', 'Low', 'Moderate']).classes_)
+    assert table.lookup('Medium') is None
+    assert table.encode('Medium') == 0
+    assert table.encode(None) == 0
+
+
+def test_encode_column_matches_scalar():
+    le = _fit([5, 10, 15, 20])
+    table = EncoderTable(le.classes_)
+    values = [10, 20, 7, 5, 10, 15.0, '20']
+    np.testing.assert_array_equal(
+        table.encode_column(values), [table.encode(v) for v in values]
+    )
+
+
+def test_encode_counted_reports_unseen_rows():
+    table = EncoderTable(_fit(['High', 'Low', 'Moderate']).classes_)
+    codes, unseen = table.encode_counted(['Low', 'Medium', 'High', 'Medium', None])
+    assert codes.tolist() == [1, 0, 0, 0, 0]
+    assert unseen == 3
@@ -0,0 +1,97 @@
+"""
+Parity tests — the native engine must match sklearn (n_jobs=1) bit for bit.
+Small forests are trained on synthetic data shaped like the 20 production features.
+"""
+
+import copy
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
+
+from app.engine import compile_classifier, compile_regressor
+
+rng = np.random.default_rng(0)
+X_train = rng.normal(size=(400, 20))
+X_train[:, 1:6] = rng.integers(0, 4, size=(400, 5))       # label-encoded columns
+y_class = (X_train[:, 0] + X_train[:, 3] + rng.normal(size=400) > 1).astype(int)
+y_reg = X_train[:, 0] * 2 + np.sin(X_train[:, 7]) + rng.normal(scale=0.1, size=400)
+
+
+@pytest.fixture(scope="module")
+def rf():
+    return RandomForestClassifier(n_estimators=25, max_depth=10, n_jobs=1, random_state=0).fit(X_train, y_class)
+
+
+@pytest.fixture(scope="module")
+def gb():
+    return GradientBoostingRegressor(n_estimators=40, max_depth=4, random_state=0).fit(X_train, y_reg)
+
+
+@pytest.mark.parametrize("n_rows", [1, 7, 5000])
+def test_forest_parity(rf, n_rows):
+    X = rng.normal(size=(n_rows, 20))
+    native = compile_classifier(rf)
+    np.testing.assert_array_equal(native.predict_proba(X), rf.predict_proba(X))
+    np.testing.assert_array_equal(native.predict(X), rf.predict(X))
+
+
+@pytest.mark.parametrize("n_rows", [1, 7, 5000])
+def test_boosting_parity(gb, n_rows):
+    X = rng.normal(size=(n_rows, 20))
+    np.testing.assert_array_equal(compile_regressor(gb).predict(X), gb.predict(X))
+
+
+def test_threaded_forest_parity(rf):
+    # Production RF keeps n_jobs=-1: sklearn then sums trees in thread-completion order
+    threaded = RandomForestClassifier(n_estimators=25, max_depth=10, n_jobs=-1, random_state=0).fit(X_train, y_class)
+    native = compile_classifier(threaded)
+    X = rng.normal(size=(2000, 20))
+    np.testing.assert_allclose(native.predict_proba(X), threaded.predict_proba(X), rtol=0, atol=1e-12)
+
+    threaded.set_params(n_jobs=1)           # same trees, deterministic order: exact
+    np.testing.assert_array_equal(native.predict_proba(X), threaded.predict_proba(X))
+    np.testing.assert_array_equal(native.predict_proba(X), rf.predict_proba(X))
+
+
+def test_training_rows_parity(rf, gb):
+    # Exact threshold ties: training values sit on both sides of every split
+    np.testing.assert_array_equal(compile_classifier(rf).predict_proba(X_train), rf.predict_proba(X_train))
+    np.testing.assert_array_equal(compile_regressor(gb).predict(X_train), gb.predict(X_train))
+
+
+def test_count_valued_leaves_are_normalized(rf):
+    # sklearn < 1.4 stores weighted class counts in tree_.value, later versions fractions
+    counts = copy.deepcopy(rf)
+    for est in counts.estimators_:
+        state = est.tree_.__getstate__()
+        state["values"] = state["values"] * est.tree_.weighted_n_node_samples[:, None, None]
+        est.tree_.__setstate__(state)
+    assert counts.estimators_[0].tree_.value.sum(axis=2).max() > 1
+
+    native = compile_classifier(counts)
+    np.testing.assert_allclose(native.trees.value.sum(axis=1), 1.0)
+    X = rng.normal(size=(300, 20))
+    np.testing.assert_allclose(native.predict_proba(X), rf.predict_proba(X), rtol=0, atol=1e-12)
+
+
+def test_missing_values_parity():
+    X_nan = X_train.copy()
+    X_nan[rng.random(X_nan.shape) < 0.1] = np.nan
+    rf_nan = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0).fit(X_nan, y_class)
+    X = rng.normal(size=(200, 20))
+    X[rng.random(X.shape) < 0.2] = np.nan
+    np.testing.assert_array_equal(compile_classifier(rf_nan).predict_proba(X), rf_nan.predict_proba(X))
+
+
+def test_saved_engine_is_memory_mapped(rf, gb, tmp_path):
+    from app.engine import load_native, save_native
+
+    X = rng.normal(size=(50, 20))
+    for model, engine in ((rf, compile_classifier(rf)), (gb, compile_regressor(gb))):
+        meta = save_native(engine, tmp_path / engine.kind)
+        loaded = load_native(tmp_path / engine.kind, meta)
+        assert isinstance(loaded.trees.threshold, np.memmap)
+        assert not loaded.trees.threshold.flags.writeable
+        method = "predict_proba" if engine.kind == "forest" else "predict"
+        np.testing.assert_array_equal(getattr(loaded, method)(X), getattr(model, method)(X))
@@ -0,0 +1,98 @@
+"""
+State-level enrichment — the index encodes and standardizes External
+Variables.csv once, the API joins it by dict lookup, and a model trained with
+--external sees exactly the features the API builds for the same rows.
+"""
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+import save_models
+from app.encoding import compile_encoders
+from app.enrichment import EnrichmentIndex
+from app.preprocess import RAW_COLUMNS, preprocess_batch, preprocess_frame, sweep
+from app.registry import OPTIONAL_ARTIFACTS, ModelSet
+from app.schemas import InsuranceInput
+from tests.test_api import SAMPLE_PAYLOAD
+
+INDEX = EnrichmentIndex.from_csv("External Variables.csv")
+
+
+def test_index_is_encoded_standardized_and_keyed_by_state():
+    assert "State_Coastal_Exposure" in INDEX.columns and len(INDEX.states) == 10
+    values = INDEX.matrix[:INDEX.unknown]
+    np.testing.assert_allclose(values.mean(axis=0), 0.0, atol=1e-12)
+    np.testing.assert_allclose(values.std(axis=0), 1.0)
+
+    table = pd.read_csv("External Variables.csv").set_index("State")
+    density = INDEX.features(["Kuala Lumpur", " kuala lumpur", "Atlantis", None, float("nan")])["State_Population_Density"]
+    expected = (7500 - table["Population_Density"].mean()) / table["Population_Density"].std(ddof=0)
+    np.testing.assert_allclose(density, [expected, expected, 0.0, 0.0, 0.0])
+    coastal = INDEX.features(["Johor", "Selangor"])["State_Coastal_Exposure"]
+    assert coastal[0] > 0 > coastal[1]
+
+    assert EnrichmentIndex.from_dict(INDEX.to_dict()).matrix.tolist() == INDEX.matrix.tolist()
+
+
+def test_batch_and_sweep_join_the_index(artifacts):
+    feature_order = artifacts["feature_order"] + INDEX.columns
+    models = ModelSet(None, None, artifacts["scaler_X"], artifacts["scaler_y"],
+                      compile_encoders(artifacts["label_encoders"]), artifacts["scale_features"],
+                      feature_order, version="enriched", enrichment=INDEX)
+    states = ["Sabah", "Penang", None, "Nowhere"]
+    records = [InsuranceInput(**{**SAMPLE_PAYLOAD, "location": s}) for s in states]
+    X = preprocess_batch(records, models, observe=False)
+    assert list(X.columns) == feature_order
+    np.testing.assert_array_equal(X[INDEX.columns].to_numpy(), INDEX.matrix[[INDEX.row(s) for s in states]])
+
+    grid = sweep(records[0], {"location": states}, models)
+    pd.testing.assert_frame_equal(grid, X)
+
+    raw = pd.DataFrame({c: [getattr(r, f) for r in records] for f, c in RAW_COLUMNS.items()})
+    pd.testing.assert_frame_equal(preprocess_frame(raw.assign(Location=states), models, observe=False), X)
+
+
+@pytest.fixture(scope="module")
+def trained(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("enriched")
+    data = tmp / "policies.csv"
+    pd.read_csv("Property Insurance.csv", nrows=400).to_csv(data, index=False)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(joblib, "load", joblib.numpy_pickle.load)
+        report = save_models.train(data, tmp / "models", tmp / "cache", n_jobs=1, bundle=True,
+                                   external="External Variables.csv")
+        features = save_models.cached_features(data, tmp / "cache", external="External Variables.csv")[0]
+        models = ModelSet.load(tmp / "models")
+    return data, tmp / "models", report, features, models
+
+
+def test_training_and_serving_build_the_same_features(trained):
+    data, _, report, features, models = trained
+    assert report["external"] == "External Variables.csv"
+    assert models.source == "bundle" and models.enrichment.columns == INDEX.columns
+    assert set(INDEX.columns) <= set(models.feature_order)
+    assert not set(INDEX.columns) & set(models.scale_features)
+
+    # Rows the training pipeline didn't have to impute
+    X_test = features["X_test"]
+    raw = pd.read_csv(data).loc[X_test.index]
+    complete = raw.notna().all(axis=1)
+    served = preprocess_frame(raw[complete], models, observe=False)
+    np.testing.assert_allclose(served.to_numpy(dtype=float), X_test[complete].to_numpy(dtype=float), rtol=1e-9)
+
+
+def test_enrichment_is_part_of_the_version_and_removed_when_retrained_without(trained, tmp_path, real_joblib):
+    data, _, report, _, enriched = trained
+    plain = save_models.train(data, tmp_path / "models", tmp_path / "cache", n_jobs=1)
+    assert plain["data_hash"] != report["data_hash"]
+
+    legacy = tmp_path / "models"
+    joblib.dump(INDEX.to_dict(), legacy / OPTIONAL_ARTIFACTS["enrichment"])
+    with_index = ModelSet.load(legacy)
+    assert with_index.enrichment is not None
+    save_models.train(data, legacy, tmp_path / "cache", n_jobs=1)
+    assert not (legacy / OPTIONAL_ARTIFACTS["enrichment"]).exists()
+    retrained = ModelSet.load(legacy)
+    assert retrained.enrichment is None and retrained.version != with_index.version
@@ -0,0 +1,48 @@
+"""
+Inference executor — bounded queue with fast rejection, thread caps on the models.
+"""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import app.main as main
+from app.executor import ExecutorBusyError, InferenceExecutor
+from app.registry import ModelSet
+from tests.test_api import client, SAMPLE_PAYLOAD
+
+
+def test_full_queue_is_rejected_immediately():
+    executor = InferenceExecutor(workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        while executor.running == 0:
+            await asyncio.sleep(0.001)
+        queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorBusyError):
+            await executor.run(lambda: "rejected")
+        assert executor.stats()["waiting"] == 1
+        release.set()
+        return await running, await queued
+
+    assert asyncio.run(scenario()) == (True, "queued")
+    assert executor.stats() == {"workers": 1, "max_queue": 1, "waiting": 0, "running": 0, "rejected": 1}
+
+
+def test_model_thread_pools_are_overridden_at_load():
+    clf = SimpleNamespace(n_jobs=-1)        # as pickled by the notebook
+    ModelSet(clf, object(), None, None, {}, [], [], version="v", n_jobs=1)
+    assert clf.n_jobs == 1
+
+
+def test_saturated_executor_returns_429(monkeypatch):
+    monkeypatch.setattr(main, "_inference", InferenceExecutor(workers=1, max_queue=0))
+    res = client.post("/predict/batch", json=[{**SAMPLE_PAYLOAD, "age": 77}])
+    assert res.status_code == 429
+    assert res.headers["Retry-After"] == "1"
+    assert 'insurance_api_errors_total{path="/predict/batch",type="overloaded"}' in client.get("/metrics").text
@@ -0,0 +1,127 @@
+"""
+TreeSHAP explanations — exact Shapley values of the path-dependent tree games
+(checked by brute force over every coalition), additive to the predictions,
+served per policy and in batches, cached.
+"""
+
+import itertools
+from math import factorial
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
+
+from app.encoding import compile_encoders
+from app.engine import compile_classifier, compile_regressor
+from app.explain import LeafPaths, ModelExplainer
+from app.preprocess import preprocess_batch
+from app.registry import ModelSet, registry
+from app.schemas import InsuranceInput
+from app.scoring import cost, risk
+from tests.test_api import client, SAMPLE_PAYLOAD
+
+rng = np.random.default_rng(3)
+X_train = rng.normal(size=(400, 5))
+X_train[rng.random(X_train.shape) < 0.05] = np.nan
+X_test = np.vstack([rng.normal(size=(3, 5)), [[np.nan, 0.3, -1.0, np.nan, 2.0]]])
+
+
+def _expected(tree, x, coalition, output, node=0):
+    """E[f(x) | x_S] as the path-dependent tree algorithm defines it."""
+    left, right = tree.children_left[node], tree.children_right[node]
+    if left == -1:
+        return output(tree.value[node])
+    f = tree.feature[node]
+    if f in coalition:
+        goes_left = tree.missing_go_to_left[node] if np.isnan(x[f]) else x[f] <= tree.threshold[node]
+        return _expected(tree, x, coalition, output, left if goes_left else right)
+    w = tree.weighted_n_node_samples
+    return (w[left] * _expected(tree, x, coalition, output, left)
+            + w[right] * _expected(tree, x, coalition, output, right)) / w[node]
+
+
+def _brute_force(value, x, n_features):
+    phi = np.zeros(n_features)
+    for i in range(n_features):
+        others = [j for j in range(n_features) if j != i]
+        for size in range(n_features):
+            weight = factorial(size) * factorial(n_features - size - 1) / factorial(n_features)
+            for S in itertools.combinations(others, size):
+                phi[i] += weight * (value(x, {*S, i}) - value(x, set(S)))
+    return phi
+
+
+def test_forest_matches_brute_force_shapley():
+    y = (np.nan_to_num(X_train[:, 0]) + np.nan_to_num(X_train[:, 1] * X_train[:, 2]) > 0).astype(int)
+    rf = RandomForestClassifier(n_estimators=4, max_depth=4, random_state=0, n_jobs=1).fit(X_train, y)
+    engine = compile_classifier(rf)
+    paths = LeafPaths(engine.trees, engine.trees.value[:, 1] / engine.trees.n_trees)
+
+    def value(x, S):
+        return np.mean([_expected(e.tree_, x.astype(np.float32), S, lambda v: v[0, 1]) for e in rf.estimators_])
+
+    phi = paths.shap_values(X_test, 5)
+    for x, row in zip(X_test, phi):
+        np.testing.assert_allclose(row, _brute_force(value, x, 5), atol=1e-12)
+    np.testing.assert_allclose(phi.sum(axis=1) + paths.expected_value, rf.predict_proba(X_test)[:, 1], atol=1e-12)
+
+
+def test_boosting_matches_brute_force_shapley():
+    X = np.nan_to_num(X_train)
+    gb = GradientBoostingRegressor(n_estimators=5, max_depth=3, random_state=0).fit(X, X[:, 0] * X[:, 3] + X[:, 1])
+    engine = compile_regressor(gb)
+    paths = LeafPaths(engine.trees, engine.learning_rate * engine.trees.value[:, 0], offset=engine.baseline)
+
+    def value(x, S):
+        return engine.baseline + sum(gb.learning_rate * _expected(e.tree_, x.astype(np.float32), S, lambda v: v[0, 0])
+                                     for e in gb.estimators_[:, 0])
+
+    Xt = np.nan_to_num(X_test)
+    phi = paths.shap_values(Xt, 5)
+    for x, row in zip(Xt, phi):
+        np.testing.assert_allclose(row, _brute_force(value, x, 5), atol=1e-12)
+    np.testing.assert_allclose(phi.sum(axis=1) + paths.expected_value, gb.predict(Xt), atol=1e-12)
+
+
+@pytest.fixture
+def real_models(artifacts, monkeypatch):
+    models = ModelSet(artifacts['clf'], artifacts['reg'], artifacts['scaler_X'], artifacts['scaler_y'],
+                      compile_encoders(artifacts['label_encoders']), artifacts['scale_features'],
+                      artifacts['feature_order'], version="explain-test")
+    monkeypatch.setattr(registry, "_current", models)
+    return models
+
+
+def test_contributions_add_up_to_both_predictions(real_models):
+    records = [InsuranceInput(**{**SAMPLE_PAYLOAD, "age": a}) for a in (20, 45, 90)]
+    X = preprocess_batch(records, real_models)
+    explainer = ModelExplainer(real_models)
+    risk_phi, cost_phi = explainer.explain(X)
+    _, probs = risk(X, real_models)
+    np.testing.assert_allclose(explainer.risk.expected_value + risk_phi.sum(axis=1), probs, atol=1e-10)
+    np.testing.assert_allclose(explainer.cost_base_value + cost_phi.sum(axis=1), np.log1p(cost(X, real_models)),
+                               atol=1e-10)
+
+
+def test_explain_endpoints(real_models):
+    res = client.post("/explain", json=SAMPLE_PAYLOAD)
+    assert res.status_code == 200
+    out = res.json()
+    assert list(out["risk_contributions"]) == real_models.feature_order
+    assert out["risk_base_value"] + sum(out["risk_contributions"].values()) == pytest.approx(out["probability"], abs=1e-4)
+    assert (out["cost_base_value"] + sum(out["cost_contributions"].values())
+            == pytest.approx(np.log1p(out["expected_claim_cost"]), abs=1e-4))
+
+    hits = client.get("/cache/stats").json().get("hits", 0)
+    assert client.post("/explain", json=SAMPLE_PAYLOAD).json() == out
+    assert client.get("/cache/stats").json().get("hits", 0) == hits + 1
+
+    batch = client.post("/explain/batch", json=[SAMPLE_PAYLOAD, {**SAMPLE_PAYLOAD, "age": 70}]).json()
+    assert batch[0] == out
+    assert batch[1]["risk_base_value"] + sum(batch[1]["risk_contributions"].values()) == pytest.approx(
+        batch[1]["probability"], abs=1e-4)
+
+
+def test_unexplainable_models_return_503():
+    # The mocked module-level models are not tree ensembles
+    assert client.post("/explain", json={**SAMPLE_PAYLOAD, "age": 19}).status_code == 503
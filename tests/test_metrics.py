@@ -0,0 +1,65 @@
+"""
+/metrics and Server-Timing — stage histograms, request / error counters and the
+per-request stage breakdown.
+"""
+
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.main import app
+from tests.test_api import client, SAMPLE_PAYLOAD
+
+
+def _sample(text, line_prefix) -> float:
+    return sum(float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.startswith(line_prefix))
+
+
+def test_histogram_is_cumulative():
+    h = metrics.Histogram("t_seconds", "test", ("stage",), buckets=(0.001, 0.01))
+    for v in (0.0005, 0.005, 0.005, 2.0):
+        h.observe(v, "x")
+    lines = h.lines()
+    assert 't_seconds_bucket{stage="x",le="0.001"} 1' in lines
+    assert 't_seconds_bucket{stage="x",le="0.01"} 3' in lines
+    assert 't_seconds_bucket{stage="x",le="+Inf"} 4' in lines
+    assert 't_seconds_count{stage="x"} 4' in lines
+
+
+def test_server_timing_lists_preprocess_and_model_stages():
+    res = client.post("/predict/batch", json=[{**SAMPLE_PAYLOAD, "age": 31}, {**SAMPLE_PAYLOAD, "age": 32}])
+    assert res.status_code == 200
+    timing = res.headers["Server-Timing"]
+    names = [part.split(";")[0].strip() for part in timing.split(",")]
+    for stage in ("validate", "features", "encode", "frame", "scale",
+                  "predict_classifier", "predict_regressor", "total"):
+        assert stage in names
+    assert all(";dur=" in part for part in timing.split(","))
+
+
+def test_metrics_exposes_counters_histograms_and_version():
+    before = client.get("/metrics").text
+    client.post("/predict/classification", json=SAMPLE_PAYLOAD)
+    client.post("/predict/classification", json={**SAMPLE_PAYLOAD, "age": 5})     # 422 from validation
+
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain")
+    text = res.text
+    ok = 'insurance_api_requests_total{method="POST",path="/predict/classification",status="200"}'
+    bad = 'insurance_api_errors_total{path="/predict/classification",type="validation"}'
+    assert _sample(text, ok) == _sample(before, ok) + 1
+    assert _sample(text, bad) == _sample(before, bad) + 1
+    assert 'insurance_api_stage_duration_seconds_bucket{stage="encode",le="+Inf"}' in text
+    assert 'insurance_api_request_duration_seconds_count{path="/predict/classification"}' in text
+    assert "insurance_api_model_info{version=" in text
+
+
+def test_every_batched_request_reports_its_own_queue_wait():
+    # One event loop: the batch worker is started by the first request, later ones
+    # must still get their own queue_wait
+    with TestClient(app) as shared:
+        for age in (41, 42):
+            res = shared.post("/predict", json={**SAMPLE_PAYLOAD, "age": age})
+            assert res.status_code == 200
+            names = [part.split(";")[0].strip() for part in res.headers["Server-Timing"].split(",")]
+            assert names.count("queue_wait") == 1
@@ -0,0 +1,130 @@
+"""
+Portfolio simulation — Monte Carlo totals agree with the analytic expected loss,
+groups add up to the portfolio, results depend on the seed only, and the endpoint
+/ CLI report mean, VaR and TVaR per Location / Urbanization_Level / Construction_Type.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app.main
+from app import portfolio
+from app.portfolio import main as portfolio_cli, simulate, summarize
+from tests.test_api import client
+
+BOOK = pd.read_csv("Property Insurance.csv", nrows=100).dropna().head(60)   # complete rows only
+rng = np.random.default_rng(11)
+N = 2_000
+PROB = rng.random(N)
+COST = rng.lognormal(7.5, 0.5, N)
+GROUPS = {"region": rng.integers(0, 4, N), "kind": rng.integers(0, 3, N)}
+
+
+def test_simulated_mean_matches_expected_loss_and_groups_add_up():
+    losses = simulate(PROB, COST, GROUPS, scenarios=4_000, sigma=0.3, seed=1, chunk_elements=50_000)
+    assert losses.shape == (4_000, 1 + 4 + 3)
+    expected = (PROB * COST).sum()
+    assert losses[:, 0].mean() == pytest.approx(expected, rel=0.01)
+    np.testing.assert_allclose(losses[:, 1:5].sum(axis=1), losses[:, 0], rtol=1e-5)
+    np.testing.assert_allclose(losses[:, 5:].sum(axis=1), losses[:, 0], rtol=1e-5)
+
+
+def test_seed_fixes_the_result_whatever_the_thread_count():
+    one = simulate(PROB, COST, GROUPS, scenarios=300, seed=5, workers=1, chunk_elements=20_000)
+    four = simulate(PROB, COST, GROUPS, scenarios=300, seed=5, workers=4, chunk_elements=20_000)
+    other = simulate(PROB, COST, GROUPS, scenarios=300, seed=6, workers=1, chunk_elements=20_000)
+    np.testing.assert_array_equal(one, four)
+    assert not np.array_equal(one, other)
+
+
+def test_blocks_are_submitted_in_waves_of_workers(monkeypatch):
+    pending, in_flight = [], []
+
+    class Pool(portfolio.ThreadPoolExecutor):
+        def submit(self, *args, **kwargs):
+            pending.append(super().submit(*args, **kwargs))
+            in_flight.append(sum(not f.done() for f in pending))
+            return pending[-1]
+
+    monkeypatch.setattr(portfolio, "ThreadPoolExecutor", Pool)
+    losses = simulate(PROB, COST, GROUPS, scenarios=300, seed=5, workers=2, chunk_elements=20_000)
+    assert len(pending) > 10 and max(in_flight) <= 2
+    monkeypatch.undo()
+    np.testing.assert_array_equal(losses, simulate(PROB, COST, GROUPS, scenarios=300, seed=5, workers=1,
+                                                   chunk_elements=20_000))
+
+
+def test_certain_claims_with_no_spread_cost_exactly_their_expectation():
+    losses = simulate(np.ones(50), np.full(50, 1000.0), {}, scenarios=20, sigma=1e-6)
+    np.testing.assert_allclose(losses[:, 0], 50_000.0, rtol=1e-4)
+    assert not simulate(np.zeros(50), np.full(50, 1000.0), {}, scenarios=20).any()
+
+
+def test_summary_tail_measures():
+    scored = pd.DataFrame({"probability": PROB, "expected_claim_cost": COST, "error": None,
+                           "Location": np.where(GROUPS["region"] == 0, "Sabah", "Johor")})
+    report = summarize(scored, ["Location"], scenarios=2_000, quantiles=(0.9, 0.99))
+    total = report["total"]
+    assert total["var"]["0.9"] <= total["var"]["0.99"] <= total["tvar"]["0.99"]
+    assert total["var"]["0.9"] <= total["tvar"]["0.9"]
+    levels = report["groups"]["Location"]
+    assert sorted(levels) == ["Johor", "Sabah"]
+    assert sum(v["policies"] for v in levels.values()) == N
+    assert sum(v["expected_loss"] for v in levels.values()) == pytest.approx(total["expected_loss"], abs=0.05)
+
+
+def test_endpoint_groups_by_the_book_columns():
+    book = pd.concat([BOOK, BOOK.head(1).assign(Age=7)], ignore_index=True)      # one invalid row
+    res = client.post("/portfolio/simulate", params={"scenarios": 500, "quantiles": [0.99]},
+                      files={"file": ("book.csv", book.to_csv(index=False).encode(), "text/csv")})
+    assert res.status_code == 200
+    body = res.json()
+    assert body["policies"] == len(BOOK) and body["errors"] == 1 and body["scenarios"] == 500
+    assert set(body["groups"]) == {"Location", "Urbanization_Level", "Construction_Type"}
+    assert set(body["groups"]["Location"]) == set(BOOK["Location"])
+    assert list(body["total"]["var"]) == ["0.99"]
+    # Mock models: probability 0.8 and the same cost for every policy
+    cost = float(np.expm1(8.5))
+    assert body["total"]["expected_loss"] == pytest.approx(0.8 * len(BOOK) * cost, rel=1e-3)
+
+
+def test_endpoint_rejects_bad_parameters_and_concurrent_runs(monkeypatch):
+    files = {"file": ("book.csv", BOOK.to_csv(index=False).encode(), "text/csv")}
+    assert client.post("/portfolio/simulate", params={"group_by": "Customer_ID"}, files=files).status_code == 422
+    monkeypatch.setattr(app.main, "PORTFOLIO_MAX_DRAWS", 1_000)
+    assert client.post("/portfolio/simulate", params={"scenarios": 100}, files=files).status_code == 422
+    assert app.main._simulation.acquire(blocking=False)
+    try:
+        res = client.post("/portfolio/simulate", params={"scenarios": 5}, files=files)
+        assert res.status_code == 429 and res.headers["Retry-After"]
+    finally:
+        app.main._simulation.release()
+
+
+def test_cli_writes_a_report(tmp_path, real_joblib, real_models_dir):
+    book = tmp_path / "book.csv"
+    BOOK.to_csv(book, index=False)
+    out = tmp_path / "losses.json"
+    portfolio_cli([str(book), "--output", str(out), "--scenarios", "200", "--group-by", "Urbanization_Level",
+                   "--models-dir", str(real_models_dir), "--workers", "2"])
+    report = json.loads(out.read_text())
+    assert report["policies"] == len(BOOK) and list(report["groups"]) == ["Urbanization_Level"]
+    assert report["total"]["mean"] > 0
+
+
+def test_draw_limit_is_enforced_before_and_during_scoring(monkeypatch):
+    files = {"file": ("book.csv", BOOK.to_csv(index=False).encode(), "text/csv")}
+    scored = []
+    score_frame = portfolio.score_frame
+    monkeypatch.setattr(portfolio, "score_frame", lambda chunk, *a: scored.append(len(chunk)) or score_frame(chunk, *a))
+    monkeypatch.setattr(app.main, "PORTFOLIO_MAX_DRAWS", 1_000)
+    monkeypatch.setattr(app.main, "UPLOAD_CHUNK_ROWS", 10)
+
+    res = client.post("/portfolio/simulate", params={"scenarios": 1_001}, files=files)
+    assert res.status_code == 422 and scored == []                  # rejected without scoring
+    res = client.post("/portfolio/simulate", params={"scenarios": 50}, files=files)
+    assert res.status_code == 422 and "More than 20 policies" in res.json()["detail"]
+    assert scored == [10, 10, 10]                                   # stopped at the chunk over 20 rows
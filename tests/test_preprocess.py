@@ -0,0 +1,88 @@
+"""
+Preprocessing tests — the batch path must produce exactly the features of the
+original row-by-row implementation.
+"""
+
+import numpy as np
+import pandas as pd
+
+from app.encoding import compile_encoders
+from app.preprocess import RAW_COLUMNS, preprocess, preprocess_batch
+from app.registry import ModelSet
+from app.schemas import InsuranceInput
+from tests.test_api import SAMPLE_PAYLOAD
+
+RECORDS = [
+    InsuranceInput(**SAMPLE_PAYLOAD),
+    InsuranceInput(**{**SAMPLE_PAYLOAD, "gender": "Female", "customer_satisfaction": 2,
+                      "construction_type": "Timber Structure", "annual_income": 123456.0}),
+    InsuranceInput(**{**SAMPLE_PAYLOAD, "policy_term": 7, "maintenance_level": "Medium", "age": 77,
+                      "flood_risk_index": 90.0, "claim_amount_last": 0.0}),
+]
+
+
+_ENCODE_COLS = [
+    'Gender', 'Marital_Status', 'Urbanization_Level', 'Policy_Term',
+    'Claim_Frequency', 'Maintenance_Level', 'Customer_Satisfaction',
+    'Has_Security_System', 'Construction_Type', 'Payment_Method',
+]
+
+
+def _reference(data, a) -> pd.DataFrame:
+    """
+    Frozen copy of the original single-row preprocess() (sklearn LabelEncoder and
+    StandardScaler, one dict per row). Only change: an unseen non-numeric label
+    falls back to 0 instead of raising from float().
+    """
+    row = {
+        'Age': data.age, 'Gender': data.gender, 'Marital_Status': data.marital_status,
+        'Urbanization_Level': data.urbanization_level, 'Policy_Term': data.policy_term,
+        'Claim_Frequency': data.claim_frequency, 'Maintenance_Level': data.maintenance_level,
+        'Building_Age': data.building_age, 'Customer_Satisfaction': data.customer_satisfaction,
+        'Has_Security_System': data.has_security_system, 'Construction_Type': data.construction_type,
+        'Policy_Tenure': data.policy_tenure, 'Payment_Method': data.payment_method,
+        'Credit_Score': data.credit_score, 'Fire_Risk_Score': data.fire_risk_score,
+        'Area_Risk_Index': (data.flood_risk_index + data.crime_rate_index) / 2,
+        'log_Annual_Income': np.log1p(data.annual_income),
+        'log_Property_Value': np.log1p(data.property_value),
+        'log_Premium_Amount': np.log1p(data.premium_amount),
+        'log_Claim_Amount_Last': np.log1p(data.claim_amount_last),
+    }
+    for col in _ENCODE_COLS:
+        le = a['label_encoders'][col]
+        val = str(row[col])
+        if val not in le.classes_:
+            try:
+                val = str(float(row[col]))
+            except ValueError:
+                pass
+        try:
+            row[col] = int(le.transform([val])[0])
+        except ValueError:
+            row[col] = 0
+    df = pd.DataFrame([row])[a['feature_order']]
+    df[a['scale_features']] = a['scaler_X'].transform(df[a['scale_features']])
+    return df
+
+
+def test_batch_matches_original_row_implementation(artifacts):
+    models = ModelSet(artifacts['clf'], artifacts['reg'], artifacts['scaler_X'], artifacts['scaler_y'],
+                      compile_encoders(artifacts['label_encoders']), artifacts['scale_features'],
+                      artifacts['feature_order'], version="test")
+    policies = pd.read_csv("Property Insurance.csv", nrows=80).dropna()
+    records = RECORDS + [
+        InsuranceInput(**{f: row[c] for f, c in RAW_COLUMNS.items()}) for _, row in policies.iterrows()
+    ]
+
+    batch = preprocess_batch(records, models)
+    expected = pd.concat([_reference(r, artifacts) for r in records], ignore_index=True)
+    assert list(batch.columns) == list(expected.columns)
+    np.testing.assert_array_equal(batch.to_numpy(dtype=float), expected.to_numpy(dtype=float))
+    np.testing.assert_array_equal(preprocess(records[1], models).to_numpy(dtype=float),
+                                  expected.iloc[[1]].to_numpy(dtype=float))
+
+
+def test_unseen_label_falls_back_to_zero():
+    X = preprocess(RECORDS[2])
+    assert X["Policy_Term"].iloc[0] == 0
+    assert X["Maintenance_Level"].iloc[0] == 0
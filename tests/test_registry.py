@@ -0,0 +1,112 @@
+"""
+Model registry tests — versioned artifact sets and atomic hot reload.
+"""
+
+import os
+
+import pytest
+
+from app.registry import ARTIFACTS, ModelRegistry, ModelSet
+from tests.test_api import SAMPLE_PAYLOAD, client
+
+
+@pytest.fixture
+def models_dir(tmp_path):
+    for name in ARTIFACTS.values():
+        (tmp_path / name).write_bytes(name.encode())
+    return tmp_path
+
+
+def _touch(path, content: bytes):
+    path.write_bytes(content)
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+def test_reload_swaps_only_on_new_version(models_dir):
+    registry = ModelRegistry(models_dir)
+    first = registry.current
+    assert registry.check_for_update() is False          # nothing changed on disk
+
+    _touch(models_dir / "gb_regressor.joblib", b"retrained")
+    assert registry.check_for_update() is False          # may still be mid-copy
+    assert registry.check_for_update() is True           # unchanged for a tick: reload
+    assert registry.current is not first
+    assert registry.current.version != first.version
+    assert registry.reload() is False                      # same content again
+
+
+def test_failed_reload_keeps_serving(models_dir, monkeypatch):
+    registry = ModelRegistry(models_dir)
+    first = registry.current
+
+    def broken(*args, **kwargs):
+        raise EOFError("half-copied file")
+
+    monkeypatch.setattr(ModelSet, "load", broken)
+    _touch(models_dir / "rf_classifier.joblib", b"partial")
+    assert registry.check_for_update() is False
+    assert registry.check_for_update() is False
+    assert registry.current is first
+    assert registry.reload_errors == 1
+
+
+def test_warmup_runs_before_swap(models_dir):
+    seen = []
+    registry = ModelRegistry(models_dir, warmup=lambda models: seen.append(models.version))
+    assert seen == [registry.current.version]
+
+    def failing(models):
+        raise RuntimeError("bad model")
+
+    registry.warmup = failing
+    first = registry.current
+    _touch(models_dir / "scaler_y.joblib", b"new")
+    assert registry.check_for_update() is False
+    assert registry.check_for_update() is False
+    assert registry.current is first
+
+
+def test_watcher_waits_for_legacy_copy_to_settle(models_dir):
+    registry = ModelRegistry(models_dir)
+    first = registry.current
+    _touch(models_dir / "rf_classifier.joblib", b"new forest")
+    assert registry.check_for_update() is False
+    _touch(models_dir / "scaler_X.joblib", b"new scaler")     # copy still in progress
+    assert registry.check_for_update() is False
+    assert registry.current is first
+    assert registry.check_for_update() is True
+
+
+def test_files_changing_mid_load_are_not_swapped_in(models_dir, monkeypatch):
+    registry = ModelRegistry(models_dir)
+    first = registry.current
+    load = ModelSet.load
+
+    def load_during_copy(*args, **kwargs):
+        models = load(*args, **kwargs)
+        _touch(models_dir / "scaler_X.joblib", b"written after the forest was read")
+        return models
+
+    monkeypatch.setattr(ModelSet, "load", load_during_copy)
+    with pytest.raises(RuntimeError, match="changed while loading"):
+        registry.reload(force=True)
+    assert registry.current is first
+
+
+def test_admin_reload_requires_configured_token(monkeypatch):
+    import app.main
+    assert client.post("/admin/reload").status_code == 403     # no ADMIN_TOKEN: disabled
+    monkeypatch.setattr(app.main, "ADMIN_TOKEN", "s3cret")
+    assert client.post("/admin/reload", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+
+def test_api_reports_model_version(monkeypatch):
+    import app.main
+    monkeypatch.setattr(app.main, "ADMIN_TOKEN", "s3cret")
+    version = client.get("/model").json()["model_version"]
+    res = client.post("/predict", json=SAMPLE_PAYLOAD)
+    assert res.headers["X-Model-Version"] == version
+    res = client.post("/admin/reload", headers={"X-Admin-Token": "s3cret"})
+    assert res.status_code == 200
+    assert res.json() == {"reloaded": False, "model_version": version}
@@ -0,0 +1,137 @@
+"""
+Shadow model set — compared off the request path: the same frame when the
+layouts match, its own preprocessing when they don't, drops instead of queueing,
+kept out of the serving metrics, and reported at GET /shadow.
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from app import metrics, shadow
+from app.encoding import compile_encoders
+from app.main import _predict
+from app.preprocess import preprocess_batch
+from app.registry import ModelSet, registry
+from app.schemas import InsuranceInput
+from app.scoring import cost, risk
+from tests.conftest import make_artifacts
+from tests.test_api import client, SAMPLE_PAYLOAD
+
+RECORDS = [InsuranceInput(**{**SAMPLE_PAYLOAD, "age": a, "credit_score": c})
+           for a, c in zip(range(20, 90, 5), range(400, 820, 30))]
+
+
+def _models(artifacts, version):
+    return ModelSet(artifacts["clf"], artifacts["reg"], artifacts["scaler_X"], artifacts["scaler_y"],
+                    compile_encoders(artifacts["label_encoders"]), artifacts["scale_features"],
+                    artifacts["feature_order"], version=version)
+
+
+@pytest.fixture
+def active(artifacts, monkeypatch):
+    models = _models(artifacts, "active")
+    monkeypatch.setattr(registry, "_current", models)
+    return models
+
+
+@pytest.fixture(scope="module")
+def candidate():
+    return _models(make_artifacts(seed=1), "candidate")         # other trees, other scaler
+
+
+def _scored(records, models):
+    X = preprocess_batch(records, models, observe=False)
+    return X, _predict(X, models)
+
+
+def test_identical_shadow_agrees_exactly(active):
+    clone = ModelSet(active.clf, active.reg, active.scaler_X, active.scaler_y, active.encoders,
+                     active.scale_features, active.feature_order, version="clone")
+    runner = shadow.ShadowRunner(clone)
+    X, results = _scored(RECORDS, active)
+    assert runner.submit(X, RECORDS, results, active)
+    assert runner.wait(10)
+    report = runner.report()
+    assert report["rows"] == len(RECORDS) and report["agreement"] == 1.0
+    assert report["probability"]["max_abs"] == report["cost"]["max_abs"] == 0.0
+    assert "features" not in report["stage_seconds"]                 # the active frame was reused
+    runner.close()
+
+
+def test_other_layout_is_preprocessed_with_its_own_artifacts(active, candidate):
+    assert not shadow.same_layout(active, candidate)
+    runner = shadow.ShadowRunner(candidate)
+    X, results = _scored(RECORDS, active)
+    runner.submit(X, RECORDS, results, active)
+    assert runner.wait(10)
+
+    Xc = preprocess_batch(RECORDS, candidate, observe=False)
+    preds, probs = risk(Xc, candidate)
+    costs = np.round(cost(Xc, candidate), 2)
+    expected_agreement = np.mean([r.risk_category == p for r, p in zip(results, preds)])
+    report = runner.report()
+    assert report["active_version"] == "active" and report["shadow_version"] == "candidate"
+    assert report["agreement"] == pytest.approx(expected_agreement)
+    assert report["probability"]["mean"] == pytest.approx(
+        np.mean(np.round(probs, 4) - [r.probability for r in results]), abs=1e-6)
+    assert report["cost"]["max_abs"] == pytest.approx(
+        np.max(np.abs(costs - [r.expected_claim_cost for r in results])), abs=0.01)
+    assert sum(report["probability"]["histogram"].values()) == len(RECORDS)
+    assert "features" in report["stage_seconds"]
+    runner.close()
+
+
+def test_drops_instead_of_queueing(active, candidate, monkeypatch):
+    runner = shadow.ShadowRunner(candidate, max_queue=1)
+    release = threading.Event()
+    score = runner._score
+    monkeypatch.setattr(runner, "_score", lambda *a: (release.wait(10), score(*a))[1])
+    X, results = _scored(RECORDS[:2], active)
+
+    assert runner.submit(X, RECORDS[:2], results, active)
+    assert not runner.submit(X, RECORDS[:2], results, active)           # queue full
+    assert not runner.submit(X, RECORDS[:2], results, active, busy=True)
+    release.set()
+    assert runner.wait(10)
+    report = runner.report()
+    assert (report["rows"], report["dropped_rows"], report["submitted_rows"]) == (2, 4, 2)
+    runner.close()
+
+
+def test_shadow_stages_stay_out_of_serving_histograms(active, candidate):
+    def observed():
+        return sum(series[-2] for labels, series in metrics.STAGE_SECONDS._series.items()
+                   if labels == ("predict_classifier",))
+
+    runner = shadow.ShadowRunner(candidate)
+    X, results = _scored(RECORDS, active)
+    before = observed()
+    runner.submit(X, RECORDS, results, active)
+    assert runner.wait(10)
+    assert observed() == before and runner.report()["stage_seconds"]["predict_classifier"] > 0
+    runner.close()
+
+
+def test_shadow_endpoint(active, candidate, monkeypatch):
+    monkeypatch.setattr(shadow, "runner", None)
+    assert client.get("/shadow").json() == {"enabled": False}
+
+    runner = shadow.ShadowRunner(candidate)
+    monkeypatch.setattr(shadow, "runner", runner)
+    payloads = [{**SAMPLE_PAYLOAD, "age": a} for a in (23, 37, 58)]
+    primary = client.post("/predict/batch", json=payloads).json()
+    assert runner.wait(10)
+    report = client.get("/shadow").json()
+    assert report["enabled"] and report["rows"] == len(primary) and report["errors"] == 0
+    assert report["shadow_version"] == "candidate" and report["active_version"] == "active"
+    assert 0 <= report["agreement"] <= 1
+
+    # Regression-only calls are compared on cost alone
+    client.post("/predict/regression/batch", json=[{**SAMPLE_PAYLOAD, "age": 71}])
+    assert runner.wait(10)
+    report = client.get("/shadow").json()
+    assert report["cost"]["count"] == report["probability"]["count"] + 1
+    assert "insurance_api_shadow_dropped_rows_total 0" in client.get("/metrics").text
+    runner.close()
@@ -0,0 +1,64 @@
+"""
+What-if sweep — every grid point scores exactly like the same policy sent through
+/predict/batch, while only the varied features are recomputed.
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from app import drift
+from app.preprocess import preprocess_batch, sweep
+from app.registry import registry
+from app.schemas import InsuranceInput
+from tests.test_api import client, SAMPLE_PAYLOAD
+
+
+def test_sweep_frame_matches_full_preprocessing():
+    base = InsuranceInput(**SAMPLE_PAYLOAD)
+    grid = {"building_age": [0, 15, 40, 15], "flood_risk_index": [10.0, 40.0, 90.0, 55.5],
+            "maintenance_level": ["Low", "High", "Moderate", "Unknown"]}
+    models = registry.current
+    X = sweep(base, grid, models)
+    rows = [InsuranceInput(**{**SAMPLE_PAYLOAD, **{f: v[i] for f, v in grid.items()}}) for i in range(4)]
+    pd.testing.assert_frame_equal(X, preprocess_batch(rows, models), check_dtype=False)
+
+
+def test_two_axis_surface_matches_batch_endpoint():
+    ages = [0, 30, 60]
+    security = ["Yes", "No"]
+    res = client.post("/predict/sweep", json={
+        "base": SAMPLE_PAYLOAD,
+        "vary": [{"field": "building_age", "values": ages},
+                 {"field": "has_security_system", "values": security}],
+    })
+    assert res.status_code == 200
+    out = res.json()
+    assert out["fields"] == ["building_age", "has_security_system"]
+    assert np.shape(out["probability"]) == (3, 2)
+
+    batch = client.post("/predict/batch", json=[
+        {**SAMPLE_PAYLOAD, "building_age": a, "has_security_system": s}
+        for a, s in itertools.product(ages, security)
+    ]).json()
+    assert sum(out["probability"], []) == [r["probability"] for r in batch]
+    assert sum(out["expected_claim_cost"], []) == [r["expected_claim_cost"] for r in batch]
+    assert sum(out["risk_category"], []) == [r["risk_category"] for r in batch]
+
+
+def test_grid_values_are_validated():
+    bad_value = {"base": SAMPLE_PAYLOAD, "vary": [{"field": "age", "values": [30, 150]}]}
+    bad_field = {"base": SAMPLE_PAYLOAD, "vary": [{"field": "shoe_size", "values": [42]}]}
+    too_many = {"base": SAMPLE_PAYLOAD, "vary": [{"field": "age", "values": [30]}] * 3}
+    for body in (bad_value, bad_field, too_many):
+        assert client.post("/predict/sweep", json=body).status_code == 422
+
+
+def test_sweep_is_kept_out_of_the_drift_monitor():
+    monitor = drift.monitor(registry.current)
+    before = monitor.report()["rows"]
+    res = client.post("/predict/sweep", json={
+        "base": SAMPLE_PAYLOAD, "vary": [{"field": "building_age", "values": [0, 30, 60]}]})
+    assert res.status_code == 200
+    assert monitor.report()["rows"] == before
@@ -0,0 +1,71 @@
+"""
+Training pipeline (save_models.py) on a slice of Property Insurance.csv:
+artifacts the API can serve, a feature cache keyed on the data, reproducible fits.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import save_models
+from app.registry import ARTIFACTS, ModelSet
+from app.scoring import score_frame
+
+
+@pytest.fixture
+def data(tmp_path):
+    path = tmp_path / "policies.csv"
+    pd.read_csv("Property Insurance.csv", nrows=400).to_csv(path, index=False)
+    return path
+
+
+def test_train_writes_servable_artifacts(data, tmp_path, real_joblib):
+    models_dir = tmp_path / "models"
+    report = save_models.train(data, models_dir, tmp_path / "cache", n_jobs=2)
+
+    assert all((models_dir / name).exists() for name in ARTIFACTS.values())
+    assert json.loads((models_dir / save_models.REPORT_FILE).read_text())["data_hash"] == report["data_hash"]
+    assert {"load", "encode", "impute", "split", "fit", "save"} <= set(report["stage_seconds"])
+
+    models = ModelSet.load(models_dir)
+    out = score_frame(pd.read_csv(data).dropna().head(20), models)
+    assert out["error"].isna().all() and out["probability"].between(0, 1).all()
+
+
+def test_feature_cache_and_reproducibility(data, tmp_path, real_joblib):
+    first = save_models.train(data, tmp_path / "a", tmp_path / "cache", n_jobs=1)
+    second = save_models.train(data, tmp_path / "b", tmp_path / "cache", n_jobs=1)
+    assert (first["feature_cache"], second["feature_cache"]) == ("miss", "hit")
+    assert "impute" not in second["stage_seconds"]
+    assert first["metrics"] == second["metrics"]
+
+    X = save_models.cached_features(data, tmp_path / "cache")[0]["X_test"]
+    a, b = ModelSet.load(tmp_path / "a"), ModelSet.load(tmp_path / "b")
+    np.testing.assert_array_equal(a.clf.predict_proba(X), b.clf.predict_proba(X))
+    np.testing.assert_array_equal(a.reg.predict(X), b.reg.predict(X))
+
+    pd.read_csv(data).head(399).to_csv(data, index=False)
+    assert save_models.data_hash(data) != first["data_hash"]
+
+
+def test_save_swaps_in_a_complete_set(data, tmp_path, real_joblib, monkeypatch):
+    models_dir = tmp_path / "models"
+    save_models.train(data, models_dir, tmp_path / "cache", n_jobs=1, bundle=True)
+    (models_dir / "notes.txt").write_text("kept")
+    first = ModelSet.load(models_dir, engine="native")
+
+    # A watcher polling mid-save sees the old set or no set, never a mix
+    seen = []
+    write = save_models._write
+    monkeypatch.setattr(save_models, "_write", lambda d, *a: (seen.append(ModelSet.load(models_dir).version),
+                                                               write(d, *a))[1])
+    monkeypatch.setattr(save_models, "RF_PARAMS", {**save_models.RF_PARAMS, "max_depth": 4})
+    report = save_models.train(data, models_dir, tmp_path / "cache", n_jobs=1)
+
+    assert seen == [first.version]
+    assert ModelSet.load(models_dir).version == report["bundle_version"] != first.version
+    assert (models_dir / "notes.txt").read_text() == "kept"
+    assert not (tmp_path / "models.staging").exists() and not (tmp_path / "models.old").exists()
+    assert first.clf.predict_proba(np.zeros((1, 20))).shape == (1, 2)     # old mapping still readable
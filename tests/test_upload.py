@@ -0,0 +1,89 @@
+"""
+Streaming portfolio upload tests — CSV / NDJSON in, one NDJSON line per row out.
+"""
+
+import json
+
+import pandas as pd
+
+from app.preprocess import RAW_COLUMNS, preprocess_batch, preprocess_frame
+from app.schemas import InsuranceInput
+from tests.test_api import SAMPLE_PAYLOAD, client
+
+PORTFOLIO = pd.read_csv("Property Insurance.csv", nrows=40)
+
+
+def _lines(res):
+    return [json.loads(line) for line in res.text.splitlines()]
+
+
+def test_csv_upload_streams_every_row_in_order():
+    res = client.post(
+        "/predict/upload", params={"chunk_rows": 7},
+        files={"file": ("portfolio.csv", PORTFOLIO.to_csv(index=False), "text/csv")},
+    )
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    rows = _lines(res)
+    assert [r["Customer_ID"] for r in rows] == PORTFOLIO["Customer_ID"].tolist()
+
+    incomplete = PORTFOLIO[list(RAW_COLUMNS.values())].isna().any(axis=1).tolist()
+    assert ["error" in r for r in rows] == incomplete
+    assert all(0.0 <= r["probability"] <= 1.0 for r in rows if "error" not in r)
+
+
+def test_ndjson_upload_accepts_api_field_names():
+    body = "\n".join(json.dumps({"Customer_ID": f"C{i}", **SAMPLE_PAYLOAD}) for i in range(3))
+    res = client.post("/predict/upload", files={"file": ("portfolio.ndjson", body, "application/x-ndjson")})
+    rows = _lines(res)
+    single = client.post("/predict", json=SAMPLE_PAYLOAD).json()
+    assert [r["Customer_ID"] for r in rows] == ["C0", "C1", "C2"]
+    assert all({k: r[k] for k in single} == single for r in rows)
+
+
+def test_rows_outside_field_limits_are_rejected_like_the_api():
+    bad = PORTFOLIO.dropna().head(3).astype({"Building_Age": float})
+    bad.loc[bad.index[0], ["Age", "Annual_Income", "Customer_Satisfaction"]] = [5, -50, 9]
+    bad.loc[bad.index[1], "Building_Age"] = 2.5
+    rows = _lines(client.post("/predict/upload", files={"file": ("p.csv", bad.to_csv(index=False), "text/csv")}))
+
+    assert rows[0]["error"] == (
+        "Out of range: Age (>= 18, <= 100, whole number), "
+        "Customer_Satisfaction (>= 1, <= 5, whole number), Annual_Income (> 0)"
+    )
+    assert "Building_Age" in rows[1]["error"]
+    assert "error" not in rows[2]
+
+    api = {f: bad.iloc[0][c] for f, c in RAW_COLUMNS.items()}
+    assert client.post("/predict", json=json.loads(pd.Series(api).to_json())).status_code == 422
+
+
+def test_upload_with_missing_columns_reports_error():
+    csv = PORTFOLIO.drop(columns=["Age"]).to_csv(index=False)
+    rows = _lines(client.post("/predict/upload", files={"file": ("p.csv", csv, "text/csv")}))
+    assert rows == [{"error": "Missing columns: Age", "rows_processed": 0}]
+
+
+def test_frame_matches_batch_preprocessing():
+    complete = PORTFOLIO.dropna().head(5)
+    records = [InsuranceInput(**{f: row[c] for f, c in RAW_COLUMNS.items()}) for _, row in complete.iterrows()]
+    pd.testing.assert_frame_equal(
+        preprocess_frame(complete).reset_index(drop=True), preprocess_batch(records),
+        check_dtype=False,
+    )
+
+
+def test_upload_is_scored_on_the_inference_executor(monkeypatch):
+    import app.main as main
+    from app.executor import InferenceExecutor
+
+    csv = PORTFOLIO.to_csv(index=False)
+    monkeypatch.setattr(main, "_inference", InferenceExecutor(workers=1, max_queue=0))
+    res = client.post("/predict/upload", files={"file": ("p.csv", csv, "text/csv")})
+    assert res.status_code == 429 and res.headers["Retry-After"] == "1"
+
+    executor = InferenceExecutor(workers=1, max_queue=4)
+    monkeypatch.setattr(main, "_inference", executor)
+    rows = _lines(client.post("/predict/upload", params={"chunk_rows": 10}, files={"file": ("p.csv", csv, "text/csv")}))
+    assert len(rows) == len(PORTFOLIO)
+    assert executor.stats()["rejected"] == 0